@@ -9,17 +9,31 @@
 # =================================================================================================================== #
 import getpass                                                          # Copernicus API login
 import os                                                               # Directory and file manipulation
-import sentinelsat                                                      # Copernicus API access
-import untangle                                                         # Read copernicus cart XML download
-import zipfile                                                          # Unzip downloads
 import time                                                             # Time to complete
+from sablesat import trace                                              # Stage timing and resource records
+from sablesat import screening                                          # Cloud and footprint screening
+from sablesat import downloader                                         # Download results
+from sablesat import download                                           # Download stages
+from sablesat import project                                            # Project folder layout
 
 # ------------------------------------------------------------------------------------------------------------------- #
 # Define path variables
 # ------------------------------------------------------------------------------------------------------------------- #
 workingdir = os.getcwd()
-apidir = os.path.join(workingdir, "sentinel_api")
-inputdir = os.path.join(workingdir, "input")
+paths = project.paths(workingdir)
+inputdir = paths["input"]
+tracedir = paths["traces"]
+clipjson = paths["clip_json"]                                           # Clip extent in WGS 84
+hub_url = os.environ.get("SABLESAT_HUB", download.HUB_URL)              # Set to use a stand-in hub
+
+# Byte range segments per product; unset to download with sentinelsat. Every segment is a connection, and the hub
+# allows 2 per account, so more segments means fewer products downloading at once.
+segments = os.environ.get("SABLESAT_SEGMENTS")
+segments = int(segments) if segments else None
+if segments is not None and not 1 <= segments <= downloader.MAX_CONCURRENT:
+    print "SABLESAT_SEGMENTS must be 1 to %i, the hub's connections per account; using %i." % \
+          (downloader.MAX_CONCURRENT, downloader.MAX_CONCURRENT)
+    segments = downloader.MAX_CONCURRENT
 
 
 # ------------------------------------------------------------------------------------------------------------------- #
@@ -35,53 +49,69 @@ def getlogin():
     print "To avoid this, run api_download.py from Command Prompt or Powershell.\n"
     coah_user = raw_input("User Name:")
     coah_pass = getpass.getpass("Password:")
-    login = sentinelsat.SentinelAPI(coah_user, coah_pass, 'https://scihub.copernicus.eu/dhus')
-    return login
+    return download.login(coah_user, coah_pass, hub_url)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define function get_max_cloud():
+#   1. Ask for the cloud cover percent above which downloads are deferred.
+# ------------------------------------------------------------------------------------------------------------------- #
+def get_max_cloud():
+    max_cloud = raw_input("Defer products with more cloud cover than this percent (default %i):"
+                          % screening.MAX_CLOUD)
+    try:
+        return float(max_cloud)
+    except ValueError:
+        return screening.MAX_CLOUD
 
 
 # ------------------------------------------------------------------------------------------------------------------- #
 # Define function download_single():
 #   1. Ask for a product ID.
-#   2. Download that product.
+#   2. Check its cloud cover and footprint, and ask before downloading a cloudy or non-overlapping product.
+#   3. Download that product.
 # Parameters:
 #   api     - The login credentials assigned by getlogin().
 # ------------------------------------------------------------------------------------------------------------------- #
 def download_single(api):
     print "Download a single product by Copernicus UUID (example: 711cd44e-2948-4f25-a669-05f9b7a6291e)"
-    try:
-        id = raw_input("Enter the product ID :")
-        print "Starting product download..."
-        api.download(id)
-    except:
-        print "An error occurred. Make sure your ID string is valid. Enter the full string, without quotes."
+    id = raw_input("Enter the product ID :").strip()
+    record = download.screen_products(api, [id], clipjson, get_max_cloud())[0][0]
+    screening.report([record])
+    if record["decision"] != screening.DOWNLOAD:
+        confirm = raw_input("Download it anyway? (Y/N):")
+        if len(confirm) == 0 or confirm[0].upper() != "Y":
+            return
+    print "Starting product download..."
+    results = download.download_products(api, [id], workingdir, segments)[0]
+    if results[id]["status"] != downloader.DONE:
+        print "The download failed. Make sure your ID string is valid. Enter the full string, without quotes."
 
 
 # ------------------------------------------------------------------------------------------------------------------- #
 # Define download_cart() function
 #   1. Read 'products.meta4' file from cart download.
-#   2. Download products in cart by UUID.
+#   2. Screen products by metadata: skip those that miss the clip extent, defer those above the cloud threshold.
+#   3. Download products in cart by UUID, clearest first, then deferred products if asked for. Downloads run
+#      side by side up to the hub's per-account limit; failed products are retried without holding up the rest.
+#   4. Report the measured throughput.
 # Parameters:
 #   api     - The login credentials assigned by getlogin().
 # ------------------------------------------------------------------------------------------------------------------- #
 def download_cart(api):
     total_start_time = time.time()
     xml_path = os.path.join(workingdir, 'products.meta4')
-    uuid_list = []
     if os.path.isfile(xml_path):
         print 'Copernicus cart download file found in %s.' % workingdir
-        xml = untangle.parse(xml_path)                                  # Read the XML file
-        for i in range(len(xml.metalink.file)):
-            download = xml.metalink.file[i]                             # Look at file i in XML list
-            url = str(download.url)                                     # Get the URL element as string
-            url_sp = url.split("'")                                     # Isolate the UUID code
-            uuid = url_sp[1]                                            # Assign uuid
-            uuid_list.append(uuid)                                      # Append uuid code to a list
-        for i in range(len(uuid_list)):
-            start_time = time.time()
-            id = uuid_list[i]
-            api.download(id)                                            # Download incrementally by UUID
-            completion_time = time.time() - start_time
-            print "Download completed in %i seconds." % completion_time
+        records, uuid_list, deferred = download.screen_products(api, download.read_cart(xml_path), clipjson,
+                                                                get_max_cloud())
+        screening.report(records)
+        if deferred:
+            later = raw_input("Also download the %i cloudy products after the clear ones? (Y/N):" % len(deferred))
+            if len(later) > 0 and later[0].upper() == "Y":
+                uuid_list = uuid_list + deferred
+        results, elapsed = download.download_products(api, uuid_list, workingdir, segments)
+        downloader.report(results, elapsed)
         total_completion_time = time.time() - total_start_time
         tct_mins = total_completion_time / 60
         print "All downloads completed in %i minutes." % tct_mins
@@ -95,31 +125,37 @@ def download_cart(api):
 #   2. Extract zip files to input directory.
 # ------------------------------------------------------------------------------------------------------------------- #
 def unzip():
-    zipfiles = []
     total_start_time = time.time()
-    allfiles = os.listdir(workingdir)
-    for i in range(len(allfiles)):
-        if (allfiles[i])[-4:] == '.zip':
-            zipfiles.append(allfiles[i])                                # Add zip files to a list
-    for i in range(len(zipfiles)):
-        start_time = time.time()
-        with zipfile.ZipFile(zipfiles[i], 'r') as zipobject:             # Read each zipfile
-            zipobject.extractall(inputdir)                              # Extract to the input folder
-        os.remove(zipfiles[i])                                          # Clean up the downloaded zip
-        completion_time = time.time() - start_time
-        print 'File %s extracted to %s in %i seconds.' % (zipfiles[i], inputdir, completion_time)
+    download.unzip(workingdir, inputdir)
     total_completion_time = time.time() - total_start_time
     tct_mins = total_completion_time / 60
     print "All files unzipped in %i minutes." % tct_mins
 
 
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define ask_mode() function:
+#   1. Ask for a download mode until the answer is 1 or 2. Only the answer is checked here; errors from the downloads
+#      themselves are not caught, so their tracebacks are shown.
+# ------------------------------------------------------------------------------------------------------------------- #
+def ask_mode():
+    while True:
+        try:
+            mode_sel = int(raw_input("Enter your selection (1 or 2):"))
+        except ValueError:
+            mode_sel = None
+        if mode_sel in (1, 2):
+            return mode_sel
+        print "Invalid entry - please enter 1 or 2."
+
+
 # ------------------------------------------------------------------------------------------------------------------- #
 # Define main() function:
 #   1. Run selected download function.
 # Parameters:
-# mode  - The download function to run, based on user input.
+#   api     - The login credentials assigned by getlogin().
+#   mode    - The download function to run, based on user input.
 # ------------------------------------------------------------------------------------------------------------------- #
-def main(mode):
+def main(api, mode):
     if mode == 1:
         download_single(api)
         unzip()
@@ -132,56 +168,33 @@ def main(mode):
 # Mainline
 # ------------------------------------------------------------------------------------------------------------------- #
 
-print "-"*50
-print "Copernicus Data Download Script"
-print "-"*50
-print ""
-
-api = getlogin()
-global api
-
-print "You can download a single product by ID, or products contained in a cart file.\n"
-print "Warning: Files will be downloaded to the working directory of the Command Prompt."
-print "Change the directory to the Sable project location to ensure files are downloaded to the correct folder.\n"
-print "Please make a selection from these options:"
-print "-"*50
-print "1. Download single product by UUID (universally unique identifier)."
-print "2. Download all products in a Copernicus cart download file, 'products.meta4'."
-print "-"*50
-goodsel = False
-while not goodsel:
-    try:
-        mode_sel = raw_input("Enter your selection (1 or 2):")
-        mode_sel = int(mode_sel)
-        if mode_sel > 0 and mode_sel < 3:
-            goodsel = True
+if __name__ == "__main__":
+    print "-"*50
+    print "Copernicus Data Download Script"
+    print "-"*50
+    print ""
+
+    api = getlogin()
+    trace.start(os.path.join(tracedir, "api_download_%s.jsonl" % time.strftime("%Y%m%d_%H%M%S")))
+
+    print "You can download a single product by ID, or products contained in a cart file.\n"
+    print "Warning: Files will be downloaded to the working directory of the Command Prompt."
+    print "Change the directory to the Sable project location to ensure files are downloaded to the correct folder.\n"
+    print "Please make a selection from these options:"
+    print "-"*50
+    print "1. Download single product by UUID (universally unique identifier)."
+    print "2. Download all products in a Copernicus cart download file, 'products.meta4'."
+    print "-"*50
+    main(api, ask_mode())
+    again = "Y"
+    while again[0].upper() == "Y":
+        again = raw_input("Download more files? (Y/N):")
+        if len(again) == 0:
             again = "Y"
-            if mode_sel == 1:
-                main(1)
-            if mode_sel == 2:
-                main(2)
-            while again[0].upper() == "Y":
-                again = raw_input("Download more files? (Y/N):")
-                if len(again) == 0:
-                    again = "Y"
-                elif again[0].upper() == "Y":
-                    mode_sel = raw_input("Enter your selection (1 or 2):")
-                    mode_sel = int(mode_sel)
-                    if mode_sel > 0 and mode_sel < 3:
-                        goodsel = True
-                        again = "Y"
-                        if mode_sel == 1:
-                            main(1)
-                        if mode_sel == 2:
-                            main(2)
-                else:
-                    again = "N"
-                    print "-"*50
-                    print "Goodbye!"
-                    print "-"*50
+        elif again[0].upper() == "Y":
+            main(api, ask_mode())
         else:
-            print "Invalid entry - please enter 1 or 2."
-            goodsel = False
-    except:
-        print "Invalid entry - please enter 1 or 2."
-        goodsel = False
+            again = "N"
+            print "-"*50
+            print "Goodbye!"
+            print "-"*50
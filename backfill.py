@@ -0,0 +1,170 @@
+# =================================================================================================================== #
+# Script Name:	backfill.py
+# Author:	    Brian Laureijs
+# Purpose:      Spread the processing of an archive of Sentinel-2 scenes over worker processes on several machines.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                                      # Requirements:
+# =================================================================================================================== #
+import os                                                               # Directory and file manipulation
+import time                                                             # Trace file names
+import socket                                                           # Worker workspace names
+import argparse                                                         # Command line options
+from sablesat import importer                                           # Import stages
+from sablesat import processing                                         # PCA, masks, classification, coastline
+from sablesat import project                                            # Project folder layout
+from sablesat import catalog                                            # Scene catalog
+from sablesat import parallel                                           # Task records
+from sablesat import taskqueue                                          # Shared task queue
+from sablesat import trace                                              # Stage timing and resource records
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define path variables
+# ------------------------------------------------------------------------------------------------------------------- #
+workingdir = os.getcwd()
+paths = project.paths(workingdir)
+queuefile = os.path.join(workingdir, "sable_tasks.sqlite")              # Task queue (kept between runs)
+tracedir = paths["traces"]
+queuedir = os.path.join(paths["workers"], "queue")                      # Private workspaces of queue workers
+outputdirs = [paths[name] for name in ("pix", "atcor", "pca", "coastline", "masks", "landcover")]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define scene_tasks() function:
+#   1. Add an import task if the scene hasn't been imported yet; its output paths are known in advance, so the
+#      later stages can be queued straight away and wait on it.
+#   2. Add the stage tasks of processing.scene_tasks(); the first ones wait for the import.
+# Parameters:
+#   db              - Scene catalog connection.
+#   scene           - Catalog row of the scene.
+#   clear_cloud     - Scenes with more cloud cover (percent) than this are classified as partially clouded.
+#   correct_first   - Run atmospheric correction before classification.
+#   fast_correction - Use dark object subtraction instead of haze removal and ATCOR.
+# ------------------------------------------------------------------------------------------------------------------- #
+def scene_tasks(db, scene, clear_cloud, correct_first, fast_correction):
+    iid = scene["scene_id"]
+    tasks = []
+    first_deps = []
+    if catalog.stage_status(db, iid).get("import") == "done" and os.path.isfile(scene["merged"] or ""):
+        merged = scene["merged"]
+        pix60 = scene["atmos60"] if os.path.isfile(scene["atmos60"] or "") else None
+    else:
+        merged, mapped, pix60 = importer.output_files(paths["pix"], iid)
+        tasks.append(parallel.Task(iid + ":import", iid, "import", importer.import_product,
+                                   (paths["catalog"], scene["safe_path"], paths["pix"], paths["grids"],
+                                    paths["clip"]), []))
+        first_deps = [iid + ":import"]
+    part_cloud = scene["cloud"] is None or scene["cloud"] > clear_cloud
+    for task in processing.scene_tasks(iid, merged, pix60, part_cloud, correct_first, fast_correction, paths):
+        tasks.append(task._replace(deps=task.deps or first_deps))
+    return tasks
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define submit() function:
+#   1. Register the products in input/ in the scene catalog and queue the tasks of the selected scenes.
+#   2. With --dry-run, print the planned stages instead of queuing them.
+# ------------------------------------------------------------------------------------------------------------------- #
+def submit(args):
+    for folder in outputdirs:
+        if not os.path.isdir(folder) and not args.dry_run:
+            os.makedirs(folder)
+    db = catalog.connect(paths["catalog"], readonly=args.dry_run)  # A dry run registers the products in memory only
+    if os.path.isdir(paths["input"]):
+        catalog.scan(db, paths["input"])
+    else:
+        print "Missing input: %s" % paths["input"]
+    scene_list = catalog.scenes(db, year=args.year, max_cloud=args.max_cloud)
+    tasks = []
+    for scene in scene_list:
+        tasks.extend(scene_tasks(db, scene, args.clear_cloud, args.correct_first, args.fast_correction))
+    if args.dry_run:
+        parallel.print_plan(tasks)
+        return
+    added = taskqueue.submit(taskqueue.connect(args.queue), tasks)
+    print "Queued %i new task(s) for %i scene(s) in %s" % (added, len(scene_list), args.queue)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define work() function:
+#   1. Lease and run tasks until the queue is finished, recording each stage in the scene catalog.
+# ------------------------------------------------------------------------------------------------------------------- #
+def work(args):
+    trace_jsonl = trace.start(os.path.join(tracedir, "backfill_%s_%s.jsonl" %
+                                           (socket.gethostname(), time.strftime("%Y%m%d_%H%M%S"))))
+    db = catalog.connect(paths["catalog"])
+    taskqueue.work(args.queue, os.path.join(queuedir, socket.gethostname()),
+                   on_finish=lambda row, status, detail: catalog.set_stage(db, row["scene"], row["stage"], status,
+                                                                           detail),
+                   lease_time=args.lease, exit_idle=args.exit_idle)
+    trace.summary(trace_jsonl)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define status() function:
+#   1. Print the number of tasks in each state and the error of each failed task.
+# ------------------------------------------------------------------------------------------------------------------- #
+def status(args):
+    db = taskqueue.connect(args.queue)
+    counts = taskqueue.counts(db)
+    for state in (taskqueue.PENDING, taskqueue.LEASED, taskqueue.DONE, taskqueue.FAILED, taskqueue.SKIPPED):
+        print "%-8s %i" % (state, counts.get(state, 0))
+    for row in db.execute("SELECT key, owner, lease_until FROM tasks WHERE status = ?", (taskqueue.LEASED,)):
+        print "Running  %s on %s (lease ends in %i s)" % (row["key"], row["owner"], row["lease_until"] - time.time())
+    for row in db.execute("SELECT key, error FROM tasks WHERE status = ?", (taskqueue.FAILED,)):
+        print "Failed   %s: %s" % (row["key"], (row["error"] or "").strip().split("\n")[-1])
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define retry() function:
+#   1. Return failed and skipped tasks to the queue.
+# ------------------------------------------------------------------------------------------------------------------- #
+def retry(args):
+    print "Requeued %i task(s)." % taskqueue.retry(taskqueue.connect(args.queue))
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define main() function:
+#   1. Submit the archive from one machine, then start "backfill.py work" on every machine (once per free core).
+#      All machines must reach the project folder at the same path, as tasks name their files by full path.
+# ------------------------------------------------------------------------------------------------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Process an archive of scenes on several machines.")
+    parser.add_argument("--queue", default=queuefile, help="Task queue database on shared storage")
+    commands = parser.add_subparsers()
+
+    command = commands.add_parser("submit", help="Queue the scenes in input/")
+    command.add_argument("--year", help="Only scenes acquired in this year (YYYY)")
+    command.add_argument("--max-cloud", type=float, help="Only scenes with at most this cloud cover percent")
+    command.add_argument("--clear-cloud", type=float, default=1.0,
+                         help="Cloud cover percent above which a scene is treated as partially clouded")
+    command.add_argument("--correct-first", action="store_true", help="Correct before classification")
+    command.add_argument("--fast-correction", action="store_true", help="Use dark object subtraction")
+    command.add_argument("--dry-run", action="store_true", help="Print the planned stages without queuing them")
+    command.set_defaults(run=submit)
+
+    command = commands.add_parser("work", help="Run queued tasks on this machine")
+    command.add_argument("--lease", type=float, default=taskqueue.LEASE,
+                         help="Seconds before an unrenewed task is handed to another worker (default %i)"
+                              % taskqueue.LEASE)
+    command.add_argument("--exit-idle", action="store_true",
+                         help="Stop when no task is ready instead of waiting for other workers")
+    command.set_defaults(run=work)
+
+    command = commands.add_parser("status", help="Show queue progress and failed tasks")
+    command.set_defaults(run=status)
+
+    command = commands.add_parser("retry", help="Requeue failed and skipped tasks")
+    command.set_defaults(run=retry)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Mainline
+# ------------------------------------------------------------------------------------------------------------------- #
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# =================================================================================================================== #
+# Script Name:	benchmark.py
+# Author:	    Brian Laureijs
+# Purpose:      Time each processing stage on synthetic Sentinel-2 scenes and compare results across commits.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                                      # Requirements:
+# =================================================================================================================== #
+import os                                                               # Directory and
+import shutil                                                           # file manipulation
+import time                                                             # Processing timer
+import argparse                                                         # Command line options
+from sablesat import bench                                              # Stage kernels and results
+from sablesat import synthetic                                          # Synthetic products
+from sablesat import parallel                                           # Parallel stage execution
+from sablesat import standin                                            # Local stand-in hub
+from sablesat import downloader                                         # Download scheduler
+from sablesat import segmented                                          # Byte range segment downloads
+import sentinelsat                                                      # Copernicus API access
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define path variables
+# ------------------------------------------------------------------------------------------------------------------- #
+workingdir = os.getcwd()
+benchdir = os.path.join(workingdir, "benchmarks")                       # Synthetic scenes and scratch files
+resultsfile = os.path.join(benchdir, "results.jsonl")                   # Kept between runs for comparison
+
+# Acquisition dates for synthetic scenes. The first uses the 2015-2016 OPER naming scheme, the rest the compact
+# scheme, so both branches of readtopix() name parsing are covered.
+DATES = ("20160818", "20170614", "20180826", "20190502", "20190711", "20190903")
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define make_inputs() function:
+#   1. Generate synthetic products for one scene size, reusing them if they already exist (same seeds).
+# Parameters:
+#   size        - Key of synthetic.SIZES.
+#   scenes      - Number of scenes.
+#   cloud       - Cloud fraction for every scene.
+# ------------------------------------------------------------------------------------------------------------------- #
+def make_inputs(size, scenes, cloud):
+    inputdir = os.path.join(benchdir, "input_%s_%i" % (size, int(cloud * 100)))
+    if not os.path.isdir(inputdir):
+        os.makedirs(inputdir)
+    products = []
+    for i in range(scenes):
+        date = DATES[i % len(DATES)]
+        name = synthetic.product_name("S2A", date)[0]
+        safe = os.path.join(inputdir, name)
+        if not os.path.isdir(safe):
+            print "Generating synthetic %s scene %s..." % (size, name)
+            synthetic.make_scene(inputdir, date, size, cloud, seed=i)
+        products.append(safe)
+    return products
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define scene_workdirs() function:
+#   1. Create empty scratch folders, one per scene.
+# ------------------------------------------------------------------------------------------------------------------- #
+def scene_workdirs(products, label):
+    workdirs = []
+    for i in range(len(products)):
+        workdir = os.path.join(benchdir, "scratch", label, "scene_%i" % i)
+        if os.path.isdir(workdir):
+            shutil.rmtree(workdir)
+        os.makedirs(workdir)
+        workdirs.append(workdir)
+    return workdirs
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define time_stages() function:
+#   1. Run every stage for every scene in order, in this process, and record each stage time.
+# ------------------------------------------------------------------------------------------------------------------- #
+def time_stages(products, size):
+    workdirs = scene_workdirs(products, size + "_stages")
+    for i in range(len(products)):
+        for stage in bench.STAGES:
+            seconds = bench.run_stage(stage, products[i], workdirs[i])
+            bench.record(resultsfile, stage, size, 1, seconds)
+            print "%-12s %-8s scene %i: %7.2f seconds" % (stage, size, i, seconds)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define time_batch() function:
+#   1. Run all scenes x stages on the parallel scheduler with a given worker count and record the batch time.
+# ------------------------------------------------------------------------------------------------------------------- #
+def time_batch(products, size, workers):
+    workdirs = scene_workdirs(products, "%s_batch_%i" % (size, workers))
+    tasks = []
+    for i in range(len(products)):
+        sid = "scene_%i" % i
+        for stage in bench.STAGES:
+            deps = [sid + ":" + dep for dep in bench.stage_deps(stage)]
+            tasks.append(parallel.Task(sid + ":" + stage, sid, stage, bench.run_stage,
+                                       (stage, products[i], workdirs[i]), deps))
+    start_time = time.time()
+    failed, skipped = parallel.run(tasks, workers, os.path.join(benchdir, "workers"))
+    seconds = time.time() - start_time
+    if failed:
+        print "Batch with %i workers had failures; not recorded." % workers
+        return
+    bench.record(resultsfile, "batch", size, workers, seconds, len(products))
+    print "batch        %-8s %i workers: %7.2f seconds" % (size, workers, seconds)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define time_downloads() function:
+#   1. Serve stand-in products from a local hub that throttles each connection, like the Copernicus hub.
+#   2. Download them one after another with sentinelsat (the original client), through the scheduler with
+#      sentinelsat, and through the scheduler with byte range segments; record the time of each.
+# Parameters:
+#   count       - Number of products.
+#   size_mb     - Archive size of each product in MB.
+#   bandwidth   - Per connection bandwidth cap in MB/s.
+#   latency     - Seconds added to every request.
+# ------------------------------------------------------------------------------------------------------------------- #
+def time_downloads(count, size_mb, bandwidth, latency):
+    hub = standin.StandinHub(archive_dir=os.path.join(benchdir, "hub"), max_downloads=0,
+                             bandwidth=bandwidth * 2 ** 20, latency=latency).start()
+    uuid_list = []
+    for i in range(count):
+        title = "S2A_MSIL1C_201808%02iT151911_N0206_R068_T20TPQ_201808%02iT184851" % (i + 1, i + 1)
+        uuid_list.append(hub.add_product(title, size=size_mb * 2 ** 20))
+    label = "%iMB" % size_mb
+    variants = [("sentinelsat", 1, None),                       # (name, connections, fetch)
+                ("scheduled", 2, downloader.sentinelsat_fetch),
+                ("segmented", 2, segmented.Fetcher(2, min_segment=2 ** 20)),
+                ("segmented", 4, segmented.Fetcher(4, min_segment=2 ** 20))]
+    for name, connections, fetch in variants:
+        outdir = scene_workdirs([None], "download_%s_%i" % (name, connections))[0]
+        api = sentinelsat.SentinelAPI("benchmark", "benchmark", hub.url, show_progressbars=False)
+        connections_before = hub.connections
+        start_time = time.time()
+        if fetch is None:
+            for uuid in uuid_list:
+                api.download(uuid, outdir)
+        else:
+            per_product = connections if fetch is downloader.sentinelsat_fetch else 1
+            downloader.Scheduler(api, outdir, max_concurrent=per_product, rate=100, burst=100,
+                                 fetch=fetch).run(uuid_list)
+        seconds = time.time() - start_time
+        bench.record(resultsfile, "download_" + name, label, connections, seconds, count)
+        print "download     %-12s %i connection(s): %7.2f seconds, %i TCP connections opened" % \
+              (name, connections, seconds, hub.connections - connections_before)
+    hub.stop()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define main() function:
+#   1. Compare two commits if asked.
+#   2. Time downloads from a stand-in hub if asked.
+#   3. Otherwise generate inputs, then time single stages and parallel batches for each size.
+# ------------------------------------------------------------------------------------------------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark processing stages on synthetic Sentinel-2 scenes.")
+    parser.add_argument("--sizes", default="small", help="Comma separated scene sizes: %s (default small)"
+                        % ", ".join(sorted(synthetic.SIZES)))
+    parser.add_argument("--scenes", type=int, default=2, help="Scenes per size (default 2)")
+    parser.add_argument("--workers", default="1,2,4", help="Comma separated worker counts for batch runs")
+    parser.add_argument("--cloud", type=float, default=0.2, help="Cloud fraction of synthetic scenes (0-1)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="Compare results of two commits")
+    parser.add_argument("--downloads", type=int, metavar="MB", help="Benchmark download clients on products of this"
+                        " size from a local stand-in hub, instead of the processing stages")
+    parser.add_argument("--bandwidth", type=float, default=8.0, help="Stand-in hub MB/s per connection (default 8)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Stand-in hub seconds per request (default 0.1)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(benchdir):
+        os.makedirs(benchdir)
+    if args.compare:
+        bench.compare(resultsfile, args.compare[0], args.compare[1])
+        return
+    if args.downloads:
+        print "Benchmarking downloads for commit %s. Results are appended to %s" % (bench.git_commit(), resultsfile)
+        time_downloads(args.scenes, args.downloads, args.bandwidth, args.latency)
+        shutil.rmtree(os.path.join(benchdir, "scratch"), ignore_errors=True)
+        return
+    print "Benchmarking commit %s. Results are appended to %s" % (bench.git_commit(), resultsfile)
+    for size in args.sizes.split(","):
+        products = make_inputs(size, args.scenes, args.cloud)
+        time_stages(products, size)
+        for workers in args.workers.split(","):
+            time_batch(products, size, int(workers))
+    shutil.rmtree(os.path.join(benchdir, "scratch"), ignore_errors=True)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Mainline
+# ------------------------------------------------------------------------------------------------------------------- #
+if __name__ == "__main__":                                              # Pool workers import this module
+    main()
@@ -11,15 +11,16 @@
 import os                                           # Directory and
 import shutil                                       # file manipulation
 import time                                         # Timer function
-from pci.fimport import *                           # PIX format conversion
-from pci.clip import *                              # Clipping to AOI
-from pci.datamerge import *                         # Merging bands
+import sys                                          # Exit after resuming
+import argparse                                     # Command line options
+from sablesat import catalog                        # Scene catalog
+from sablesat import importer                       # Import stages
+from sablesat import project                        # Project folder layout
+from sablesat import trace                          # Stage timing and resource records
 
 # ------------------------------------------------------------------------------------------------------------------- #
 # Declare global variables
 # ------------------------------------------------------------------------------------------------------------------- #
-global sen2                                         # Sensor name used in pci correction
-sen2 = "Sentinel-2"                                 # functions.
 global workspace_list                               # Workspace directory list
 workspace_list = []                                 # for iterative folder preparation
 
@@ -27,125 +28,17 @@ workspace_list = []                                 # for iterative folder prepa
 # Initialize path variables:
 # ------------------------------------------------------------------------------------------------------------------- #
 workingdir = os.getcwd()                            # Get current working directory
-indir = os.path.join(workingdir, "input")           # Sentinel input files
-clipvec = os.path.join(workingdir, "clip_extent", "clip_ext.pix")
+paths = project.paths(workingdir)                   # Project folders, passed to the import stages
+indir = paths["input"]                              # Sentinel input files
+clipvec = paths["clip"]
 
-mergedir = os.path.join(workingdir, "mergefiles")   # File lists for layer-stacking image
-workspace_list.append(mergedir)
+griddir = paths["grids"]                            # Band merge resampling tables (kept between runs)
 
-pixdir = os.path.join(workingdir, "pix")            # Pix workspace
+pixdir = paths["pix"]                               # Pix workspace
 workspace_list.append(pixdir)
 
-
-# ------------------------------------------------------------------------------------------------------------------- #
-# Define readtopix() function
-#   1. Read folders from input directory to list.
-#   2. Append XML and band resolutions so PCI can read input.
-#   3. Read Sentinel-2 files to Pix format.
-#   4. Append pix files to list.
-# Parameters:
-#   inputdir   - The directory to read raw files from.
-# ------------------------------------------------------------------------------------------------------------------- #
-def readtopix(inputdir):
-    infiles = os.listdir(inputdir)                                  # List input folders
-    for i in range(len(infiles)):                                   # Add paths for S2 band sets
-        fili_10 = "input/" + infiles[i] + "/MTD_MSIL1C.xml?r=%3ABand+Resolution%3A10M"
-        fili_20 = "input/" + infiles[i] + "/MTD_MSIL1C.xml?r=%3ABand+Resolution%3A20M"
-        fili_60 = "input/" + infiles[i] + "/MTD_MSIL1C.xml?r=%3ABand+Resolution%3A60M"
-
-        name_fields = infiles[i].split("_")                         # Set up fields for filenames
-        mission = name_fields[0]
-        date = (name_fields[2])[:8]
-
-        if name_fields[1] == "OPER":                                # Long-format naming scheme from 2015-2016
-            date = (name_fields[5])[:8]
-            findpath = os.path.join(indir, infiles[i])
-            find_xml = os.listdir(findpath)
-            for j in range(len(find_xml)):
-                if find_xml[j][-3:] == "xml" and find_xml[j] != "INSPIRE.xml":
-                    xml_name = find_xml[j]
-
-            fili_10 = "input/" + infiles[i] + "/" + xml_name + "?r=%3ABand+Resolution%3A10M"
-            fili_20 = "input/" + infiles[i] + "/" + xml_name + "?r=%3ABand+Resolution%3A20M"
-            fili_60 = "input/" + infiles[i] + "/" + xml_name + "?r=%3ABand+Resolution%3A60M"
-
-        pix10full = "pix/" + mission + "_" + date + "_10m_full.pix"  # Set up paths for functions
-        pix20full = "pix/" + mission + "_" + date + "_20m_full.pix"
-        pix60full = "pix/" + mission + "_" + date + "_60m_full.pix"
-        pix10 = "pix/" + mission + "_" + date + "_10m_unmerged.pix"
-        pix20 = "pix/" + mission + "_" + date + "_20m_unmerged.pix"
-        pix_merged = "pix/" + mission + "_" + date + "_10m_merged.pix"
-        pix60 = "pix/" + mission + "_" + date + "_60m_atmospheric.pix"
-
-        start_time = time.time()
-        print "Starting pix conversion file %s_%s." % (mission,date)
-        fimport(fili_10, pix10full)         # Import R,G,B,NIR bands
-        fimport(fili_20, pix20full)         # Import RE,NIR,SWIR bands
-        fimport(fili_60, pix60full)         # Import Coastal, Vapour, Cirrus
-
-        clip(fili=pix10full,                # Clip 10m bands
-             dbic=[1, 2, 3, 4],
-             dbsl=[],
-             sltype="",
-             filo=pix10,
-             ftype="PIX",
-             foptions="",
-             clipmeth="LAYERVEC",
-             clipfil=clipvec,
-             cliplay=[2])
-
-        clip(fili=pix20full,                # Clip 20m bands
-             dbic=[1, 2, 3, 4, 5, 6],
-             dbsl=[],
-             sltype="",
-             filo=pix20,
-             ftype="PIX",
-             foptions="",
-             clipmeth="LAYERVEC",
-             clipfil=clipvec,
-             cliplay=[2])
-        
-        clip(fili=pix60full,                # Clip 60m bands
-             dbic=[1, 2, 3],
-             dbsl=[],
-             sltype="",
-             filo=pix60,
-             ftype="PIX",
-             foptions="",
-             clipmeth="LAYERVEC",
-             clipfil=clipvec,
-             cliplay=[2])
-
-        os.remove(pix10full)                # Delete un-clipped images
-        os.remove(pix20full)
-        os.remove(pix60full)
-
-        # The order of data in merge list file matters:
-        # 10m bands first results in resampling of 20m resolution
-        # to 10m resolution. Avoids data loss due to resampling of 10m to 20.
-        mergefile_name = mission + "_" + date + "_merge.txt"
-        mergefile_path = os.path.join(mergedir,mergefile_name)
-
-        path10 = os.path.join(workingdir,pix10)
-        path20 = os.path.join(workingdir,pix20)
-
-        mergefile = open(mergefile_path, "w")
-        mergefile.write('"' + path10 + '"' + "\n")
-        mergefile.write('"' + path20 + '"')
-        mergefile.close()
-
-        datamerge(mfile=mergefile_path,         # Merge 10m bands and 20m bands into one pix file
-                  dbic=[],
-                  filo=pix_merged,
-                  ftype="PIX",
-                  foptions="",
-                  extent="UNION",
-                  nodatval=[],
-                  resample="NEAR")
-
-        completion_time = time.time() - start_time
-        print "Pix conversion completed for image %s_%s in %i seconds." % (mission, date, completion_time)
-        print "Wrote files to:\n\t%s\n\t%s\n\t%s\n\t%s\n" % (pix_merged, pix10, pix20, pix60)
+tracedir = paths["traces"]                          # Stage timing records (kept between runs)
+catalogfile = paths["catalog"]                      # Scene catalog (kept between runs)
 
 
 # ------------------------------------------------------------------------------------------------------------------- #
@@ -181,32 +74,58 @@ def prep_workspace(inputdir,folder_list):
 # ------------------------------------------------------------------------------------------------------------------- #
 # Define mainline function
 #   1. Clear folders if they already exist, create folders if missing
-#   2. Read input to pix format
+#   2. Read input to pix format. Products that fail are reported and recorded in the catalog; the rest carry on.
+#   3. With resume=True, clear nothing and import only the products not imported yet, including failed ones.
+# Parameters:
+#   resume      - Carry on with an earlier import.
 # ------------------------------------------------------------------------------------------------------------------- #
-def main():
+def main(resume=False):
     total_start_time = time.time()
-    prep_workspace(indir, workspace_list)
-    readtopix(indir)
+    trace_jsonl = trace.start(os.path.join(tracedir, "import_%s.jsonl" % time.strftime("%Y%m%d_%H%M%S")))
+    if not resume:
+        prep_workspace(indir, workspace_list)
+    elif not os.path.isdir(pixdir):
+        os.mkdir(pixdir)
+    db = catalog.connect(catalogfile)
+    if not resume:
+        catalog.reset_stages(db)                                    # PIX outputs were cleared
+    with trace.span("import"):
+        failed = importer.readtopix(db, indir, pixdir, griddir, clipvec, resume=resume)
+    if failed:
+        print "Import failed for %i image(s): %s" % (len(failed), ", ".join(failed))
+        print "Run import.py --resume to try them again without clearing the others."
     total_completion_time = time.time() - total_start_time
     tct_minutes = total_completion_time / 60
     print "All images were converted to PIX format in %i minutes." % tct_minutes
+    trace.summary(trace_jsonl)
+    trace_chrome = trace.to_chrome(trace_jsonl, trace_jsonl[:-6] + ".json")     # Open in chrome://tracing
+    print "Stage timings written to\n\t%s\n\t%s" % (trace_jsonl, trace_chrome)
 
 
 # ------------------------------------------------------------------------------------------------------------------- #
 # Mainline
 #   - Loop to stop script from auto-running if user is unaware of file deletion at beginning of script.
 # ------------------------------------------------------------------------------------------------------------------- #
-print "="*50
-print "Sentinel-2 File Processing Script"
-print "="*50
-
-print "Current working directory is %s" % workingdir
-print "Converted PIX directory is %s" % pixdir
-print "Running this script will DELETE existing data from output folders!"
-start = raw_input("Continue? (Y/N):")
-if len(start) == 0:                         # Stop if no answer
-    print " ----- Goodbye"*2, "-----"
-elif start[0].upper() == "Y":               # Start if starts with y
-    main()                                  # Run main()
-else:
-    print " ----- Goodbye"*2, "-----"       # Exit script
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Sentinel-2 products in input/ to PIX stacks.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Import only products not imported yet, including failed ones; clears nothing")
+    args = parser.parse_args()
+
+    print "="*50
+    print "Sentinel-2 File Processing Script"
+    print "="*50
+
+    print "Current working directory is %s" % workingdir
+    print "Converted PIX directory is %s" % pixdir
+    if args.resume:                         # Nothing is deleted when resuming
+        main(resume=True)
+        sys.exit()
+    print "Running this script will DELETE existing data from output folders!"
+    start = raw_input("Continue? (Y/N):")
+    if len(start) == 0:                     # Stop if no answer
+        print " ----- Goodbye"*2, "-----"
+    elif start[0].upper() == "Y":           # Start if starts with y
+        main()                              # Run main()
+    else:
+        print " ----- Goodbye"*2, "-----"   # Exit script
@@ -0,0 +1,8 @@
+# =================================================================================================================== #
+# Package Name: sablesat
+# Author:	    Brian Laureijs
+# Purpose:      Shared raster and pipeline helpers used by the Sable Island processing scripts.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
@@ -0,0 +1,143 @@
+# =================================================================================================================== #
+# Script Name:	atmos.py
+# Author:	    Brian Laureijs
+# Purpose:      Per-scene atmospheric parameter estimation and caching, and dark object subtraction.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # File checks
+import json                                         # Parameter cache files
+import time                                         # Processing timer
+import numpy                                        # Array processing
+from osgeo import gdal                              # Corrected PIX output
+from sablesat import raster                         # Windowed PIX access
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+BLUE_BAND = 1                                       # B2 in the merged 10m stack
+RED_BAND = 3                                        # B4 in the merged 10m stack
+DARK_FRACTION = 0.0001                              # Darkest 0.01% of pixels taken as the dark object value
+HAZE_RANGE = (10, 90)                               # Limits for the hazecov value passed to hazerem
+SUMMER = ("05", "06", "07", "08", "09", "10")       # Months processed with the ATCOR "summer" atmosphere
+STRIP_ROWS = 512                                    # Rows read per pass
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define percentile_value() function:
+#   1. Return the smallest histogram bin whose cumulative count reaches the given fraction of all counts.
+# Parameters:
+#   histogram   - Counts per value, as from numpy.bincount.
+#   fraction    - Fraction between 0 and 1.
+# ------------------------------------------------------------------------------------------------------------------- #
+def percentile_value(histogram, fraction):
+    cumulative = numpy.cumsum(histogram)
+    if cumulative[-1] == 0:
+        return 0
+    return int(numpy.searchsorted(cumulative, fraction * cumulative[-1]))
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define estimate_params() function:
+#   1. Build per-band histograms of valid (non-zero) pixels in one pass over the merged stack.
+#   2. Take the dark object value of each band from the bottom of its histogram.
+#   3. Estimate haze coverage with the haze optimized transform (HOT = blue - 0.5 * red): the percentage of pixels
+#      whose HOT lies more than three median absolute deviations above the median.
+#   4. Pick the ATCOR atmosphere condition from the acquisition month.
+# Parameters:
+#   merged      - The merged 10m stack (PIX, or its mapped/chunked copy).
+#   identifier  - Unique identifier string (mission_date) read from input file name.
+# ------------------------------------------------------------------------------------------------------------------- #
+def estimate_params(merged, identifier):
+    stack = raster.open_stack(raster.best_source(merged))
+    bands = range(1, stack.count + 1)
+    histograms = numpy.zeros((stack.count, 65536), dtype=numpy.int64)
+    hot_histogram = numpy.zeros(3 * 65536, dtype=numpy.int64)       # 2 * HOT spans -65535..131070
+    for yoff, ysize in raster.strips(stack.ysize, STRIP_ROWS):
+        data = stack.read(bands, 0, yoff, stack.xsize, ysize)
+        valid = numpy.all(data > 0, axis=0)
+        for i in range(stack.count):
+            histograms[i] += numpy.bincount(data[i][valid], minlength=65536)
+        hot = 2 * data[BLUE_BAND - 1][valid].astype(numpy.int64) - data[RED_BAND - 1][valid]
+        hot_histogram += numpy.bincount(hot + 65536, minlength=3 * 65536)
+    stack.close()
+
+    dark = [percentile_value(histograms[i], DARK_FRACTION) for i in range(len(bands))]
+    median = percentile_value(hot_histogram, 0.5)
+    values = numpy.arange(hot_histogram.size)
+    deviation = numpy.bincount(numpy.abs(values - median), weights=hot_histogram)
+    mad = max(1, percentile_value(deviation, 0.5))
+    hazy = hot_histogram[median + 3 * mad + 1:].sum()
+    total = max(1, hot_histogram.sum())
+    hazecov = int(round(100.0 * hazy / total))
+    hazecov = min(max(hazecov, HAZE_RANGE[0]), HAZE_RANGE[1])
+
+    month = identifier.split("_")[1][4:6]
+    return {"identifier": identifier,
+            "dark": dark,
+            "hazecov": hazecov,
+            "atmdef": "Maritime",
+            "atmcond": "summer" if month in SUMMER else "winter"}
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define scene_params() function:
+#   1. Return cached parameters for the scene if they were estimated before.
+#   2. Otherwise estimate them and write them to the cache.
+# Parameters:
+#   merged      - The merged 10m stack.
+#   identifier  - Unique identifier string; the cache file is <cachedir>/<identifier>.json.
+#   cachedir    - Folder of cached parameter files. Not cleared between runs.
+# ------------------------------------------------------------------------------------------------------------------- #
+def scene_params(merged, identifier, cachedir):
+    cache_file = os.path.join(cachedir, identifier + ".json")
+    if os.path.isfile(cache_file):
+        params_file = open(cache_file, "r")
+        params = json.load(params_file)
+        params_file.close()
+        print "Using cached atmospheric parameters for %s." % identifier
+        return params
+    start_time = time.time()
+    params = estimate_params(merged, identifier)
+    if not os.path.isdir(cachedir):
+        os.makedirs(cachedir)
+    params_file = open(cache_file, "w")
+    json.dump(params, params_file, indent=1)
+    params_file.close()
+    completion_time = time.time() - start_time
+    print "Atmospheric parameters for %s estimated in %i seconds (haze coverage %i%%)." % \
+          (identifier, completion_time, params["hazecov"])
+    return params
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define dos_correct() function:
+#   1. Subtract each band's dark object value from the merged stack, clamping at 1 so data stays distinct from the
+#      zero nodata value.
+#   2. Write the result as a 16-bit PIX file with the input band order.
+# Parameters:
+#   merged      - The merged 10m stack.
+#   dosout      - The output corrected PIX file.
+#   dark        - Dark object value per band, from scene_params().
+# ------------------------------------------------------------------------------------------------------------------- #
+def dos_correct(merged, dosout, dark):
+    start_time = time.time()
+    stack = raster.open_stack(raster.best_source(merged))
+    bands = range(1, stack.count + 1)
+    offsets = numpy.array(dark, dtype=numpy.int32).reshape(-1, 1, 1)
+    out = raster.create_like(dosout, stack, stack.count, gdal.GDT_UInt16)
+    for yoff, ysize in raster.strips(stack.ysize, STRIP_ROWS):
+        data = stack.read(bands, 0, yoff, stack.xsize, ysize)
+        corrected = numpy.clip(data.astype(numpy.int32) - offsets, 1, 65535).astype(numpy.uint16)
+        corrected[data == 0] = 0                                    # Keep nodata
+        for i in range(len(bands)):
+            out.GetRasterBand(i + 1).WriteArray(corrected[i], 0, yoff)
+    out.FlushCache()
+    out = None
+    stack.close()
+    completion_time = time.time() - start_time
+    print "Dark object subtraction completed in %i seconds. Output to \n\t%s" % (completion_time, dosout)
+    return dosout
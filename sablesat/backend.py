@@ -0,0 +1,81 @@
+# =================================================================================================================== #
+# Script Name:	backend.py
+# Author:	    Brian Laureijs
+# Purpose:      Load heavy backend libraries (arcpy, PCI, GDAL, numpy) on first use instead of at import.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import time                                         # Load timer
+import importlib                                    # Import on first use
+from sablesat import trace                          # Stage timing and resource records
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+loaded = {}                                         # Module name -> seconds it took to import in this process
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define load() function:
+#   1. Import a module, recording the import time in `loaded` and as a "load_backend" span in the trace.
+# ------------------------------------------------------------------------------------------------------------------- #
+def load(name):
+    start_time = time.time()
+    with trace.span("load_backend", name):
+        module = importlib.import_module(name)
+    loaded.setdefault(name, time.time() - start_time)
+    return module
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define module class:
+#   - Stands in for a module and imports it the first time one of its attributes is used.
+#   Example:
+#       arcpy = backend.module("arcpy")             # Instead of "import arcpy"
+#       arcpy.env.workspace = gdb                   # arcpy is imported here
+#   Parameters:
+#       name    - Full module name, e.g. "osgeo.gdal".
+# ------------------------------------------------------------------------------------------------------------------- #
+class module(object):
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__["_module"] = load(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        return "<lazy module %s%s>" % (self._name, "" if self._module is None else " (loaded)")
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define function class:
+#   - Stands in for a function of a module that isn't imported yet, e.g. one PCI algorithm, and imports the module
+#     on the first call.
+#   Example:
+#       pcimod = backend.function("pci.pcimod", "pcimod")   # Instead of "from pci.pcimod import *"
+#   Parameters:
+#       name    - Full module name.
+#       attr    - Function name in the module.
+# ------------------------------------------------------------------------------------------------------------------- #
+class function(object):
+    def __init__(self, name, attr):
+        self.name = name
+        self.attr = attr
+        self.func = None
+
+    def __call__(self, *args, **kwargs):
+        if self.func is None:
+            self.func = getattr(load(self.name), self.attr)
+        return self.func(*args, **kwargs)
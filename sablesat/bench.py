@@ -0,0 +1,312 @@
+# =================================================================================================================== #
+# Script Name:	bench.py
+# Author:	    Brian Laureijs
+# Purpose:      Reference stage kernels and result storage for benchmarking on synthetic scenes.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory and file manipulation
+import json                                         # Result records
+import time                                         # Processing timer
+import socket                                       # Host name in results
+import subprocess                                   # Current git commit
+import numpy                                        # Array processing
+from osgeo import gdal                              # PIX output
+from sablesat import raster                         # Windowed PIX access
+from sablesat import mapped                         # Memory-mapped merged stack
+from sablesat import resample                       # Band merging on cached resampling tables
+from sablesat import synthetic                      # Synthetic products
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+STAGES = ("import", "merge", "pca", "kmeans", "mask", "coastline", "land_cover")
+STRIP_ROWS = 512                                    # Rows per strip for full-image passes
+NSAM = 20000                                        # Training pixels sampled for k-means, like kclus nsam
+
+# The kernels below follow the PCI/ArcGIS stages in import.py and image_processing.py step for step (same bands,
+# cluster counts, iteration limits and intermediate files), using numpy and GDAL in place of the licensed
+# functions. They give a stable, licence-free baseline for comparing I/O layout, scheduling and memory changes
+# across commits; absolute times will differ from the PCI functions.
+#
+# Each kernel takes a scene working folder holding the files of the previous stage:
+#   import      - Clip (read) band GeoTIFFs and write 10m, 20m and 60m unmerged PIX stacks.      (fimport/clip)
+#   merge       - Resample 20m to 10m by nearest neighbour and write the merged PIX + mapped copy.  (resample.merge)
+#   pca         - Covariance pass and projection onto the first 3 principal components.           (pca)
+#   kmeans      - 2-cluster k-means on the 3 PCA channels (land/ocean).                         (kclus in coastline)
+#   mask        - 2-cluster k-means on the 60m cirrus band, upsampled to a 10m cloud mask.       (mask_clouds)
+#   coastline   - Boundary pixels between the land and ocean classes.                 (ras2poly, PolygonToLine)
+#   land_cover  - 24-cluster k-means on all 13 channels.                                   (kclus in land_cover)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define kmeans() function:
+#   1. Start from random samples (or the given centres) and iterate nearest-centre assignment and centre update.
+#   2. Stop after maxiter iterations, or when no centre moves more than movethrs of the data range.
+#   3. Return the centres and the number of iterations run.
+# Parameters:
+#   samples     - Training pixels, shape (n, channels).
+#   k           - Number of clusters.
+#   maxiter     - Iteration limit (kclus maxiter).
+#   movethrs    - Movement threshold (kclus movethrs).
+#   seed        - Random seed for the starting centres.
+#   centres     - Optional starting centres, shape (k, channels).
+# ------------------------------------------------------------------------------------------------------------------- #
+def kmeans(samples, k, maxiter=20, movethrs=0.01, seed=0, centres=None):
+    samples = samples.astype(numpy.float64)
+    if centres is None:
+        rng = numpy.random.RandomState(seed)
+        centres = samples[rng.choice(len(samples), k, replace=False)]
+    centres = numpy.array(centres, dtype=numpy.float64)
+    spread = numpy.ptp(samples, axis=0).max() or 1.0
+    for iteration in range(1, maxiter + 1):
+        labels = nearest(samples, centres)
+        moved = centres.copy()
+        for c in range(k):
+            members = samples[labels == c]
+            if len(members):
+                moved[c] = members.mean(axis=0)
+        shift = numpy.abs(moved - centres).max() / spread
+        centres = moved
+        if shift < movethrs:
+            break
+    return centres, iteration
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define nearest() function:
+#   1. Return the index of the nearest centre for each pixel (squared euclidean distance).
+# Parameters:
+#   pixels      - Shape (n, channels).
+#   centres     - Shape (k, channels).
+# ------------------------------------------------------------------------------------------------------------------- #
+def nearest(pixels, centres):
+    distance = (centres ** 2).sum(axis=1) - 2 * numpy.dot(pixels, centres.T)   # |p|^2 is the same for every centre
+    return distance.argmin(axis=1)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define classify() function:
+#   1. Sample training pixels, fit k-means, then label every pixel strip by strip.
+#   2. Write the labels as an 8-bit PIX file and return the number of iterations.
+# Parameters:
+#   stack       - Stack to classify (RasterStack, MappedStack or ChunkStore).
+#   bands       - 1-based bands to use.
+#   k           - Number of clusters.
+#   classout    - The output classification PIX file.
+# ------------------------------------------------------------------------------------------------------------------- #
+def classify(stack, bands, k, classout, seed=0):
+    rng = numpy.random.RandomState(seed)
+    rows = rng.randint(0, stack.ysize, NSAM)
+    cols = rng.randint(0, stack.xsize, NSAM)
+    samples = numpy.empty((NSAM, len(bands)))
+    for i in range(len(bands)):
+        samples[:, i] = stack.read([bands[i]], 0, 0, stack.xsize, stack.ysize)[0][rows, cols]
+    centres, iterations = kmeans(samples, k, seed=seed)
+    out = raster.create_like(classout, stack, 1, gdal.GDT_Byte)
+    for yoff, ysize in raster.strips(stack.ysize, STRIP_ROWS):
+        data = stack.read(bands, 0, yoff, stack.xsize, ysize).astype(numpy.float64)
+        pixels = data.reshape(len(bands), -1).T
+        labels = nearest(pixels, centres).reshape(ysize, stack.xsize).astype(numpy.uint8)
+        out.GetRasterBand(1).WriteArray(labels, 0, yoff)
+    out = None
+    return iterations
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define write_pix() function:
+#   1. Write a (bands, rows, cols) array to a PIX file on a given grid.
+# ------------------------------------------------------------------------------------------------------------------- #
+def write_pix(path, data, geotransform, projection):
+    out = gdal.GetDriverByName("PCIDSK").Create(path, data.shape[2], data.shape[1], data.shape[0],
+                                                raster.numpy_gdal_type(data.dtype))
+    out.SetGeoTransform(geotransform)
+    out.SetProjection(projection)
+    for i in range(data.shape[0]):
+        out.GetRasterBand(i + 1).WriteArray(data[i])
+    out = None
+    return path
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define stage kernels: see the table at the top of this file.
+# Parameters:
+#   safe        - The synthetic product folder (import only).
+#   workdir     - The scene working folder.
+# ------------------------------------------------------------------------------------------------------------------- #
+def stage_import(safe, workdir):
+    for res in (10, 20, 60):
+        files = synthetic.band_files(safe, res)
+        first = gdal.Open(files[0])
+        data = numpy.array([gdal.Open(f).ReadAsArray() for f in files])
+        write_pix(os.path.join(workdir, "%im_unmerged.pix" % res), data, first.GetGeoTransform(),
+                  first.GetProjection())
+
+
+def grid_cache(workdir):
+    return os.path.join(os.path.dirname(workdir), "grids")         # Shared by the scenes, like cache/grids
+
+
+def stage_merge(workdir):
+    merged = os.path.join(workdir, "10m_merged.pix")
+    resample.merge([(os.path.join(workdir, "10m_unmerged.pix"), "nearest"),
+                    (os.path.join(workdir, "20m_unmerged.pix"), "nearest")], merged, grid_cache(workdir))
+    mapped.write_mapped(merged, os.path.join(workdir, "10m_merged.dat"))
+
+
+def stage_pca(workdir):
+    stack = mapped.MappedStack(os.path.join(workdir, "10m_merged.dat"))
+    bands = range(1, stack.count + 1)
+    total = numpy.zeros(stack.count)
+    products = numpy.zeros((stack.count, stack.count))
+    for yoff, ysize in raster.strips(stack.ysize, STRIP_ROWS):     # One pass: sums and cross products
+        pixels = stack.read(bands, 0, yoff, stack.xsize, ysize).reshape(stack.count, -1).astype(numpy.float64)
+        total += pixels.sum(axis=1)
+        products += numpy.dot(pixels, pixels.T)
+    n = stack.xsize * stack.ysize
+    mean = total / n
+    covariance = products / n - numpy.outer(mean, mean)
+    values, vectors = numpy.linalg.eigh(covariance)
+    vectors = vectors[:, ::-1][:, :3]                               # First three eigenchannels
+    out = raster.create_like(os.path.join(workdir, "pca.pix"), stack, 3, gdal.GDT_Float32)
+    for yoff, ysize in raster.strips(stack.ysize, STRIP_ROWS):
+        pixels = stack.read(bands, 0, yoff, stack.xsize, ysize).reshape(stack.count, -1).astype(numpy.float64)
+        components = numpy.dot(vectors.T, pixels - mean[:, None]).reshape(3, ysize, stack.xsize)
+        for i in range(3):
+            out.GetRasterBand(i + 1).WriteArray(components[i].astype(numpy.float32), 0, yoff)
+    out = None
+
+
+def stage_kmeans(workdir):
+    stack = raster.RasterStack(os.path.join(workdir, "pca.pix"))
+    classify(stack, [1, 2, 3], 2, os.path.join(workdir, "coastline_class.pix"))
+
+
+def stage_mask(workdir):
+    stack60 = raster.RasterStack(os.path.join(workdir, "60m_unmerged.pix"))
+    classify(stack60, [3], 2, os.path.join(workdir, "cloud_class.pix"))
+    labels = raster.RasterStack(os.path.join(workdir, "cloud_class.pix")).read([1], 0, 0, stack60.xsize,
+                                                                               stack60.ysize)[0]
+    cirrus = stack60.read([3], 0, 0, stack60.xsize, stack60.ysize)[0]
+    cloudy = 1 if cirrus[labels == 1].mean() > cirrus[labels == 0].mean() else 0
+    grid10 = raster.RasterStack(os.path.join(workdir, "10m_unmerged.pix"))
+    mask = resample.apply((labels == cloudy).astype(numpy.uint8),  # 60m to 10m gather on a cached table
+                          resample.table(stack60, grid10, "nearest", grid_cache(workdir)))
+    write_pix(os.path.join(workdir, "clouds.pix"), mask[None], grid10.geotransform, grid10.projection)
+
+
+def stage_coastline(workdir):
+    labels = raster.RasterStack(os.path.join(workdir, "coastline_class.pix"))
+    classes = labels.read([1], 0, 0, labels.xsize, labels.ysize)[0]
+    edges = numpy.zeros(classes.shape, dtype=numpy.uint8)
+    edges[:, 1:] |= classes[:, 1:] != classes[:, :-1]               # Class changes across columns
+    edges[1:, :] |= classes[1:, :] != classes[:-1, :]               # and across rows
+    write_pix(os.path.join(workdir, "coastline.pix"), edges[None], labels.geotransform, labels.projection)
+
+
+def stage_land_cover(workdir):
+    merged = raster.RasterStack(os.path.join(workdir, "10m_merged.pix"))
+    pca = raster.RasterStack(os.path.join(workdir, "pca.pix"))
+    data = numpy.concatenate([merged.read(range(1, 11), 0, 0, merged.xsize, merged.ysize).astype(numpy.float32),
+                              pca.read([1, 2, 3], 0, 0, pca.xsize, pca.ysize)])
+    stacked = os.path.join(workdir, "landcover_input.dat")
+    out = raster.create_like(stacked, merged, 13, gdal.GDT_Float32, driver="ENVI", options=["INTERLEAVE=BSQ"])
+    for i in range(13):
+        out.GetRasterBand(i + 1).WriteArray(data[i])
+    out = None
+    classify(mapped.MappedStack(stacked), range(1, 14), 24, os.path.join(workdir, "landcover.pix"))
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define run_stage() function:
+#   1. Run one stage kernel for one scene and return its wall time in seconds.
+# Parameters:
+#   stage       - Stage name from STAGES.
+#   safe        - The synthetic product folder.
+#   workdir     - The scene working folder.
+# ------------------------------------------------------------------------------------------------------------------- #
+def run_stage(stage, safe, workdir):
+    start_time = time.time()
+    if stage == "import":
+        stage_import(safe, workdir)
+    else:
+        globals()["stage_" + stage](workdir)
+    return time.time() - start_time
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define stage_deps() function:
+#   1. Return the stages a stage needs finished first, mirroring image_processing.main().
+# ------------------------------------------------------------------------------------------------------------------- #
+def stage_deps(stage):
+    return {"import": [],
+            "merge": ["import"],
+            "pca": ["merge"],
+            "kmeans": ["pca"],
+            "mask": ["import"],
+            "coastline": ["kmeans", "mask"],
+            "land_cover": ["pca", "mask"]}[stage]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define git_commit() function:
+#   1. Return the current git commit of the project, or "unknown" outside a git checkout.
+# ------------------------------------------------------------------------------------------------------------------- #
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define record() function:
+#   1. Append one benchmark result to the results file, tagged with commit, host and time.
+# Parameters:
+#   results     - The JSON lines results file.
+#   stage       - Stage name, or "batch" for a whole parallel run.
+#   size        - Scene size key.
+#   workers     - Number of worker processes.
+#   seconds     - Wall time.
+#   scenes      - Number of scenes in the measurement.
+# ------------------------------------------------------------------------------------------------------------------- #
+def record(results, stage, size, workers, seconds, scenes=1):
+    entry = {"commit": git_commit(),
+             "host": socket.gethostname(),
+             "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+             "stage": stage,
+             "size": size,
+             "workers": workers,
+             "scenes": scenes,
+             "seconds": seconds}
+    out = open(results, "a")
+    out.write(json.dumps(entry) + "\n")
+    out.close()
+    return entry
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define compare() function:
+#   1. Print the median time of each (stage, size, workers) for two commits and the ratio between them.
+# Parameters:
+#   results     - The JSON lines results file.
+#   base        - Baseline commit.
+#   head        - Commit to compare against the baseline.
+# ------------------------------------------------------------------------------------------------------------------- #
+def compare(results, base, head):
+    times = {}
+    source = open(results, "r")
+    for line in source:
+        entry = json.loads(line)
+        key = (entry["stage"], entry["size"], entry["workers"])
+        times.setdefault(entry["commit"], {}).setdefault(key, []).append(entry["seconds"])
+    source.close()
+    print "%-12s %-8s %7s %10s %10s %8s" % ("Stage", "Size", "Workers", base, head, "Ratio")
+    for key in sorted(set(times.get(base, {})) & set(times.get(head, {}))):
+        before = numpy.median(times[base][key])
+        after = numpy.median(times[head][key])
+        print "%-12s %-8s %7i %10.2f %10.2f %8.2f" % (key[0], key[1], key[2], before, after, after / before)
@@ -0,0 +1,320 @@
+# =================================================================================================================== #
+# Script Name:	catalog.py
+# Author:	    Brian Laureijs
+# Purpose:      Persistent SQLite catalog of Sentinel-2 products, their files and processing stage status.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory listing
+import re                                           # Metadata parsing
+import time                                         # Update times
+import sqlite3                                      # Catalog database
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenes (
+    scene_id    TEXT PRIMARY KEY,   -- <mission>_<date>, the identifier used in every output file name
+    product     TEXT UNIQUE,        -- SAFE folder name
+    mission     TEXT,
+    date        TEXT,               -- YYYYMMDD
+    tile        TEXT,               -- MGRS tile, e.g. T20TPQ (NULL if not found)
+    naming      TEXT,               -- 'OPER' (2015-2016) or 'compact'
+    xml_name    TEXT,               -- Metadata XML that PCI opens the product through
+    cloud       REAL,               -- Cloud cover percent from product metadata (NULL if unknown)
+    safe_path   TEXT,
+    merged      TEXT,               -- Merged 10m PIX stack
+    mapped      TEXT,               -- Memory-mapped copy of the merged stack
+    atmos60     TEXT,               -- Clipped 60m atmospheric bands
+    added       TEXT
+);
+CREATE INDEX IF NOT EXISTS scenes_date ON scenes (date);
+CREATE TABLE IF NOT EXISTS stages (
+    scene_id    TEXT,
+    stage       TEXT,               -- import, pca, mask, land_cover, coastline, correction, ...
+    status      TEXT,               -- done, failed, skipped, or quarantined (stage "quarantine")
+    updated     TEXT,
+    detail      TEXT,
+    PRIMARY KEY (scene_id, stage)
+);
+"""
+FILE_COLUMNS = ("safe_path", "merged", "mapped", "atmos60")
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define connect() function:
+#   1. Open (or create) the catalog database and make sure the tables exist.
+#   2. With readonly=True, return an in-memory copy instead. The file is read if it exists but is never created or
+#      changed, so dry runs can register and plan scenes without touching the project.
+# Parameters:
+#   path        - The catalog database file.
+#   readonly    - Work on a copy in memory.
+# ------------------------------------------------------------------------------------------------------------------- #
+def connect(path, readonly=False):
+    db = sqlite3.connect(":memory:" if readonly else path, timeout=30)  # Wait out short locks from other processes
+    db.row_factory = sqlite3.Row                                    # Rows indexable by column name
+    db.text_factory = str                                           # Plain strings for PCI and arcpy paths
+    db.executescript(SCHEMA)
+    if readonly and os.path.isfile(path):
+        db.execute("ATTACH DATABASE ? AS disk", (path,))
+        for table in ("scenes", "stages"):
+            db.execute("INSERT INTO main.%s SELECT * FROM disk.%s" % (table, table))
+        db.commit()
+        db.execute("DETACH DATABASE disk")
+    return db
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define parse_product() function:
+#   1. Read mission, date, tile and naming scheme from a SAFE folder name.
+#       OPER:    S2A_OPER_PRD_MSIL1C_PDMC_20160818T201617_R068_V20160818T151912_20160818T151912.SAFE
+#       compact: S2A_MSIL1C_20180826T151911_N0206_R068_T20TPQ_20180826T184851.SAFE
+#   2. Return None if the name is not a Sentinel-2 product.
+# Parameters:
+#   product     - The SAFE folder name.
+# ------------------------------------------------------------------------------------------------------------------- #
+def parse_product(product):
+    name_fields = product.split("_")
+    if len(name_fields) < 6 or not name_fields[0].startswith("S2"):
+        return None
+    if name_fields[1] == "OPER":                                    # Date field matches readtopix() file names
+        return {"mission": name_fields[0], "date": name_fields[5][:8], "tile": None, "naming": "OPER"}
+    return {"mission": name_fields[0], "date": name_fields[2][:8], "tile": name_fields[5], "naming": "compact"}
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define read_metadata() function:
+#   1. Find the metadata XML that PCI opens the product through.
+#   2. Read the cloud cover percent, and the tile from the granule folder for OPER products.
+# Parameters:
+#   safe_path   - The product folder.
+#   naming      - 'OPER' or 'compact'.
+# ------------------------------------------------------------------------------------------------------------------- #
+def read_metadata(safe_path, naming):
+    xml_name = "MTD_MSIL1C.xml"
+    tile = None
+    if naming == "OPER":
+        find_xml = os.listdir(safe_path)
+        for j in range(len(find_xml)):
+            if find_xml[j][-3:] == "xml" and find_xml[j] != "INSPIRE.xml":
+                xml_name = find_xml[j]
+        granule = os.path.join(safe_path, "GRANULE")
+        if os.path.isdir(granule):
+            for name in os.listdir(granule):
+                match = re.search(r"_(T\d\d[A-Z]{3})_", name)
+                if match:
+                    tile = match.group(1)
+    cloud = None
+    xml_path = os.path.join(safe_path, xml_name)
+    if os.path.isfile(xml_path):
+        xml = open(xml_path, "r")
+        match = re.search(r"<Cloud_Coverage_Assessment>([\d.]+)</Cloud_Coverage_Assessment>", xml.read())
+        xml.close()
+        if match:
+            cloud = float(match.group(1))
+    return xml_name, tile, cloud
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define scene_id() function:
+#   1. Return the scene ID (<mission>_<date>) for a SAFE folder or zip name, or None if it is not a product.
+# ------------------------------------------------------------------------------------------------------------------- #
+def scene_id(product):
+    fields = parse_product(os.path.basename(product))
+    if fields is None:
+        return None
+    return fields["mission"] + "_" + fields["date"]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define register() function:
+#   1. Add a product folder to the catalog, or refresh its record, and return its scene ID (None if the folder is
+#      not a Sentinel-2 product).
+# Parameters:
+#   db          - Catalog connection.
+#   safe_path   - The unzipped SAFE folder.
+# ------------------------------------------------------------------------------------------------------------------- #
+def register(db, safe_path):
+    product = os.path.basename(safe_path.rstrip("/\\"))
+    fields = parse_product(product)
+    if fields is None:
+        return None
+    xml_name, tile, cloud = read_metadata(safe_path, fields["naming"])
+    sid = fields["mission"] + "_" + fields["date"]
+    db.execute("INSERT OR IGNORE INTO scenes (scene_id, added) VALUES (?, ?)",
+               (sid, time.strftime("%Y-%m-%d %H:%M:%S")))
+    db.execute("UPDATE scenes SET product = ?, mission = ?, date = ?, tile = COALESCE(?, tile), naming = ?, "
+               "xml_name = ?, cloud = COALESCE(?, cloud), safe_path = ? WHERE scene_id = ?",
+               (product, fields["mission"], fields["date"], tile or fields["tile"], fields["naming"], xml_name,
+                cloud, safe_path, sid))
+    db.commit()
+    return sid
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define scan() function:
+#   1. Register every Sentinel-2 product folder in the input directory, adding new ones and refreshing paths.
+#   2. Return the scene IDs found, in acquisition date order.
+# Parameters:
+#   db          - Catalog connection.
+#   inputdir    - The input directory of unzipped SAFE folders.
+# ------------------------------------------------------------------------------------------------------------------- #
+def scan(db, inputdir):
+    found = []
+    for product in sorted(os.listdir(inputdir)):
+        sid = register(db, os.path.join(inputdir, product))
+        if sid is not None:
+            found.append((sid.split("_")[1], sid))
+    return [sid for date, sid in sorted(found)]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define get() function:
+#   1. Return the catalog row of one scene, or None.
+# ------------------------------------------------------------------------------------------------------------------- #
+def get(db, scene_id):
+    return db.execute("SELECT * FROM scenes WHERE scene_id = ?", (scene_id,)).fetchone()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define set_files() function:
+#   1. Record output file locations for a scene.
+# Parameters:
+#   db          - Catalog connection.
+#   scene_id    - The scene.
+#   files       - Keyword arguments naming FILE_COLUMNS, e.g. merged="D:\\Sable\\pix\\S2A_20180826_10m_merged.pix".
+# ------------------------------------------------------------------------------------------------------------------- #
+def set_files(db, scene_id, **files):
+    for column in files:
+        if column not in FILE_COLUMNS:
+            raise ValueError("Unknown catalog file column %s" % column)
+        db.execute("UPDATE scenes SET %s = ? WHERE scene_id = ?" % column, (files[column], scene_id))
+    db.commit()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define set_cloud() function:
+#   1. Record the cloud cover percent of a scene.
+# ------------------------------------------------------------------------------------------------------------------- #
+def set_cloud(db, scene_id, cloud):
+    db.execute("UPDATE scenes SET cloud = ? WHERE scene_id = ?", (cloud, scene_id))
+    db.commit()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define set_stage() function:
+#   1. Record the status of a processing stage for a scene.
+# Parameters:
+#   db          - Catalog connection.
+#   scene_id    - The scene.
+#   stage       - Stage name.
+#   status      - "done", "failed" or "skipped".
+#   detail      - Optional text, e.g. the error message.
+# ------------------------------------------------------------------------------------------------------------------- #
+def set_stage(db, scene_id, stage, status, detail=None):
+    db.execute("INSERT OR REPLACE INTO stages (scene_id, stage, status, updated, detail) VALUES (?, ?, ?, ?, ?)",
+               (scene_id, stage, status, time.strftime("%Y-%m-%d %H:%M:%S"), detail))
+    db.commit()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define stage_status() function:
+#   1. Return {stage: status} for a scene.
+# ------------------------------------------------------------------------------------------------------------------- #
+def stage_status(db, scene_id):
+    rows = db.execute("SELECT stage, status FROM stages WHERE scene_id = ?", (scene_id,)).fetchall()
+    return dict([(row["stage"], row["status"]) for row in rows])
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define reset_stages() function:
+#   1. Forget stage status for all scenes, except the listed stages (e.g. keep "import" when outputs of later
+#      stages are cleared).
+# ------------------------------------------------------------------------------------------------------------------- #
+def reset_stages(db, keep=()):
+    if keep:
+        db.execute("DELETE FROM stages WHERE stage NOT IN (%s)" % ",".join("?" * len(keep)), tuple(keep))
+    else:
+        db.execute("DELETE FROM stages")
+    db.commit()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define done_tasks() function:
+#   1. Return the keys ("<scene>:<stage>", as in parallel.Task) of every stage recorded as done, for
+#      checkpoint.remaining().
+# ------------------------------------------------------------------------------------------------------------------- #
+def done_tasks(db):
+    rows = db.execute("SELECT scene_id, stage FROM stages WHERE status = 'done'").fetchall()
+    return set(row["scene_id"] + ":" + row["stage"] for row in rows)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define quarantine() function:
+#   1. Set a scene aside after a stage failed, so later runs leave it out until it is released.
+# Parameters:
+#   db          - Catalog connection.
+#   scene_id    - The scene.
+#   reason      - Text kept with the record, e.g. the stages that failed.
+# ------------------------------------------------------------------------------------------------------------------- #
+def quarantine(db, scene_id, reason):
+    set_stage(db, scene_id, "quarantine", "quarantined", reason)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define quarantined() function:
+#   1. Return {scene ID: reason} for the quarantined scenes.
+# ------------------------------------------------------------------------------------------------------------------- #
+def quarantined(db):
+    rows = db.execute("SELECT scene_id, detail FROM stages WHERE stage = 'quarantine' AND status = 'quarantined'")
+    return dict([(row["scene_id"], row["detail"]) for row in rows.fetchall()])
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define release() function:
+#   1. Take a scene out of quarantine so the next run processes it again.
+# ------------------------------------------------------------------------------------------------------------------- #
+def release(db, scene_id):
+    db.execute("DELETE FROM stages WHERE scene_id = ? AND stage = 'quarantine'", (scene_id,))
+    db.commit()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define scenes() function:
+#   1. Select scenes by acquisition window, year, cloud cover and completed stage, in date order.
+# Parameters:
+#   db          - Catalog connection.
+#   year        - Acquisition year (YYYY), or None.
+#   start, end  - Inclusive acquisition window (YYYYMMDD), or None.
+#   max_cloud   - Highest cloud cover percent to include, or None. Scenes with unknown cover are included.
+#   stage_done  - Only scenes where this stage has status "done", or None.
+# Example:
+#   scenes(db, year="2018", max_cloud=5)  - all clear scenes in 2018
+# ------------------------------------------------------------------------------------------------------------------- #
+def scenes(db, year=None, start=None, end=None, max_cloud=None, stage_done=None):
+    query = "SELECT scenes.* FROM scenes"
+    where = []
+    values = []
+    if stage_done is not None:
+        query += " JOIN stages ON stages.scene_id = scenes.scene_id AND stages.stage = ? AND stages.status = 'done'"
+        values.append(stage_done)
+    if year is not None:
+        where.append("scenes.date LIKE ?")
+        values.append(str(year) + "%")
+    if start is not None:
+        where.append("scenes.date >= ?")
+        values.append(start)
+    if end is not None:
+        where.append("scenes.date <= ?")
+        values.append(end)
+    if max_cloud is not None:
+        where.append("(scenes.cloud IS NULL OR scenes.cloud <= ?)")
+        values.append(max_cloud)
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY scenes.date, scenes.scene_id"
+    return db.execute(query, values).fetchall()
@@ -0,0 +1,140 @@
+# =================================================================================================================== #
+# Script Name:	checkpoint.py
+# Author:	    Brian Laureijs
+# Purpose:      Atomic stage outputs and resuming a batch from the last completed stage of each scene.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # File checks and renames
+import shutil                                       # Copy-on-write inputs
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+PARTIAL = "_partial"                                # Suffix of outputs still being written
+
+# Stage functions name their outputs by argument position, set after the function in processing.py:
+#   make_pca.outputs = (1, 3)       - Arguments 1 and 3 are files the stage creates.
+#   <stage>.inplace = (1,)          - Argument 1 is an existing file the stage adds to (copied first, so use it
+#                                     only for small files; no stage does this at present).
+# call() hands the stage "<name>_partial_<ext><ext>" paths instead (x.shp is written as x_partial_shp.shp) and
+# renames them to the real names only once the stage returns. A stage that fails or is killed never leaves a
+# half-written file under an output name, so a file that exists is complete. Renaming covers every file sharing
+# the partial base name, so shapefile sidecars (.dbf, .shx, .prj), ENVI headers and statistics caches move with
+# their main file. The extension is part of that base, so outputs that differ only in extension (landcover.shp and
+# landcover.tif) never pick up each other's files.
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define partial() function:
+#   1. Return the name a stage writes an output under until it is committed, unique to the output's extension.
+# ------------------------------------------------------------------------------------------------------------------- #
+def partial(path):
+    base, ext = os.path.splitext(path)
+    return base + PARTIAL + ext.replace(".", "_") + ext
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define related_files() function:
+#   1. Return the files in the folder of path that share its base name (path itself and its sidecars).
+# ------------------------------------------------------------------------------------------------------------------- #
+def related_files(path):
+    folder = os.path.dirname(path) or "."
+    prefix = os.path.splitext(os.path.basename(path))[0] + "."
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.join(folder, name) for name in sorted(os.listdir(folder)) if name.startswith(prefix)]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define commit() function:
+#   1. Rename a partial output and its sidecars to the final name, replacing any older copy. Outputs can be
+#      folders (chunked stores, see store.py).
+# Parameters:
+#   partial_path - The file the stage wrote, from partial().
+#   path         - The final output name.
+# ------------------------------------------------------------------------------------------------------------------- #
+def commit(partial_path, path):
+    partial_base = os.path.splitext(os.path.basename(partial_path))[0]
+    final_base = os.path.splitext(path)[0]
+    for name in related_files(partial_path):
+        target = final_base + os.path.basename(name)[len(partial_base):]    # Same sidecar extension
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.isfile(target):
+            os.remove(target)                                       # Windows can't rename over a file
+        os.rename(name, target)
+    return path
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define discard() function:
+#   1. Delete a partial output and its sidecars.
+# ------------------------------------------------------------------------------------------------------------------- #
+def discard(partial_path):
+    for name in related_files(partial_path):
+        if os.path.isdir(name):
+            shutil.rmtree(name, ignore_errors=True)
+        else:
+            os.remove(name)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define outputs() function:
+#   1. Return the files a stage function writes or adds to, for the given arguments.
+# ------------------------------------------------------------------------------------------------------------------- #
+def outputs(func, args):
+    return [args[i] for i in getattr(func, "outputs", ()) + getattr(func, "inplace", ())]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define call() function:
+#   1. Point the output arguments of a stage at partial files, copying in-place files first.
+#   2. Run the stage. If it raises, delete the partial files and raise again; the real outputs are untouched.
+#   3. Commit the partial files to the real names and return the stage's result.
+# Parameters:
+#   func        - Stage function, with outputs/inplace positions (see above).
+#   args        - Its arguments, with the real output names.
+# ------------------------------------------------------------------------------------------------------------------- #
+def call(func, args):
+    args = list(args)
+    swapped = []
+    for i in getattr(func, "outputs", ()) + getattr(func, "inplace", ()):
+        swapped.append((partial(args[i]), args[i]))
+        discard(swapped[-1][0])                                     # Left by a run that was killed
+        if i in getattr(func, "inplace", ()):
+            shutil.copy2(args[i], swapped[-1][0])
+        args[i] = swapped[-1][0]
+    try:
+        result = func(*args)
+    except BaseException:
+        for partial_path, path in swapped:
+            discard(partial_path)
+        raise
+    for partial_path, path in swapped:
+        commit(partial_path, path)
+    return result
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define remaining() function:
+#   1. Drop tasks that completed before (status "done") and whose outputs all exist, unless a task they depend on
+#      has to run again.
+#   2. Return the other tasks, with dependencies on dropped tasks removed, so a batch resumes from the last
+#      completed stage of each scene.
+# Parameters:
+#   tasks       - The batch's Task records (see parallel.py).
+#   done        - Keys of tasks recorded as done, e.g. from the scene catalog.
+# ------------------------------------------------------------------------------------------------------------------- #
+def remaining(tasks, done):
+    finished = set(task.key for task in tasks
+                   if task.key in done and all(os.path.exists(path) for path in outputs(task.func, task.args)))
+    rerun = True
+    while rerun:                                                    # Stages after a rerun stage run again too
+        rerun = [task.key for task in tasks if task.key in finished and not finished.issuperset(task.deps)]
+        finished.difference_update(rerun)
+    return [task._replace(deps=[dep for dep in task.deps if dep not in finished])
+            for task in tasks if task.key not in finished]
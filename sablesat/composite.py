@@ -0,0 +1,161 @@
+# =================================================================================================================== #
+# Script Name:	composite.py
+# Author:	    Brian Laureijs
+# Purpose:      Build per-pixel cloud-free composites from a date window of merged Sentinel-2 stacks.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # File checks
+import time                                         # Processing timer
+import warnings                                     # Silence all-cloud median warnings
+from sablesat import backend                        # Load numpy and GDAL on first use
+
+numpy = backend.module("numpy")                     # Array processing
+gdal = backend.module("osgeo.gdal")                 # Raster output
+ogr = backend.module("osgeo.ogr")                   # Cloud polygon rasterization
+raster = backend.module("sablesat.raster")          # Windowed PIX access
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+METHODS = ("median", "maxndvi")                     # Supported compositing rules
+RED_BAND = 3                                        # B4 in the merged 10m stack (B2, B3, B4, B8, B5, B6, B7, B8A,
+NIR_BAND = 4                                        # B8 in the merged 10m stack  B11, B12)
+MEMORY_BUDGET = 256 * 1024 * 1024                   # Bytes of working arrays per strip, independent of stack depth
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define select_scenes() function:
+#   1. Keep merged stacks whose acquisition date falls inside the requested window.
+#   2. Read from the memory-mapped or chunked copy of a stack where one exists.
+#   3. Pair each stack with its cloud polygon shapefile from mask_clouds(), if one exists.
+# Parameters:
+#   scene_list  - (scene ID, acquisition date, merged 10m PIX file) for each candidate, from the scene catalog.
+#   maskdir     - The directory holding <scene ID>_cloud_polygons.shp files.
+#   start, end  - Inclusive date window as YYYYMMDD strings.
+# ------------------------------------------------------------------------------------------------------------------- #
+def select_scenes(scene_list, maskdir, start, end):
+    scenes = []
+    for scene_id, date, merged in scene_list:
+        if start <= date <= end:
+            cloudshp = os.path.join(maskdir, scene_id + "_cloud_polygons.shp")
+            if not os.path.isfile(cloudshp):
+                cloudshp = None                                     # Scene was not masked; treat as clear
+            scenes.append((raster.best_source(merged), cloudshp))
+    return scenes
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define clear_window() function:
+#   1. Rasterize the cloud polygons onto a window of the scene grid.
+#   2. Return True where the pixel is cloud-free and holds data (non-zero in every band).
+# Parameters:
+#   layer       - OGR cloud polygon layer, or None if the scene has no cloud mask.
+#   stack       - RasterStack providing the grid.
+#   data        - The window data already read from the stack, shape (bands, rows, cols).
+#   yoff        - The first row of the window.
+# ------------------------------------------------------------------------------------------------------------------- #
+def clear_window(layer, stack, data, yoff):
+    clear = numpy.all(data > 0, axis=0)                             # Zero is the clip nodata value
+    if layer is None:
+        return clear
+    ysize, xsize = data.shape[1], data.shape[2]
+    gt = list(stack.geotransform)
+    gt[0] = gt[0] + yoff * gt[2]                                    # Shift origin down to the window
+    gt[3] = gt[3] + yoff * gt[5]
+    mem = gdal.GetDriverByName("MEM").Create("", xsize, ysize, 1, gdal.GDT_Byte)
+    mem.SetGeoTransform(gt)
+    mem.SetProjection(stack.projection)
+    gdal.RasterizeLayer(mem, [1], layer, burn_values=[1])           # 1 = cloud
+    cloud = mem.GetRasterBand(1).ReadAsArray().astype(bool)
+    return clear & ~cloud
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define build_composite() function:
+#   1. Open every scene in the window and check they share one pixel grid.
+#   2. Walk the grid strip by strip, sizing strips so working memory stays under MEMORY_BUDGET however many scenes
+#      are stacked.
+#   3. Per strip, combine the clear observations of all scenes:
+#       median  - per-band median of clear values.
+#       maxndvi - all bands from the clear scene with the highest NDVI.
+#   4. Write the composite as a 16-bit PIX stack with the same band order as the merged input.
+# Parameters:
+#   scenes      - List of (merged stack, cloud polygon shapefile or None) pairs from select_scenes().
+#   compout     - The output composite PIX file.
+#   method      - "median" or "maxndvi".
+# ------------------------------------------------------------------------------------------------------------------- #
+def build_composite(scenes, compout, method="median"):
+    if method not in METHODS:
+        raise ValueError("Unknown composite method %s, expected one of %s" % (method, ", ".join(METHODS)))
+    if len(scenes) == 0:
+        raise ValueError("No scenes in the composite date window.")
+    start_time = time.time()
+    stacks = []
+    layers = []
+    sources = []                                                    # Keep OGR datasources alive with their layers
+    for i in range(len(scenes)):
+        stacks.append(raster.open_stack(scenes[i][0]))
+        if not raster.same_grid(stacks[0], stacks[i]):
+            raise ValueError("%s is not on the same grid as %s" % (scenes[i][0], scenes[0][0]))
+        if scenes[i][1] is None:
+            sources.append(None)
+            layers.append(None)
+        else:
+            source = ogr.Open(scenes[i][1])
+            sources.append(source)
+            layers.append(source.GetLayer(0))
+    ref = stacks[0]
+    bands = range(1, ref.count + 1)
+    out = raster.create_like(compout, ref, ref.count, gdal.GDT_UInt16)
+
+    if method == "median":                                          # Every scene's window, its mask and one
+        rows = MEMORY_BUDGET // (len(stacks) * ref.xsize * (ref.count * 2 + 5))    # float plane per scene
+    else:                                                           # Running best values plus one scene window
+        rows = MEMORY_BUDGET // (ref.xsize * (ref.count * 6 + 8))
+    print "Compositing %i scenes by %s in strips of %i rows..." % (len(stacks), method, max(1, rows))
+
+    for yoff, ysize in raster.strips(ref.ysize, rows):
+        if method == "median":
+            windows = []                                            # Each scene is read once per strip
+            masks = []
+            for i in range(len(stacks)):
+                windows.append(stacks[i].read(bands, 0, yoff, ref.xsize, ysize))
+                masks.append(clear_window(layers[i], stacks[i], windows[i], yoff))
+            for b in bands:
+                plane = numpy.empty((len(stacks), ysize, ref.xsize), dtype=numpy.float32)
+                for i in range(len(stacks)):
+                    plane[i] = windows[i][b - 1]
+                    plane[i][~masks[i]] = numpy.nan                 # Drop cloud and nodata observations
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning) # All-NaN pixels are expected under cloud
+                    result = numpy.nanmedian(plane, axis=0)
+                result[numpy.isnan(result)] = 0                     # No clear observation: nodata
+                out.GetRasterBand(b).WriteArray(numpy.round(result).astype(numpy.uint16), 0, yoff)
+        else:
+            best = numpy.zeros((ref.count, ysize, ref.xsize), dtype=numpy.uint16)
+            best_ndvi = numpy.full((ysize, ref.xsize), -numpy.inf)
+            for i in range(len(stacks)):
+                data = stacks[i].read(bands, 0, yoff, ref.xsize, ysize)
+                clear = clear_window(layers[i], stacks[i], data, yoff)
+                red = data[RED_BAND - 1].astype(numpy.float64)
+                nir = data[NIR_BAND - 1].astype(numpy.float64)
+                total = nir + red
+                total[total == 0] = 1                               # Avoid division by zero on nodata
+                ndvi = (nir - red) / total
+                better = clear & (ndvi > best_ndvi)
+                best[:, better] = data[:, better]
+                best_ndvi[better] = ndvi[better]
+            for b in bands:
+                out.GetRasterBand(b).WriteArray(best[b - 1], 0, yoff)
+
+    out.FlushCache()
+    out = None                                                      # Close composite file
+    for i in range(len(stacks)):
+        stacks[i].close()
+    completion_time = time.time() - start_time
+    print "Composite of %i scenes completed in %i seconds. Output to \n\t%s" % (len(stacks), completion_time, compout)
+    return compout
@@ -0,0 +1,114 @@
+# =================================================================================================================== #
+# Script Name:	download.py
+# Author:	    Brian Laureijs
+# Purpose:      Find, screen, download and unzip Sentinel-2 products from the Copernicus hub, without prompts.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory and file manipulation
+import time                                         # Time to complete
+import zipfile                                      # Unzip downloads
+import untangle                                     # Read copernicus cart XML download
+import sentinelsat                                  # Copernicus API access
+from sablesat import trace                          # Stage timing and resource records
+from sablesat import screening                      # Cloud and footprint screening
+from sablesat import downloader                     # Rate limited, retrying downloads
+from sablesat import segmented                      # Byte range segment downloads
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+HUB_URL = "https://scihub.copernicus.eu/dhus"       # Copernicus Open Access Hub
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define login() function:
+#   1. Return an API login for the hub.
+# ------------------------------------------------------------------------------------------------------------------- #
+def login(user, password, hub_url=HUB_URL):
+    return sentinelsat.SentinelAPI(user, password, hub_url)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define read_cart() function:
+#   1. Return the product UUIDs in a Copernicus cart file ('products.meta4').
+# ------------------------------------------------------------------------------------------------------------------- #
+def read_cart(xml_path):
+    uuid_list = []
+    xml = untangle.parse(xml_path)                                  # Read the XML file
+    for i in range(len(xml.metalink.file)):
+        url = str(xml.metalink.file[i].url)                         # Get the URL element as string
+        uuid_list.append(url.split("'")[1])                         # Isolate the UUID code
+    return uuid_list
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define screen_products() function:
+#   1. Screen products by metadata: skip those that miss the clip extent, defer those above the cloud threshold.
+#   2. Return (screening records, UUIDs to download clearest first, deferred UUIDs).
+# Parameters:
+#   api         - sentinelsat.SentinelAPI login.
+#   uuid_list   - Product UUIDs.
+#   clipjson    - Clip extent GeoJSON in WGS 84.
+#   max_cloud   - Cloud cover percent above which products are deferred.
+# ------------------------------------------------------------------------------------------------------------------- #
+def screen_products(api, uuid_list, clipjson, max_cloud=screening.MAX_CLOUD):
+    with trace.span("screening"):
+        records = screening.screen(api, uuid_list, screening.load_aoi(clipjson), max_cloud)
+    download = [r["uuid"] for r in records if r["decision"] == screening.DOWNLOAD]
+    deferred = [r["uuid"] for r in records if r["decision"] == screening.DEFER]
+    return records, download, deferred
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define download_products() function:
+#   1. Download products side by side up to the hub's per-account limit, with sentinelsat's api.download(), or in
+#      byte range segments over pooled connections if segments is given. Failed products are retried without
+#      holding up the rest (see downloader.py).
+#   2. Return (results per UUID, elapsed seconds).
+# Parameters:
+#   api         - sentinelsat.SentinelAPI login.
+#   uuid_list   - Product UUIDs, in download order.
+#   directory   - Folder to download into.
+#   segments    - Byte range segments per product, 1 to downloader.MAX_CONCURRENT, or None for sentinelsat.
+#                 Every segment is a connection, and the hub allows 2 per account, so more segments means fewer
+#                 products downloading at once.
+# ------------------------------------------------------------------------------------------------------------------- #
+def download_products(api, uuid_list, directory, segments=None):
+    if segments is None:
+        scheduler = downloader.Scheduler(api, directory)
+    elif not 1 <= segments <= downloader.MAX_CONCURRENT:
+        raise ValueError("Use 1 to %i segments; the hub allows %i connections per account."
+                         % (downloader.MAX_CONCURRENT, downloader.MAX_CONCURRENT))
+    else:
+        bucket = downloader.TokenBucket()                           # Segment requests count against the rate too
+        scheduler = downloader.Scheduler(api, directory, max_concurrent=downloader.MAX_CONCURRENT // segments,
+                                         fetch=segmented.Fetcher(segments, bucket=bucket), bucket=bucket)
+    results = scheduler.run(uuid_list)
+    return results, scheduler.elapsed
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define unzip() function
+#   1. Find downloaded zip files in a folder.
+#   2. Extract them to the input folder and delete the zips.
+#   3. Return the names of the extracted zips.
+# Parameters:
+#   zipdir      - Folder the products were downloaded into.
+#   inputdir    - Folder of unzipped SAFE products.
+# ------------------------------------------------------------------------------------------------------------------- #
+def unzip(zipdir, inputdir):
+    zipfiles = [name for name in sorted(os.listdir(zipdir)) if name[-4:] == ".zip"]
+    for name in zipfiles:
+        start_time = time.time()
+        path = os.path.join(zipdir, name)
+        with trace.span("unzip", name[:-4]):
+            with zipfile.ZipFile(path, 'r') as zipobject:           # Read each zipfile
+                zipobject.extractall(inputdir)                      # Extract to the input folder
+        os.remove(path)                                             # Clean up the downloaded zip
+        completion_time = time.time() - start_time
+        print 'File %s extracted to %s in %i seconds.' % (name, inputdir, completion_time)
+    return zipfiles
@@ -0,0 +1,269 @@
+# =================================================================================================================== #
+# Script Name:	downloader.py
+# Author:	    Brian Laureijs
+# Purpose:      Download scheduler for the Copernicus hub: concurrency cap, rate limiting, retries and LTA retrieval.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import time                                         # Timers and delays
+import heapq                                        # Pending downloads ordered by the time they may start
+import random                                       # Backoff jitter
+import threading                                    # Download workers
+import requests                                     # HTTP errors (installed with sentinelsat)
+import sentinelsat                                  # Copernicus API access
+from sablesat import trace                          # Stage timing and resource records
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+MAX_CONCURRENT = 2                                  # Open Access Hub limit of parallel downloads per account
+RATE = 1.0                                          # Hub requests per second, on average
+BURST = 4                                           # Requests that may be made back to back
+RETRIES = 6                                         # Attempts after the first, for transient errors
+BASE_DELAY = 2.0                                    # Seconds; backoff doubles on every retry
+MAX_DELAY = 300.0                                   # Longest single backoff
+POLL_INTERVAL = 300.0                               # Seconds between online checks of products in the LTA
+LTA_TIMEOUT = 24 * 3600.0                           # Give up on a product that stays offline this long
+
+DONE = "done"                                       # Final product status
+FAILED = "failed"
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define TokenBucket class:
+#   - Allows on average `rate` requests per second, with bursts of up to `burst` requests. Shared by all workers.
+# ------------------------------------------------------------------------------------------------------------------- #
+class TokenBucket(object):
+    def __init__(self, rate=RATE, burst=BURST):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    # Block until a token is available, then take it.
+    def take(self):
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define is_transient() function:
+#   1. Return True for errors worth retrying: dropped connections, timeouts, corrupt downloads, throttling (429)
+#      and server errors (5xx). Authentication errors and unknown products fail straight away.
+# ------------------------------------------------------------------------------------------------------------------- #
+def is_transient(error):
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError, sentinelsat.InvalidChecksumError)):
+        return True
+    response = getattr(error, "response", None)
+    if response is not None:
+        return response.status_code == 429 or response.status_code >= 500
+    return False
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define backoff() function:
+#   1. Return the delay before retry number `attempt`: exponential with full jitter, so throttled workers don't
+#      retry in lockstep. A Retry-After header from the hub sets the shortest delay.
+# ------------------------------------------------------------------------------------------------------------------- #
+def backoff(attempt, error=None, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+    response = getattr(error, "response", None)
+    if response is not None and str(response.headers.get("Retry-After", "")).isdigit():
+        delay = max(delay, float(response.headers["Retry-After"]))
+    return delay
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define is_online() function:
+#   1. Ask the hub whether a product is online, or only in the long term archive (LTA).
+# Parameters:
+#   api         - sentinelsat.SentinelAPI login.
+#   uuid        - Product UUID.
+# ------------------------------------------------------------------------------------------------------------------- #
+def is_online(api, uuid):
+    url = api.api_url + "odata/v1/Products('%s')/Online/$value" % uuid
+    response = api.session.get(url, auth=api.session.auth)
+    response.raise_for_status()
+    return response.text.strip().lower() == "true"
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define request_retrieval() function:
+#   1. Request an offline product; the hub answers 202 Accepted and starts restoring it from the LTA.
+# ------------------------------------------------------------------------------------------------------------------- #
+def request_retrieval(api, uuid):
+    url = api.api_url + "odata/v1/Products('%s')/$value" % uuid
+    response = api.session.get(url, auth=api.session.auth, stream=True)
+    response.close()
+    if response.status_code not in (200, 202):
+        response.raise_for_status()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define sentinelsat_fetch() function:
+#   1. Download a product with sentinelsat (resumes partial files and checks the MD5 sum).
+#   2. Return the bytes transferred.
+# ------------------------------------------------------------------------------------------------------------------- #
+def sentinelsat_fetch(api, uuid, directory):
+    info = api.download(uuid, directory)
+    return info["downloaded_bytes"]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define Scheduler class:
+#   - Downloads a list of products with up to max_concurrent at once. Every hub request first takes a token from
+#     the bucket. Transient errors are retried with backoff; offline products are requested from the LTA and
+#     polled until online, while the other products carry on downloading.
+#   Example:
+#       results = Scheduler(api, workingdir).run(uuid_list)
+#   Parameters:
+#       api             - sentinelsat.SentinelAPI login.
+#       directory       - Folder to download into.
+#       max_concurrent  - Downloads in progress at once (the per-account limit of the hub).
+#       rate, burst     - Token bucket settings for hub requests.
+#       bucket          - A TokenBucket to share with fetch, instead of a new one from rate and burst.
+#       fetch           - function(api, uuid, directory) that downloads one product and returns the bytes
+#                         transferred; defaults to sentinelsat's api.download().
+# ------------------------------------------------------------------------------------------------------------------- #
+class Scheduler(object):
+    def __init__(self, api, directory, max_concurrent=MAX_CONCURRENT, rate=RATE, burst=BURST, retries=RETRIES,
+                 poll_interval=POLL_INTERVAL, lta_timeout=LTA_TIMEOUT, fetch=sentinelsat_fetch, bucket=None):
+        self.api = api
+        self.directory = directory
+        self.max_concurrent = max_concurrent
+        self.bucket = bucket if bucket is not None else TokenBucket(rate, burst)
+        self.retries = retries
+        self.poll_interval = poll_interval
+        self.lta_timeout = lta_timeout
+        self.fetch = fetch
+        self.pending = []                           # Heap of (start after, sequence, uuid)
+        self.sequence = 0
+        self.active = 0
+        self.condition = threading.Condition()
+        self.results = {}
+        self.elapsed = 0.0
+
+    # Queue a product to start no earlier than `delay` seconds from now.
+    def schedule(self, uuid, delay=0.0):
+        with self.condition:
+            heapq.heappush(self.pending, (time.time() + delay, self.sequence, uuid))
+            self.sequence += 1
+            self.condition.notify_all()
+
+    # Wait for the next product that may start. Return None once nothing is pending or in progress.
+    def next_product(self):
+        with self.condition:
+            while True:
+                if not self.pending and self.active == 0:
+                    self.condition.notify_all()
+                    return None
+                if self.pending:
+                    wait = self.pending[0][0] - time.time()
+                    if wait <= 0:
+                        self.active += 1
+                        return heapq.heappop(self.pending)[2]
+                    self.condition.wait(min(wait, 1.0))
+                else:
+                    self.condition.wait(1.0)
+
+    def finish(self, uuid, status, error=None):
+        record = self.results[uuid]
+        record["status"] = status
+        record["error"] = error
+        print "Product %s %s after %i attempt(s)%s" % (uuid, status, record["attempts"],
+                                                        "" if error is None else ": %s" % error)
+
+    # Try one product once; reschedule it if it is offline or hit a transient error.
+    def attempt(self, uuid):
+        record = self.results[uuid]
+        try:
+            self.bucket.take()
+            if not is_online(self.api, uuid):
+                if record["offline_since"] is None:
+                    record["offline_since"] = time.time()
+                    self.bucket.take()
+                    request_retrieval(self.api, uuid)
+                    print "Product %s is in the long term archive; retrieval requested." % uuid
+                if time.time() - record["offline_since"] > self.lta_timeout:
+                    self.finish(uuid, FAILED, "still offline after %i hours" % (self.lta_timeout / 3600))
+                else:
+                    self.schedule(uuid, self.poll_interval)         # Poll later; free the slot meanwhile
+                return
+            record["attempts"] += 1
+            self.bucket.take()
+            start_time = time.time()
+            with trace.span("download", uuid):
+                transferred = self.fetch(self.api, uuid, self.directory)
+            record["seconds"] += time.time() - start_time
+            record["bytes"] += transferred
+            self.finish(uuid, DONE)
+        except Exception as error:
+            record["errors"] += 1
+            if is_transient(error) and record["errors"] <= self.retries:
+                delay = backoff(record["errors"] - 1, error)
+                print "Product %s: %s. Retrying in %i seconds." % (uuid, error, delay)
+                self.schedule(uuid, delay)
+            else:
+                self.finish(uuid, FAILED, str(error))
+
+    def worker(self):
+        while True:
+            uuid = self.next_product()
+            if uuid is None:
+                return
+            try:
+                self.attempt(uuid)
+            finally:
+                with self.condition:
+                    self.active -= 1
+                    self.condition.notify_all()
+
+    # Download all products and return {uuid: {"status", "attempts", "errors", "bytes", "seconds", "error", ...}}.
+    def run(self, uuid_list):
+        start_time = time.time()
+        for uuid in uuid_list:
+            self.results[uuid] = {"status": None, "attempts": 0, "errors": 0, "bytes": 0, "seconds": 0.0,
+                                  "error": None, "offline_since": None}
+            self.schedule(uuid)
+        workers = [threading.Thread(target=self.worker) for i in range(self.max_concurrent)]
+        for thread in workers:
+            thread.daemon = True
+            thread.start()
+        for thread in workers:
+            while thread.is_alive():
+                thread.join(1.0)                                    # Short joins keep Ctrl+C working
+        self.elapsed = time.time() - start_time
+        return self.results
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define report() function:
+#   1. Print the status and measured throughput of each product, and the total for the cart.
+# Parameters:
+#   results     - Results from Scheduler.run().
+#   elapsed     - Wall clock seconds for the whole run.
+# ------------------------------------------------------------------------------------------------------------------- #
+def report(results, elapsed):
+    total = 0
+    for uuid in results:
+        record = results[uuid]
+        total += record["bytes"]
+        rate = record["bytes"] / 1048576.0 / record["seconds"] if record["seconds"] else 0
+        print "%-7s %s  %8.1f MB  %6.2f MB/s  %i attempt(s)" % (record["status"], uuid, record["bytes"] / 1048576.0,
+                                                                 rate, record["attempts"])
+    failed = len([uuid for uuid in results if results[uuid]["status"] != DONE])
+    print "Downloaded %.1f MB in %i seconds (%.2f MB/s overall), %i product(s) failed." % \
+          (total / 1048576.0, elapsed, total / 1048576.0 / max(elapsed, 1e-6), failed)
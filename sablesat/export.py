@@ -0,0 +1,95 @@
+# =================================================================================================================== #
+# Script Name:	export.py
+# Author:	    Brian Laureijs
+# Purpose:      Write outputs in formats web viewers can read in windows: Cloud-Optimized GeoTIFF for rasters and one
+#               GeoPackage per run for vectors.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # File manipulation
+import time                                         # Export timer
+from osgeo import gdal                              # Raster and vector translation
+
+gdal.UseExceptions()                                # Raise errors instead of returning None
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+BLOCK = 512                                         # Tile size of COG outputs
+MIN_OVERVIEW = 256                                  # Smallest overview side in pixels
+COG_OPTIONS = ["TILED=YES",
+               "BLOCKXSIZE=%i" % BLOCK,
+               "BLOCKYSIZE=%i" % BLOCK,
+               "COMPRESS=DEFLATE",
+               "PREDICTOR=2",                       # Horizontal differencing; suits imagery and class rasters
+               "COPY_SRC_OVERVIEWS=YES",            # Overviews after the full resolution image, as COG expects
+               "BIGTIFF=IF_SAFER"]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define overview_levels() function:
+#   1. Return overview factors (2, 4, 8, ...) until the smaller image side drops below MIN_OVERVIEW pixels.
+# ------------------------------------------------------------------------------------------------------------------- #
+def overview_levels(xsize, ysize):
+    levels = []
+    factor = 2
+    while min(xsize, ysize) // factor >= MIN_OVERVIEW:
+        levels.append(factor)
+        factor *= 2
+    return levels
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define to_cog() function:
+#   1. Build overviews of a GeoTIFF in an external .ovr file.
+#   2. Rewrite it as a tiled, compressed GeoTIFF with the overviews inside, in COG layout, and replace the original.
+#      The colour table of a classified raster is kept.
+# Parameters:
+#   tif         - The GeoTIFF to convert in place.
+#   resampling  - Overview resampling: "AVERAGE" for imagery, "NEAREST" for classes.
+# ------------------------------------------------------------------------------------------------------------------- #
+def to_cog(tif, resampling="AVERAGE"):
+    start_time = time.time()
+    scratch = os.path.splitext(tif)[0] + "_cog.tif"
+    source = gdal.Open(tif, gdal.GA_ReadOnly)                       # Read-only: overviews go to <tif>.ovr
+    levels = overview_levels(source.RasterXSize, source.RasterYSize)
+    if levels:
+        source.BuildOverviews(resampling, levels)
+    gdal.Translate(scratch, source, format="GTiff", creationOptions=COG_OPTIONS)
+    source = None
+    os.remove(tif)
+    if os.path.isfile(tif + ".ovr"):
+        os.remove(tif + ".ovr")
+    os.rename(scratch, tif)
+    completion_time = time.time() - start_time
+    print "Wrote cloud-optimized %s with %i overview(s) in %i seconds." % (os.path.basename(tif), len(levels),
+                                                                           completion_time)
+    return tif
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define package() function:
+#   1. Copy shapefiles into one GeoPackage as layers named after the files, each with an R-tree spatial index.
+#      A layer already in the GeoPackage is replaced.
+#   2. Return the names of the layers written. Missing shapefiles (failed stages) are skipped.
+# Parameters:
+#   gpkg        - The GeoPackage to create or add to.
+#   shapefiles  - Shapefiles to copy.
+# ------------------------------------------------------------------------------------------------------------------- #
+def package(gpkg, shapefiles):
+    start_time = time.time()
+    layers = []
+    for shapefile in shapefiles:
+        if not os.path.isfile(shapefile):
+            continue
+        layer = os.path.splitext(os.path.basename(shapefile))[0]
+        gdal.VectorTranslate(gpkg, shapefile, format="GPKG", layerName=layer,
+                             accessMode="overwrite" if os.path.isfile(gpkg) else None,
+                             layerCreationOptions=["SPATIAL_INDEX=YES"])
+        layers.append(layer)
+    completion_time = time.time() - start_time
+    print "Wrote %i layer(s) to %s in %i seconds." % (len(layers), gpkg, completion_time)
+    return layers
@@ -0,0 +1,194 @@
+# =================================================================================================================== #
+# Script Name:	importer.py
+# Author:	    Brian Laureijs
+# Purpose:      Import Sable Island Sentinel-2 products to PIX stacks. Every function takes its paths as arguments.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory and file manipulation
+import time                                         # Timer function
+import traceback                                    # Record import errors in the catalog
+from sablesat import catalog                        # Scene catalog
+from sablesat import mapped                         # Memory-mapped merged stack
+from sablesat import trace                          # Stage timing and resource records
+from sablesat import checkpoint                     # Atomic outputs
+from sablesat import backend                        # Load PCI on first use
+
+clip = backend.function("pci.clip", "clip")                     # Clipping to AOI
+resample = backend.module("sablesat.resample")                  # Merging bands on cached resampling tables
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+MERGE_METHODS = {"10m": "nearest",                  # Resampling per band group: nearest, bilinear or average.
+                 "20m": "nearest"}                  # Nearest keeps the 20m values unchanged, as datamerge NEAR did
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define output_files() function
+#   1. Return the files import_safe() writes for a scene: (merged 10m stack, memory-mapped copy, 60m atmospheric
+#      bands).
+# Parameters:
+#   pixdir      - The PIX output folder.
+#   scene_id    - Scene ID (<mission>_<date>).
+# ------------------------------------------------------------------------------------------------------------------- #
+def output_files(pixdir, scene_id):
+    return (os.path.join(pixdir, scene_id + "_10m_merged.pix"),
+            os.path.join(pixdir, scene_id + "_10m_merged" + mapped.SUFFIX),
+            os.path.join(pixdir, scene_id + "_60m_atmospheric.pix"))
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define import_safe() function
+#   1. Append XML and band resolutions so PCI can read the product.
+#   2. Clip Sentinel-2 band sets to the AOI in Pix format.
+#   3. Merge 10m and 20m bands onto the 10m grid with resample.merge(), and write a memory-mappable copy of the
+#      merged stack.
+#   4. Rename the outputs from their partial names (see checkpoint.py), so an import that fails or is killed never
+#      leaves a half-written stack that the catalog or a resumed run would take for a complete one.
+#   5. Return the output files, as output_files().
+# Parameters:
+#   safe_path   - The unzipped SAFE folder.
+#   xml_name    - Metadata XML in the SAFE folder that PCI opens the product through (see catalog.read_metadata()).
+#   scene_id    - Scene ID (<mission>_<date>), used in output file names.
+#   pixdir      - The PIX output folder.
+#   griddir     - Folder of cached resampling tables, shared by every scene of the tile and AOI.
+#   clipvec     - The clip extent PIX file (layer 2 holds the AOI polygon).
+#   methods     - Resampling method of each band group, as MERGE_METHODS.
+# ------------------------------------------------------------------------------------------------------------------- #
+def import_safe(safe_path, xml_name, scene_id, pixdir, griddir, clipvec, methods=MERGE_METHODS):
+    fili = os.path.join(safe_path, xml_name) + "?r=%3ABand+Resolution%3A"
+    fili_10 = fili + "10M"
+    fili_20 = fili + "20M"
+    fili_60 = fili + "60M"
+
+    pix10 = os.path.join(pixdir, scene_id + "_10m_unmerged.pix")  # Set up paths for functions
+    pix20 = os.path.join(pixdir, scene_id + "_20m_unmerged.pix")
+    pix_merged, mapped_merged, pix60 = output_files(pixdir, scene_id)
+    merged_partial = checkpoint.partial(pix_merged)
+    mapped_partial = checkpoint.partial(mapped_merged)
+    pix60_partial = checkpoint.partial(pix60)
+    for partial_path in (merged_partial, mapped_partial, pix60_partial):
+        checkpoint.discard(partial_path)                            # Left by an import that was killed
+
+    start_time = time.time()
+    print "Starting pix conversion file %s." % scene_id
+
+    # Clip straight from the Sentinel-2 product instead of importing the full tile with fimport first.
+    # The full 110km tile is over 100 times the area of the clip extent, so writing and re-reading it
+    # was most of the disk traffic for each scene.
+    with trace.span("clip", scene_id):
+        clip(fili=fili_10,                  # Clip 10m bands: R,G,B,NIR
+             dbic=[1, 2, 3, 4],
+             dbsl=[],
+             sltype="",
+             filo=pix10,
+             ftype="PIX",
+             foptions="",
+             clipmeth="LAYERVEC",
+             clipfil=clipvec,
+             cliplay=[2])
+
+        clip(fili=fili_20,                  # Clip 20m bands: RE,NIR,SWIR
+             dbic=[1, 2, 3, 4, 5, 6],
+             dbsl=[],
+             sltype="",
+             filo=pix20,
+             ftype="PIX",
+             foptions="",
+             clipmeth="LAYERVEC",
+             clipfil=clipvec,
+             cliplay=[2])
+
+        clip(fili=fili_60,                  # Clip 60m bands: Coastal, Vapour, Cirrus
+             dbic=[1, 2, 3],
+             dbsl=[],
+             sltype="",
+             filo=pix60_partial,
+             ftype="PIX",
+             foptions="",
+             clipmeth="LAYERVEC",
+             clipfil=clipvec,
+             cliplay=[2])
+
+    # 10m bands first: the merged stack takes the 10m grid, so 20m bands are resampled up and 10m data is not
+    # resampled down. The resampling tables are the same for every scene clipped to the AOI, so they are cached.
+    with trace.span("merge", scene_id):
+        resample.merge([(pix10, methods["10m"]), (pix20, methods["20m"])], merged_partial, griddir)
+    os.remove(pix10)                        # Delete un-merged images
+    os.remove(pix20)
+
+    with trace.span("write_mapped", scene_id):
+        mapped.write_mapped(merged_partial, mapped_partial)         # Copy shared by memory mapping
+    checkpoint.commit(merged_partial, pix_merged)
+    checkpoint.commit(mapped_partial, mapped_merged)                # Mapped copy and its header
+    checkpoint.commit(pix60_partial, pix60)
+
+    completion_time = time.time() - start_time
+    print "Pix conversion completed for image %s in %i seconds." % (scene_id, completion_time)
+    print "Wrote files to:\n\t%s\n\t%s\n\t%s\n" % (pix_merged, mapped_merged, pix60)
+    return pix_merged, mapped_merged, pix60
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define import_scene() function
+#   1. Import a scene registered in the catalog with import_safe().
+#   2. Record its output files and the completed import stage in the catalog.
+# Parameters:
+#   db          - Scene catalog connection.
+#   scene_id    - A scene registered in the catalog by catalog.register() or catalog.scan().
+#   pixdir, griddir, clipvec - As import_safe().
+# ------------------------------------------------------------------------------------------------------------------- #
+def import_scene(db, scene_id, pixdir, griddir, clipvec):
+    product = catalog.get(db, scene_id)
+    pix_merged, mapped_merged, pix60 = import_safe(product["safe_path"], product["xml_name"], scene_id, pixdir,
+                                                   griddir, clipvec)
+    catalog.set_files(db, scene_id, merged=pix_merged, mapped=mapped_merged, atmos60=pix60)
+    catalog.set_stage(db, scene_id, "import", "done")
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define import_product() function                                          -- Task unit for taskqueue.py workers
+#   1. Register a product folder in the scene catalog and import it with import_scene().
+# Parameters:
+#   catalogfile - The scene catalog database.
+#   safe_path   - The unzipped SAFE folder.
+#   pixdir, griddir, clipvec - As import_safe().
+# ------------------------------------------------------------------------------------------------------------------- #
+def import_product(catalogfile, safe_path, pixdir, griddir, clipvec):
+    db = catalog.connect(catalogfile)
+    import_scene(db, catalog.register(db, safe_path), pixdir, griddir, clipvec)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define readtopix() function
+#   1. Register product folders from input directory in the scene catalog.
+#   2. Import each product with import_scene(). A product that fails is recorded in the catalog as a failed import
+#      stage with its error, and the other products carry on.
+#   3. With resume=True, skip products whose import is recorded as done and whose output files exist.
+#   4. Return the scene IDs that failed.
+# Parameters:
+#   db          - Scene catalog connection.
+#   inputdir    - The directory to read raw files from.
+#   pixdir, griddir, clipvec - As import_safe().
+#   resume      - Keep completed imports.
+# ------------------------------------------------------------------------------------------------------------------- #
+def readtopix(db, inputdir, pixdir, griddir, clipvec, resume=False):
+    scene_ids = catalog.scan(db, inputdir)                          # Register products, mission, date and tile
+    failed = []
+    for i in range(len(scene_ids)):
+        if resume and catalog.stage_status(db, scene_ids[i]).get("import") == "done" and \
+                all(os.path.isfile(path) for path in output_files(pixdir, scene_ids[i])):
+            print "Skipping %s: already imported." % scene_ids[i]
+            continue
+        try:
+            import_scene(db, scene_ids[i], pixdir, griddir, clipvec)
+        except Exception:                                           # Partial outputs were discarded or are
+            error = traceback.format_exc()                          # replaced on the next attempt
+            print "Import of %s failed:\n%s" % (scene_ids[i], error)
+            catalog.set_stage(db, scene_ids[i], "import", "failed", error)
+            failed.append(scene_ids[i])
+    return failed
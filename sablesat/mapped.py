@@ -0,0 +1,87 @@
+# =================================================================================================================== #
+# Script Name:	mapped.py
+# Author:	    Brian Laureijs
+# Purpose:      Memory-mapped, band-interleaved access to the merged 10m stack.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+from sablesat import backend                        # Load numpy and GDAL on first use
+
+numpy = backend.module("numpy")                     # Memory mapping
+gdal = backend.module("osgeo.gdal")                 # ENVI header read/write
+raster = backend.module("sablesat.raster")          # Windowed PIX access
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+SUFFIX = ".dat"                                     # Raw band file; GDAL writes the ENVI header beside it (.hdr)
+
+# The mapped file is plain ENVI band sequential (BSQ) data with no header offset: band 1 rows, then band 2 rows, and
+# so on, in native byte order. That layout maps directly onto a (bands, rows, cols) numpy array, so every process
+# that opens the file shares the same pages through the OS file cache and windows are returned as views, not copies.
+# PCI and ArcGIS can read the same file through its .hdr.
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define MappedStack class:
+#   1. Check that the file is an ENVI band sequential raster.
+#   2. Map the raw data read-only as a (bands, rows, cols) array.
+#   3. Return band windows as views into the mapping.
+# Parameters:
+#   path        - The raw .dat file written by write_mapped().
+# ------------------------------------------------------------------------------------------------------------------- #
+class MappedStack(object):
+    def __init__(self, path):
+        self.path = path
+        dataset = gdal.Open(path, gdal.GA_ReadOnly)
+        if dataset.GetDriver().ShortName != "ENVI" or \
+                dataset.GetMetadataItem("INTERLEAVE", "IMAGE_STRUCTURE") != "BAND":
+            raise ValueError("%s is not an ENVI band sequential file." % path)
+        self.xsize = dataset.RasterXSize
+        self.ysize = dataset.RasterYSize
+        self.count = dataset.RasterCount
+        self.geotransform = dataset.GetGeoTransform()
+        self.projection = dataset.GetProjection()
+        self.dtype = numpy.dtype(raster.gdal_dtype(dataset.GetRasterBand(1).DataType))
+        dataset = None                                              # Header no longer needed
+        self.array = numpy.memmap(path, dtype=self.dtype, mode="r", shape=(self.count, self.ysize, self.xsize))
+
+    def band(self, band):
+        return self.array[band - 1]                                 # Whole band as a view
+
+    def read(self, bands, xoff, yoff, xsize, ysize):
+        first = bands[0] - 1
+        if list(bands) == range(bands[0], bands[0] + len(bands)):  # Consecutive bands: slice, no copy
+            return self.array[first:first + len(bands), yoff:yoff + ysize, xoff:xoff + xsize]
+        index = [b - 1 for b in bands]                              # Scattered bands need a gather
+        return self.array[index, yoff:yoff + ysize, xoff:xoff + xsize]
+
+    def close(self):
+        self.array = None                                           # Unmapped once the last view is released
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define write_mapped() function:
+#   1. Create an ENVI band sequential file on the same grid as the input stack.
+#   2. Copy the input bands into it strip by strip.
+# Parameters:
+#   src         - The input raster file (e.g. the merged PIX from resample.merge()).
+#   path        - The output raw .dat file.
+# ------------------------------------------------------------------------------------------------------------------- #
+def write_mapped(src, path):
+    stack = raster.open_stack(src)
+    bands = range(1, stack.count + 1)
+    sample = stack.read([1], 0, 0, 1, 1)
+    out = raster.create_like(path, stack, stack.count, raster.numpy_gdal_type(sample.dtype),
+                             driver="ENVI", options=["INTERLEAVE=BSQ"])
+    for yoff, ysize in raster.strips(stack.ysize, 512):
+        data = stack.read(bands, 0, yoff, stack.xsize, ysize)
+        for i in range(len(bands)):
+            out.GetRasterBand(i + 1).WriteArray(data[i], 0, yoff)
+    out.FlushCache()
+    out = None
+    stack.close()
+    return path
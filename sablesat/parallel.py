@@ -0,0 +1,313 @@
+# =================================================================================================================== #
+# Script Name:	parallel.py
+# Author:	    Brian Laureijs
+# Purpose:      Run per-scene processing stages on a process pool, in dependency order.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory and
+import shutil                                       # file manipulation
+import time                                         # Processing timer
+import traceback                                    # Report worker errors
+import multiprocessing                              # Process pool
+from multiprocessing.queues import SimpleQueue      # Unbuffered "task started" messages from workers
+from collections import namedtuple                  # Task records
+from sablesat import trace                          # Stage timing and resource records
+from sablesat import checkpoint                     # Atomic stage outputs
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+# A task is one stage for one scene. Tasks run once every task named in deps has completed.
+#   key     - Unique task name, e.g. "S2A_20180826:pca".
+#   scene   - Scene identifier the task belongs to.
+#   stage   - Stage name (pca, mask, land_cover, coastline, correction, ...).
+#   func    - Module-level function to run; it must be importable by worker processes.
+#   args    - Tuple of arguments for func.
+#   deps    - Keys of tasks that must finish first.
+Task = namedtuple("Task", "key scene stage func args deps")
+
+# Relative run time of each stage, measured on Sable Island scenes. Only the ordering matters: the scheduler starts
+# the ready task with the most estimated work left below it first, so long chains (pca -> land_cover)
+# start early and short independent stages fill the remaining workers.
+STAGE_COST = {"import": 2,
+              "composite": 4,
+              "pca": 3,
+              "pca_composite": 1,
+              "mask": 2,
+              "land_cover": 5,
+              "coastline": 3,
+              "correction": 6}
+
+POLL_INTERVAL = 0.5                                 # Seconds between checks on running pool tasks
+
+worker_dir = None                                   # Private workspace of the current worker process
+started_queue = None                                # Tells the scheduler which worker runs which task
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define init_worker() function:                                                  -- Runs once in each pool process
+#   1. Create a private workspace folder for the worker process.
+#   2. Append stage spans to the parent's trace file.
+# Parameters:
+#   root        - Folder under which worker workspaces are created.
+#   trace_file  - The parent's trace file, or None if tracing is off.
+#   started     - Queue on which the worker reports (task key, process ID) as it starts each task, or None.
+# ------------------------------------------------------------------------------------------------------------------- #
+def init_worker(root, trace_file, started=None):
+    global worker_dir, started_queue
+    worker_dir = os.path.join(root, "worker_%i" % os.getpid())
+    started_queue = started
+    if not os.path.isdir(worker_dir):
+        os.makedirs(worker_dir)
+    if trace_file is not None:
+        trace.start(trace_file)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define workspace_gdb() function:
+#   1. Outside a worker, return the shared project geodatabase.
+#   2. Inside a worker, return a private copy of it so arcpy outputs and schema locks don't collide between workers.
+# Parameters:
+#   shared_gdb  - The project file geodatabase (sable.gdb).
+# ------------------------------------------------------------------------------------------------------------------- #
+def workspace_gdb(shared_gdb):
+    if worker_dir is None:
+        return shared_gdb
+    private_gdb = os.path.join(worker_dir, os.path.basename(shared_gdb))
+    if not os.path.isdir(private_gdb):
+        shutil.copytree(shared_gdb, private_gdb)                    # A file GDB is a plain folder
+    return private_gdb
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define run_task() function:                                                           -- Runs in a pool process
+#   1. Run a task function inside a trace span for its stage and scene. Its outputs are written under partial names
+#      and only renamed to the real names if it succeeds (see checkpoint.py).
+#   2. Return the error text instead of raising, so the scheduler always hears back from the worker. This includes
+#      SystemExit, which would otherwise end the pool process without a result. Ctrl+C still stops a run that has
+#      no pool.
+# Parameters:
+#   task        - The Task record to run.
+# ------------------------------------------------------------------------------------------------------------------- #
+def run_task(task):
+    start_time = time.time()
+    if started_queue is not None:
+        started_queue.put((task.key, os.getpid()))
+    try:
+        with trace.span(task.stage, task.scene):
+            checkpoint.call(task.func, task.args)
+        return task.key, None, time.time() - start_time
+    except KeyboardInterrupt:
+        if worker_dir is None:
+            raise
+        return task.key, traceback.format_exc(), time.time() - start_time
+    except BaseException:
+        return task.key, traceback.format_exc(), time.time() - start_time
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define collect() function:
+#   1. Return the outcomes of pool tasks that have finished, as run_task() returns them, and forget those tasks.
+#   2. A task whose worker process has died (crash in a native library, os._exit) or that has run longer than
+#      timeout fails with an explanation instead of being waited on forever. Its key is added to abandoned.
+# Parameters:
+#   pending     - Task key -> (AsyncResult, start time) of the tasks handed to the pool.
+#   current     - Worker process ID -> key of the task it last started, updated from started.
+#   started     - Queue of (task key, process ID) messages from run_task().
+#   timeout     - Seconds a task may run, or None.
+#   abandoned   - List of the keys of tasks given up on.
+# ------------------------------------------------------------------------------------------------------------------- #
+def collect(pending, current, started, timeout, abandoned):
+    while not started.empty():
+        key, pid = started.get()
+        current[pid] = key
+    alive = set([process.pid for process in multiprocessing.active_children()])
+    dead = set([current[pid] for pid in current if pid not in alive])
+    outcomes = []
+    for key in sorted(pending):
+        result, start_time = pending[key]
+        seconds = time.time() - start_time
+        if result.ready():
+            try:
+                outcomes.append(result.get())
+            except Exception:                                       # E.g. arguments that can't be pickled
+                outcomes.append((key, traceback.format_exc(), seconds))
+        elif key in dead:
+            outcomes.append((key, "The worker process running this task exited.", seconds))
+            abandoned.append(key)
+        elif timeout is not None and seconds > timeout:
+            outcomes.append((key, "Timed out after %i seconds." % timeout, seconds))
+            abandoned.append(key)
+    for outcome in outcomes:
+        del pending[outcome[0]]
+    return outcomes
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define priorities() function:
+#   1. For each task, sum the stage costs along the longest chain of tasks that depend on it (critical path).
+# Parameters:
+#   tasks       - List of Task records.
+# ------------------------------------------------------------------------------------------------------------------- #
+def priorities(tasks):
+    children = {}
+    for task in tasks:
+        for dep in task.deps:
+            children.setdefault(dep, []).append(task.key)
+    costs = {}
+    for task in tasks:
+        costs[task.key] = STAGE_COST.get(task.stage, 1)
+    rank = {}
+
+    def chain(key):
+        if key not in rank:
+            below = [chain(child) for child in children.get(key, [])]
+            rank[key] = costs[key] + max(below + [0])
+        return rank[key]
+
+    for task in tasks:
+        chain(task.key)
+    return rank
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define steps() function:
+#   1. Check that every dependency names a known task and that no tasks wait on each other in a cycle.
+#   2. Return the task keys in steps: every task in a step depends only on tasks in earlier steps.
+# Parameters:
+#   tasks       - List of Task records.
+# ------------------------------------------------------------------------------------------------------------------- #
+def steps(tasks):
+    keys = set([task.key for task in tasks])
+    for task in tasks:
+        for dep in task.deps:
+            if dep not in keys:
+                raise ValueError("Task %s depends on unknown task %s" % (task.key, dep))
+    waiting = dict([(task.key, set(task.deps)) for task in tasks])
+    plan = []
+    while waiting:
+        step = sorted([key for key in waiting if not waiting[key]])
+        if not step:
+            raise ValueError("Tasks depend on each other in a cycle: %s" % ", ".join(sorted(waiting)))
+        for key in step:
+            del waiting[key]
+        for key in waiting:
+            waiting[key].difference_update(step)
+        plan.append(step)
+    return plan
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define print_plan() function:
+#   1. Print the tasks step by step with the tasks each one waits for, without running anything.
+# Parameters:
+#   tasks       - List of Task records.
+# ------------------------------------------------------------------------------------------------------------------- #
+def print_plan(tasks):
+    by_key = dict([(task.key, task) for task in tasks])
+    plan = steps(tasks)
+    print "%i tasks in %i steps:" % (len(tasks), len(plan))
+    for i in range(len(plan)):
+        print "Step %i" % (i + 1)
+        for key in plan[i]:
+            deps = by_key[key].deps
+            print "    %-40s %s" % (key, "after " + ", ".join(deps) if deps else "")
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define run() function:
+#   1. Check the dependencies with steps().
+#   2. Start ready tasks, longest critical path first, until all workers are busy.
+#   3. As each task finishes, release the tasks waiting on it. A failed task skips its dependents only; other
+#      scenes carry on.
+#   4. Report each task outcome to on_finish, if given, e.g. to record stage status in the scene catalog.
+#   5. Return the keys of failed and skipped tasks.
+#   6. A pool task whose worker dies, or that runs longer than timeout, fails; the pool is then terminated at the
+#      end of the run instead of waiting for it.
+# Parameters:
+#   tasks       - List of Task records.
+#   workers     - Number of worker processes. With 1, tasks run in this process in the same order.
+#   root        - Folder for worker workspaces (cleared when the run completes).
+#   on_finish   - Optional function(task, status, detail) called in this process; status is "done", "failed" or
+#                 "skipped" and detail the error text or None.
+#   timeout     - Seconds a pool task may run before it is failed (None waits for it). Not applied with 1 worker.
+# ------------------------------------------------------------------------------------------------------------------- #
+def run(tasks, workers, root, on_finish=None, timeout=None):
+    steps(tasks)                                                    # Unknown dependencies and cycles fail here
+    total_start_time = time.time()
+    rank = priorities(tasks)
+    by_key = dict([(task.key, task) for task in tasks])
+    waiting = dict([(task.key, set(task.deps)) for task in tasks])
+    ready = [key for key in waiting if not waiting[key]]
+    failed = []
+    skipped = []
+    finished = []                                                   # Outcomes not yet handled
+    pending = {}                                                    # Tasks handed to the pool
+    current = {}
+    abandoned = []                                                  # Pool tasks given up on
+    pool = None
+    started = None
+    if workers > 1:
+        started = SimpleQueue()
+        pool = multiprocessing.Pool(workers, init_worker, (root, trace.trace_file, started))
+    print "Running %i tasks on %i worker(s)..." % (len(tasks), workers)
+
+    running = 0
+    while ready or running:
+        ready.sort(key=lambda k: rank[k], reverse=True)
+        while ready and running < workers:
+            task = by_key[ready.pop(0)]
+            del waiting[task.key]
+            if pool is None:
+                finished.append(run_task(task))
+            else:
+                pending[task.key] = (pool.apply_async(run_task, (task,)), time.time())
+            running += 1
+        while not finished:
+            finished.extend(collect(pending, current, started, timeout, abandoned))
+            if not finished:
+                time.sleep(POLL_INTERVAL)
+        key, error, seconds = finished.pop(0)
+        running -= 1
+        if error is None:
+            print "Task %s completed in %i seconds." % (key, seconds)
+            if on_finish is not None:
+                on_finish(by_key[key], "done", None)
+            for other in waiting:
+                if key in waiting[other]:
+                    waiting[other].discard(key)
+                    if not waiting[other]:
+                        ready.append(other)
+        else:
+            print "Task %s failed after %i seconds:\n%s" % (key, seconds, error)
+            failed.append(key)
+            if on_finish is not None:
+                on_finish(by_key[key], "failed", error)
+            lost = [key]
+            while lost:                                             # Skip everything downstream of the failure
+                parent = lost.pop()
+                for other in waiting.keys():
+                    if parent in waiting[other]:
+                        del waiting[other]
+                        skipped.append(other)
+                        if on_finish is not None:
+                            on_finish(by_key[other], "skipped", "Depends on failed task " + key)
+                        lost.append(other)
+            ready = [k for k in ready if k in waiting]
+
+    if pool is not None:
+        if abandoned:
+            pool.terminate()                                        # close() would wait on the lost tasks
+        else:
+            pool.close()
+        pool.join()
+    if os.path.isdir(root):
+        shutil.rmtree(root, ignore_errors=True)                     # Discard private worker workspaces
+    total_completion_time = time.time() - total_start_time
+    print "%i tasks completed, %i failed, %i skipped in %i seconds." % \
+          (len(tasks) - len(failed) - len(skipped), len(failed), len(skipped), total_completion_time)
+    return failed, skipped
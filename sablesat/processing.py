@@ -0,0 +1,674 @@
+# =================================================================================================================== #
+# Script Name:	processing.py
+# Author:	    Brian Laureijs
+# Purpose:      Processing stages for Sentinel-2 imagery of Sable Island: cloud masks, correction, PCA, land cover
+#               and coastline. Every function takes its input and output paths as arguments.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory and file manipulation
+import time                                         # Processing timer
+from sablesat import parallel                       # Task records and worker workspaces
+from sablesat import composite                      # Cloud-free temporal composites
+from sablesat import backend                        # Load arcpy, PCI, numpy and GDAL on first use
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Backend libraries:
+#   - Imported on first use (see backend.py), so the scripts start, plan and dry-run without loading arcpy or PCI,
+#     and worker processes only load what their stages call.
+# ------------------------------------------------------------------------------------------------------------------- #
+arcpy = backend.module("arcpy")                                 # Vector file manipulation
+pcimod = backend.function("pci.pcimod", "pcimod")               # Add layers
+pca = backend.function("pci.pca", "pca")                        # Principal Components
+fexport = backend.function("pci.fexport", "fexport")            # Export to TIF format
+masking = backend.function("pci.masking", "masking")            # Cloud and haze masking
+hazerem = backend.function("pci.hazerem", "hazerem")            # Haze removal
+atcor = backend.function("pci.atcor", "atcor")                  # Atmospheric correction
+kclus = backend.function("pci.kclus", "kclus")                  # Unsupervised K-Means classifier
+ras2poly = backend.function("pci.ras2poly", "ras2poly")         # Raster to Polygon conversion
+poly2bit = backend.function("pci.poly2bit", "poly2bit")         # Polygon to Bitmap conversion
+scale = backend.function("pci.scale", "scale")                  # 8-Bit compression for PCT generation
+pctmake = backend.function("pci.pctmake", "pctmake")            # PCT generation from raster layer
+pctwrit = backend.function("pci.pctwrit", "pctwrit")            # Write PCT to text format.
+atmos = backend.module("sablesat.atmos")                        # Atmospheric parameters, dark object subtraction
+stats = backend.module("sablesat.stats")                        # Cached band statistics, stretches, PCA reports
+export = backend.module("sablesat.export")                      # Cloud-Optimized GeoTIFF and GeoPackage output
+signatures = backend.module("sablesat.signatures")              # Stored k-means cluster centres
+raster = backend.module("sablesat.raster")                      # Windowed raster and store access
+store = backend.module("sablesat.store")                        # Chunked, compressed PCA stacks
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+sen2 = "Sentinel-2"                                 # Sensor name used in pci correction functions.
+LAND_CHANNELS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13]     # Land cover classification inputs
+LAND_CLASSES = 24                                   # Land cover clusters (not all will be used)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define mask_clouds() function:
+#   1. Apply unsupervised classification to SWIR Cirrus image band.
+#   2. Export classification to polygon format.
+#   3. Select cloud polygons.
+#   4. Return the cloud polygons. coastline() and land_cover() burn them into their scratch files as the cloud
+#      bitmap, and make_composite() reads them again, so the mask stage never writes into the PCA stack.
+# Parameters:
+#   pix60in     - The input atmospheric band file with the SWIR cirrus band in channel three.
+#   polygonout  - The output cloud polygon shapefile, in the masks folder.
+#   identifier  - Unique identifier string read from input file name.
+#   gdb         - The project file geodatabase (sable.gdb).
+# ------------------------------------------------------------------------------------------------------------------- #
+def mask_clouds(pix60in, polygonout, identifier, gdb):
+    start_time = time.time()
+    maskdir = os.path.dirname(polygonout)
+    polygonout_name_full = identifier + "_cloud_polygons_full.shp"
+    polygonout_full = os.path.join(maskdir,polygonout_name_full)
+    polygonout_name = os.path.basename(polygonout)
+    id_string = "Cloud mask bitmap for file %s" % identifier
+    pcimod(file=pix60in,                                            # Input 60m resolution atmospheric bands pix file
+           pciop='ADD',                                             # Modification mode "Add"
+           pcival=[0, 0, 1, 0])                                     # Task - add one 16U channels
+    print "Classifying clouds from SWIR Cirrus band in file %s..." % identifier
+    kclus(file=pix60in,                                             # Run classification atmospheric bands
+          dbic=[3],                                                 # Use Layer 3 (SWIR Cirrus)
+          dboc=[4],                                                 # Output to blank layer
+          numclus=[2],                                              # Two clusters - clouds, not clouds
+          seedfile='',
+          maxiter=[20],
+          movethrs=[],
+          siggen="YES",
+          backval=[],
+          nsam=[])
+    print "Cloud classification complete."
+    print "Converting to polygon shapefile..."
+    ras2poly(fili=pix60in,                                              # Use scratch PIX file
+             dbic=[4],                                                  # Use classification channel
+             filo=polygonout_full,                                      # Polygon SHP output location
+             smoothv="YES",                                             # Smooth boundaries
+             dbsd=id_string,                                            # Layer description string
+             ftype="SHP",                                               # Shapefile format
+             foptions="")
+    print "Shapefile conversion complete."
+    print "Converting polygons to bitmap layer..."
+    workspace = parallel.workspace_gdb(gdb)                            # GDB workspace (per worker)
+    polygonoutf_lyr = identifier + "_polygon_lyr"                       # Define feature layer name for polygon output
+    arcpy.env.workspace = workspace                                     # Set default workspace
+    arcpy.MakeFeatureLayer_management(polygonout_full, polygonoutf_lyr) # Make polygon feature layer
+
+    arcpy.FeatureClassToFeatureClass_conversion(in_features=polygonoutf_lyr,        # Extract only cloud polygons
+                                                out_path=maskdir,                   # Output location
+                                                out_name=polygonout_name,           # Output filename
+                                                where_clause='"Area" > 1000000000') # Anything <1B SM not clouds
+
+    pfull_dbf = polygonout_full[:-3] + "dbf"
+    pfull_prj = polygonout_full[:-3] + "prj"
+    pfull_pox = polygonout_full + ".pox"
+    pfull_shx = polygonout_full[:-3] + "shx"
+    os.remove(polygonout_full)                                          # Clean up intermediate polygon file
+    os.remove(pfull_dbf)
+    os.remove(pfull_prj)
+    os.remove(pfull_pox)
+    os.remove(pfull_shx)
+    completion_time = time.time() - start_time  # Calculate time to complete
+    print "Cloud polygons completed in %i seconds. Output to \n\t%s" % (completion_time, polygonout)
+    return polygonout
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define burn_clouds() function:
+#   1. Convert cloud polygons from mask_clouds() to a bitmap segment in a scratch PIX file, where kclus() reads it
+#      as mask=[2] (the first segment after the georeferencing).
+# Parameters:
+#   clouds      - The cloud polygon shapefile.
+#   pixfile     - The scratch PIX file to add the bitmap to.
+#   identifier  - Unique identifier string read from input file name.
+# ------------------------------------------------------------------------------------------------------------------- #
+def burn_clouds(clouds, pixfile, identifier):
+    poly2bit(fili=clouds,                                           # Convert polygons to bitmap layer
+             dbvs=[1],                                              # Input vector layer
+             filo=pixfile,                                          # Output file
+             dbsd="Cloud mask bitmap for file %s" % identifier,     # Layer description
+             pixres=[10,10],                                        # 10m resolution
+             ftype="PIX")                                           # Pix format
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define correct_atcor() function:
+#   1. Process masks for raw pix image.
+#   2. Process haze removal for pix image.
+#   3. Process atmospheric correction for pix image.
+# Parameters:
+#   piximage    - The input pix format image.
+#   hazeout     - The output haze corrected image.
+#   atcorout    - The output atmospherically corrected image.
+#   params      - Atmospheric parameters from atmos.scene_params().
+# ------------------------------------------------------------------------------------------------------------------- #
+def correct_atcor(piximage, hazeout, atcorout, params):
+    print "Processing masks..."
+    masking(fili=piximage,                          # Input pix
+            asensor=sen2,                           # Sentinel-2
+            visirchn=[1, 3, 4],                     # B, R, NIR channels
+            hazecov=[25],                           # Haze coverage
+            clthresh=[-1, -1, -1],                  # Default cloud reflectance threshold
+            filo=piximage)                          # Output (same file)
+    print "Masks for %s completed" % piximage
+    print "Processing haze removal... (This may take a while)"
+    hazerem(fili=piximage,                          # Input pix
+            asensor=sen2,                           # Sentinel-2
+            visirchn=[1, 3, 4],                     # B, R, NIR channels
+            chanopt="p,p,p,c,p,p,p,c,c,c,",         # Process or copy? (channels 1-13)
+            maskfili=piximage,                      # Masks in same file
+            maskseg=[2, 3, 4],                      # Haze, Cloud, Water mask channels
+            hazecov=[params["hazecov"]],            # Estimated haze coverage (cached per image)
+            filo=hazeout)                           # Output pix
+    print "Haze removed from %s." % piximage
+    print "Processing atmospheric correction..."
+    atcor(fili=hazeout,                             # Haze corrected input
+          asensor=sen2,                             # Sentinel-2
+          maskfili=piximage,                        # Mask file
+          atmdef=params["atmdef"],                  # Atmosphere type
+          atmcond=params["atmcond"],                # Atmosphere conditions (from acquisition month)
+          outunits="16bit_Reflectance",             # Output
+          filo=atcorout)                            # Corrected pix
+    print "%s atmospheric correction completed." % piximage
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define correction() function:
+#   1. Look up cached atmospheric parameters for the image, or estimate and cache them.
+#   2. Fast mode: dark object subtraction in numpy, skipping steps 3-5.
+#   3. Process masks for raw pix image.
+#   4. Process haze removal for pix image.
+#   5. Process atmospheric correction for pix image.
+#   6. Stretch corrected bands from their cached statistics (see stats.py) and export enhanced image as a
+#      Cloud-Optimized GeoTIFF.
+# Parameters:
+#   piximage    - The input pix format image.
+#   hazeout     - The output haze corrected image.
+#   atcorout    - The output atmospherically corrected image.
+#   enhanceout  - The output enhanced TIF.
+#   identifier  - Unique identifier string read from input file name; keys the parameter cache.
+#   atmosdir    - Folder of cached atmospheric parameters.
+#   fast        - Use dark object subtraction instead of PCI haze removal and ATCOR.
+# ------------------------------------------------------------------------------------------------------------------- #
+def correction(piximage, hazeout, atcorout, enhanceout, identifier, atmosdir, fast=False):
+    start_time = time.time()
+    print "-" * 50
+    params = atmos.scene_params(piximage, identifier, atmosdir)
+    if fast:
+        print "Processing dark object subtraction..."
+        atmos.dos_correct(piximage, atcorout, params["dark"])
+    else:
+        correct_atcor(piximage, hazeout, atcorout, params)
+    print "Applying square root stretch..."
+    stats.stretch(atcorout, [1, 2, 3, 4, 5, 6, 7, 8, 9, 10], expo=0.5, out=enhanceout)    # Bands 1-10 to 16-bit TIF
+    export.to_cog(enhanceout)
+    completion_time = time.time() - start_time                      # Calculate time to complete
+    print "Enhancement completed in %i seconds." % completion_time
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define make_pca() function:                                                              -- Run on unmodified image
+#   1. Copy the first ten bands to a scratch PIX and add the first three principal components as channels 11-13.
+#      The bands are read from the memory-mapped copy of the merged stack if import wrote one (see mapped.py).
+#   2. Copy the scratch file into a chunked, compressed store (see store.py) and delete it. Later stages read only
+#      the bands they need from the store.
+#   3. Write the PCA statistics (eigenvalues, explained variance, eigenvectors) as JSON, from the cached band
+#      statistics of the input (see stats.py).
+# Parameters:
+#   merged_input    - The merged input PIX format file with all bands.
+#   pca_out         - The output store (<name>.chunks) with the bands and the first three principal components.
+#   identifier      - A unique naming identifier for report output.
+#   pca_rep         - The output PCA statistics report (JSON).
+# ------------------------------------------------------------------------------------------------------------------- #
+
+def make_pca(merged_input, pca_out, identifier, pca_rep):
+    start_time = time.time()
+    print "Starting Principal Component Analysis for file %s" % identifier
+    pcascr = os.path.splitext(pca_out)[0] + ".pix"              # PCI computes the components in a PIX file
+    bands = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    source = raster.open_stack(raster.best_source(merged_input))
+    store.export(source, pcascr, bands=bands)
+    source.close()                                              # Release the handle; pool workers run many scenes
+    pcimod(file=pcascr,                                         # A PCIException fails the stage, so land cover
+           pciop="ADD",                                         # and coastline never read missing channels
+           pcival=[0, 0, 3])                                    # Add 3 16 bit unsigned channels
+    pca(file=pcascr,
+        dbic=[1, 2, 3, 4, 5, 6, 7, 8, 9, 10],                   # Use first ten bands
+        eign=[1, 2, 3],                                         # Output first three eigenchannels
+        dboc=[11, 12, 13],                                      # Output to 3 new channels
+        rtype="SHORT")                                          # Statistics are reported below instead
+    store.ingest(pcascr, pca_out)                               # Bands 1-13, compressed per 256 x 256 chunk
+    os.remove(pcascr)
+    stats.write_json(stats.pca_report(stats.raster_stats(merged_input), bands, 3), pca_rep)
+    completion_time = time.time() - start_time                  # Calculate time to complete
+    print "PCA for %s completed in %i seconds." % (identifier, completion_time)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define enhance_pca() function
+#   1. Stretch the principal components linearly from their cached statistics and output to new file.
+#   2. Rewrite the output as a Cloud-Optimized GeoTIFF.
+# Parameters:
+#   pcain       - The PCA store written by make_pca().
+#   pcaout      - The output file for the enhanced PCA composite.
+#   identifier  - Unique identifier string read from input file name.
+# ------------------------------------------------------------------------------------------------------------------- #
+def enhance_pca(pcain, pcaout, identifier):
+    print "Stretching principal components for file %s" % identifier
+    stats.stretch(pcain, [11, 12, 13], expo=1.0, out=pcaout)       # Linear stretch of the components to TIF
+    export.to_cog(pcaout)
+    print "PCA enhancement for %s complete." %identifier
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define coastline() function:                                              -- Must be run AFTER make_pca() completes
+#   1. Export the PCA layers (channels 11-13 of the PCA store) to scratch pix file; no other bands are read.
+#   2. Add layer for classification result, and the cloud bitmap if cloud polygons are given
+#   3. Run unsupervised k-means clustering algorithm and output to new layer
+#   4. Export classification raster to polygon shapefile
+#   5. Select Sable Island polygon(s) that contain selection points (selection_polygons.shp)
+#   6. Convert to polyline format and smooth line to remove zig-zag from raster cells.
+# Parameters:
+#   pixin           - The PCA store written by make_pca().
+#   polygonout      - The output polygon format vector file.
+#   lineout         - The output polyline format vector file; the scratch classification PIX is written beside it.
+#   lineout_smooth  - The output polylines with a line smoothing algorithm applied.
+#   identifier      - Unique identifier string read from input file name.
+#   clouds          - Cloud polygons from mask_clouds() to leave out of the classification, or None.
+#   selpoints       - Polygons placed where the island is likely to be (selection_polygons.shp).
+#   gdb             - The project file geodatabase (sable.gdb).
+# ------------------------------------------------------------------------------------------------------------------- #
+def coastline(pixin, polygonout, lineout, lineout_smooth, identifier, clouds, selpoints, gdb):
+    start_time = time.time()
+    print "Generating coastline classification..."
+    id_string = "Coastline from file %s." % identifier
+    coastscr = os.path.splitext(lineout)[0] + ".pix"
+    pca = raster.open_stack(pixin)
+    store.export(pca, coastscr, bands=[11, 12, 13])                 # PCA channels to scratch PIX
+    pca.close()
+    pcimod(file=coastscr,                                           # Output scratch PIX file
+           pciop='ADD',                                             # Modification mode "Add"
+           pcival=[0, 2, 0, 0])                                     # Task - add two 16U channels
+    if clouds:
+        burn_clouds(clouds, coastscr, identifier)
+        kclus(file=coastscr,                                        # Run classification on scratch file
+              dbic=[1, 2, 3],                                       # Use three PCA layers
+              dboc=[4],
+              mask=[2],                                             # Use the not-cloud mask
+              numclus=[2],                                          # Two clusters - land, ocean
+              seedfile='',
+              maxiter=[20],
+              movethrs=[],
+              siggen="YES",
+              backval=[],
+              nsam=[])
+    else:
+        kclus(file=coastscr,                                        # Run classification on scratch file
+              dbic=[1, 2, 3],                                       # Use three PCA layers
+              dboc=[4],                                             # Output to blank layer
+              numclus=[2],                                          # Two clusters - land, ocean
+              seedfile='',
+              maxiter=[20],
+              movethrs=[],
+              siggen="YES",
+              backval=[],
+              nsam=[])
+    ras2poly(fili=coastscr,                                         # Use scratch PIX file
+             dbic=[4],                                              # Use classification channel
+             filo=polygonout,                                       # Polygon SHP output location
+             smoothv="YES",                                         # Smooth boundaries
+             dbsd=id_string,                                        # Layer description string
+             ftype="SHP",                                           # Shapefile format
+             foptions="")
+    workspace = parallel.workspace_gdb(gdb)                            # GDB workspace (per worker)
+    polygonout_lyr = identifier + "_polygon_lyr"                    # Define feature layer name for polygon output
+    arcpy.env.workspace = workspace                                 # Set default workspace
+    arcpy.env.overwriteOutput = True
+    arcpy.env.outputCoordinateSystem = "PROJCS['WGS_1984_UTM_Zone_20N',GEOGCS['GCS_WGS_1984',DATUM['D_WGS_1984',\
+    SPHEROID['WGS_1984',6378137.0,298.257223563]],PRIMEM['Greenwich',0.0],UNIT['Degree',0.0174532925199433]],\
+    PROJECTION['Transverse_Mercator'],PARAMETER['False_Easting',500000.0],PARAMETER['False_Northing',0.0],PARAMETER\
+    ['Central_Meridian',-63.0],PARAMETER['Scale_Factor',0.9996],PARAMETER['Latitude_Of_Origin',0.0],UNIT['Meter',1.0]]"
+    arcpy.MakeFeatureLayer_management(polygonout, polygonout_lyr)   # Make polygon feature layer
+    arcpy.AddField_management(in_table=polygonout,                  # Add new dissolve field
+                              field_name="DISV",
+                              field_type="SHORT",
+                              field_precision=1,
+                              field_scale=0,
+                              field_is_nullable="NULLABLE",
+                              field_is_required="NON_REQUIRED")
+    cb = "def calDisv(area):\\n    if area > 1000000000:\\n        return 0\\n    elif area < 1000000000:\\n        return 1"
+    arcpy.CalculateField_management(in_table=polygonout,            # Calculate dissolve field
+                                    field="DISV",
+                                    expression="calDisv(!Area!)",   # =0 if Ocean, =1 otherwise
+                                    expression_type="PYTHON",
+                                    code_block=cb)
+    polygons_dissolved = identifier + "_poly_dissolved"
+    arcpy.Dissolve_management(in_features=polygonout,               # Dissolve island polygons
+                              out_feature_class=polygons_dissolved,
+                              dissolve_field="DISV",
+                              multi_part="SINGLE_PART",
+                              unsplit_lines="DISSOLVE_LINES")
+    polygondisv_lyr = identifier + "_polygon_disv_lyr"
+    arcpy.MakeFeatureLayer_management(polygons_dissolved, polygondisv_lyr)  # Make polygon feature layer
+    arcpy.SelectLayerByAttribute_management(in_layer_or_view=polygondisv_lyr,
+                                            selection_type="NEW_SELECTION",
+                                            where_clause="DISV=1")
+    island_poly_dissolved = identifier + "island_poly_dissolved"
+    arcpy.CopyFeatures_management(in_features=polygondisv_lyr,
+                                  out_feature_class=island_poly_dissolved)
+    island_poly_disv_lyr = identifier + "_isl_poly_disv_lyr"
+    arcpy.MakeFeatureLayer_management(island_poly_dissolved, island_poly_disv_lyr)  # Make polygon feature layer
+    # Select island polygons that contain selection circle polygons (small, basically points).
+    # These points are placed where the island is likely to exist.
+    # Remove selection of features larger than 1B sq. m - this feature most likely represents ocean.
+    selpoints_lyr = identifier + "_selpoints_lyr"          # Layer per image, so images never share one
+    arcpy.MakeFeatureLayer_management(selpoints, selpoints_lyr)
+    arcpy.SelectLayerByLocation_management(island_poly_disv_lyr, 'CONTAINS', selpoints_lyr, '', 'NEW_SELECTION')
+
+    # Convert polygon features to polyline
+    arcpy.PolygonToLine_management(island_poly_disv_lyr,lineout,'IDENTIFY_NEIGHBORS')
+
+    # Smooth line features to fix zig-zag from raster cells
+    arcpy.cartography.SmoothLine(lineout,lineout_smooth,"PAEK",50,"")
+    os.remove(coastscr)
+    completion_time = time.time() - start_time                      # Calculate time to complete
+    print "Coastline vector completed in %i seconds. Written to file %s." % (completion_time, lineout_smooth)
+    return lineout_smooth
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define land_cover() function:                                              -- Must be run AFTER make_pca() completes
+#   1. Export the bands and PCA layers (channels 1-13 of the PCA store) to scratch pix file.
+#   2. Add layer for classification result, and the cloud bitmap if cloud polygons are given
+#   3. Run unsupervised k-means clustering algorithm and output to new layer. With a signature file, seed the
+#      clusters from its stored centres; if there is none yet, cluster from scratch and store this scene's centres
+#      as the reference, unless another scene did so first. No scene waits for the reference, so a reference scene
+#      that fails doesn't hold up land cover for the others.
+#   4. Rescale RGB and Classification layers to 8-bit and stretch RGB for use with pctmake()
+#   5. Use pctmake() to automatically generate a colour table from the rgb image layers.
+#   6. Export classification with colour table as a Cloud-Optimized GeoTIFF.
+#   7. Export classification as vector shapefile format.
+# Parameters:
+#   pixin           - The PCA store written by make_pca().
+#   vout            - The output classified vector file in SHP format; scratch files are written beside it.
+#   rout            - The output classified raster in TIF format.
+#   identifier      - Unique identifier string read from input file name.
+#   clouds          - Cloud polygons from mask_clouds() to leave out of the classification, or None.
+#   sigfile         - Signature JSON file shared by the scenes of a project (see signatures.py), or None to
+#                     cluster every scene from scratch.
+# ------------------------------------------------------------------------------------------------------------------- #
+def land_cover(pixin, vout, rout, identifier, clouds, sigfile=None):
+    start_time = time.time()                                        # Start timer
+    print "Generating land cover classification..."
+    pct_string = "PCT generated using RGB channels from file %s" % identifier
+    id_string = "Classification from file %s." % identifier
+    landcoverdir = os.path.dirname(vout)
+    landscr = os.path.join(landcoverdir, identifier + "_landcover.pix")     # Scratch pix file
+    rgb8bit = os.path.join(landcoverdir, identifier + "_rgb8bit.pix")       # Rescaled 8-bit pix file
+    seedfile = ""
+    signature = signatures.load(sigfile, len(LAND_CHANNELS), LAND_CLASSES) if sigfile else None
+    if signature is not None:
+        seedfile = signatures.write_seedfile(signature, os.path.join(landcoverdir, identifier + "_seeds.txt"))
+        print "Seeding land cover clusters from reference scene %s." % signature["reference"]
+    pca = raster.open_stack(pixin)
+    store.export(pca, landscr, bands=LAND_CHANNELS)                 # Bands and PCA to scratch PIX
+    pca.close()
+    pcimod(file=landscr,                                            # Output scratch PIX file
+           pciop='ADD',                                             # Modification mode "Add"
+           pcival=[0, 2, 0, 0])                                     # Task - add two 16U channels
+    if clouds:
+        burn_clouds(clouds, landscr, identifier)
+        kclus(file=landscr,                                         # Run classification on scratch file
+              dbic=LAND_CHANNELS,                                   # Use all image layers
+              dboc=[14],                                            # Output to blank layer
+              mask=[2],                                             # Use not-cloud mask
+              numclus=[LAND_CLASSES],                               # 24 clusters (not all will be used, but
+              seedfile=seedfile,                                    # this avoids cluster confusion)
+              maxiter=[20],
+              movethrs=[0.01],
+              siggen="YES",                                         # Save signature layers
+              backval=[],
+              nsam=[])
+    else:
+        kclus(file=landscr,                                         # Run classification on scratch file
+              dbic=LAND_CHANNELS,                                   # Use all image layers
+              dboc=[14],                                            # Output to blank layer
+              numclus=[LAND_CLASSES],                               # 24 clusters (not all will be used, but
+              seedfile=seedfile,                                    # this avoids cluster confusion)
+              maxiter=[20],
+              movethrs=[0.01],
+              siggen="YES",  # Save signature layers
+              backval=[],
+              nsam=[])
+    print "Land cover classification for file %s completed." % identifier
+    if seedfile:
+        os.remove(seedfile)
+    elif sigfile:
+        centres = signatures.class_centres(landscr, LAND_CHANNELS, 14, LAND_CLASSES)
+        if any(centres) and signatures.save(sigfile, identifier, centres, len(LAND_CHANNELS)):
+            print "Stored land cover cluster centres of %s in %s." % (identifier, sigfile)
+    print "Creating a colour table for classification result..."
+    scale(fili=landscr,                                             # Rescale layers to 8-bit for use with pctmake
+          filo=rgb8bit,
+          dbic=[1, 2, 3, 14],                                       # Rescale RGB and classification layer
+          dboc=[],
+          sfunct="LIN",
+          datatype="8U",                                            # Scale to 8-bit unsigned
+          ftype="PIX")                                              # PIX format
+    stats.stretch(rgb8bit, [1, 2, 3], expo=0.5)                     # Stretch RGB in place for pctmake
+    pctmake(file=rgb8bit,                                           # Make Colour table from rescaled RGB
+            dbic=[3, 2, 1],                                         # RGB layers
+            dblut=[],                                               # RGB layers are already stretched
+            dbtc=[4],                                               # Classification layer
+            dbpct=[],                                               # Make new PCT
+            mask=[],
+            dbsn="TC_PCT",                                          # PCT name
+            dbsd=pct_string)                                        # PCT description
+    pct_segment = raster.find_segment(rgb8bit, raster.SEG_PCT, "TC_PCT")   # Segment number pctmake assigned
+    print "Colour table generated from RGB layers and applied to %s classification result." % identifier
+    print "Converting Raster PCT to ArcMap Colour Layer..."
+    pct_txt = os.path.join(landcoverdir, identifier + "_pct.txt")
+    pctwrit(file=rgb8bit,                                           # Export constructed PCT to text file
+            dbpct=[pct_segment],                                    # PCT segment
+            pctform="ATT",                                          # Write in attribute format
+            tfile=pct_txt)
+    clrfile = os.path.join(landcoverdir,identifier + "_landcover.clr")
+    if os.path.isfile(clrfile):                                     # Using append mode, so make sure file is deleted
+        os.remove(clrfile)
+    pct = open(pct_txt, "r")                                        # Open exported PCT text file in read mode
+    clr = open(clrfile, "w")                                        # Open new CLR file in write mode
+    for line in pct:
+        if line[0] != "!" and line[3] == " ":                       # If line[3] not blank, line is unused range
+            a1 = line[8]                                            # and if line starts with "!" it is the file header
+            a2 = line[9]                                            # Number range is 0-255 so three possible digits
+            a3 = line[10]                                           # Assign as int() to ignore blank digit spaces
+            att = int(a1 + a2 + a3)                                 # Read number representing attribute
+            r1 = line[15]
+            r2 = line[16]
+            r3 = line[17]
+            red = int(r1 + r2 + r3)                                 # Read number representing red value
+            g1 = line[20]
+            g2 = line[21]
+            g3 = line[22]
+            green = int(g1 + g2 + g3)                               # Read number representing green value
+            b1 = line[25]
+            b2 = line[26]
+            b3 = line[27]
+            blue = int(b1 + b2 + b3)                                # Read number representing blue value
+            clr.write("%s %s %s %s\n" % (att, red, green, blue))    # Write attribute and RGB value to CLR file
+    clr.close()
+    print "Raster PCT converted to ArcMap colour layer."
+    print "Exporting classified raster to tif..."
+    fexport(fili=rgb8bit,                                           # Export raster
+            filo=rout,                                              # Raster output location
+            dbic=[4],                                               # Classification channel
+            dbpct=[pct_segment],                                    # Colour table segment
+            ftype="TIF",                                            # TIF format
+            foptions="")
+    export.to_cog(rout, resampling="NEAREST")                       # Tiled, with class overviews
+    print "Classification exported to %s." % rout
+# ------------------------------------------------------------------------------------------------------------------- #
+#    TODO this section is included for reference, although not functional currently. Future exploration of automatic
+#    TODO application of symbology would be desirable.
+#    print "Applying colour map to layer file..."
+#    workspace = os.path.join(workingdir, "sable.gdb")  # Define GDB workspace
+#    ras_lyr = identifier + "_raster_lyr"  # Define feature layer name for polygon output
+#    lyr_out = rout[:-4] + ".lyr"
+#    arcpy.env.workspace = workspace  # Set default workspace
+#    arcpy.env.overwriteOutput = True
+#    arcpy.env.outputCoordinateSystem = "PROJCS['WGS_1984_UTM_Zone_20N',GEOGCS['GCS_WGS_1984',DATUM['D_WGS_1984',\
+#        SPHEROID['WGS_1984',6378137.0,298.257223563]],PRIMEM['Greenwich',0.0],UNIT['Degree',0.0174532925199433]],\
+#        PROJECTION['Transverse_Mercator'],PARAMETER['False_Easting',500000.0],PARAMETER['False_Northing',0.0],PARAMETER\
+#        ['Central_Meridian',-63.0],PARAMETER['Scale_Factor',0.9996],PARAMETER['Latitude_Of_Origin',0.0],UNIT['Meter',1.0]]"
+#    arcpy.BuildRasterAttributeTable_management(in_raster=rout)
+#    arcpy.MakeRasterLayer_management(in_raster=rout,
+#                                     out_rasterlayer=ras_lyr)
+#    arcpy.SaveToLayerFile_management(in_layer=ras_lyr,
+#                                     out_layer=lyr_out,
+#                                     is_relative_path="RELATIVE")
+#    arcpy.mapping.UpdateLayer(d)
+#    print "Exported layer file to %s" % lyr_out
+#    print "Applying colour map to layer file..."
+#   arcpy.AddColormap_management(in_raster=lyr_out,
+#                                 input_CLR_file=clrfile)
+#    print "Colour map applied to ArcMap layer file %s." % lyr_out
+# ------------------------------------------------------------------------------------------------------------------- #
+    print "Exporting classification to shapefile..."
+    ras2poly(fili=rgb8bit,                                          # Export to vector
+             dbic=[4],                                              # Use classification channel
+             filo=vout,                                             # Vector output location
+             smoothv="NO",                                          # Don't smooth boundaries
+             dbsd=id_string,                                        # Layer description string
+             ftype="SHP",                                           # Shapefile format
+             foptions="")
+    print "Vector export complete. Wrote to %s." % vout
+    os.remove(landscr)                                              # Delete intermediate PIX files
+    os.remove(rgb8bit)
+    os.remove(rgb8bit + stats.SUFFIX)                               # and the statistics cache of the stretch
+    completion_time = time.time() - start_time                      # Calculate time to complete
+    print "Land cover classification process completed for image %s in %i seconds." % (identifier, completion_time)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define make_composite() function:                                      -- Must be run AFTER mask_clouds() completes
+#   1. Select merged images acquired inside the date window.
+#   2. Build a cloud-free composite from their clear pixels, using the cloud polygons from mask_clouds().
+# Parameters:
+#   scene_list  - (scene ID, acquisition date, merged 10m PIX file) for each image in this run.
+#   start       - First acquisition date in the window (YYYYMMDD).
+#   end         - Last acquisition date in the window (YYYYMMDD).
+#   method      - "median" for per-band median, "maxndvi" for the greenest clear observation.
+#   compout     - The output composite PIX file.
+#   maskdir     - Folder of cloud polygons written by mask_clouds().
+# ------------------------------------------------------------------------------------------------------------------- #
+def make_composite(scene_list, start, end, method, compout, maskdir):
+    scenes = composite.select_scenes(scene_list, maskdir, start, end)
+    print "Building %s composite from %i images acquired %s to %s..." % (method, len(scenes), start, end)
+    return composite.build_composite(scenes, compout, method)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define scene_tasks() function:
+#   1. Return the stage tasks for one image, with the dependencies between them (see parallel.py):
+#       pca and mask (if 60m bands exist) -> land_cover, coastline; pca -> pca_composite; correction before or
+#       after pca.
+#      Land cover is seeded from the project signature file once one is stored (see land_cover()).
+# Parameters:
+#   iid             - Scene ID (<mission>_<date>).
+#   merged          - The merged 10m PIX file.
+#   pix60           - The 60m atmospheric bands PIX file, or None.
+#   part_cloud      - Treat the image as partially clouded in classification.
+#   correct_first   - Run atmospheric correction first and classify the corrected image.
+#   fast_correction - Use dark object subtraction instead of haze removal and ATCOR.
+#   paths           - Project folders from project.paths().
+# ------------------------------------------------------------------------------------------------------------------- #
+def scene_tasks(iid, merged, pix60, part_cloud, correct_first, fast_correction, paths):
+    tasks = []
+    hzrm_merge = os.path.join(paths["atcor"], iid + "_hzrm.pix")
+    atcor_merge = os.path.join(paths["atcor"], iid + "_atcor.pix")
+    enhanced_tc = os.path.join(paths["atcor"], iid + "_enhanced.tif")
+    coastshp = os.path.join(paths["coastline"], iid + "_coastline.shp")
+    coastpoly = os.path.join(paths["coastline"], iid + "_coastline_polygons.shp")
+    coastsmooth = os.path.join(paths["coastline"], iid + "_coastline_smoothed.shp")
+    landshp = os.path.join(paths["landcover"], iid + "_landcover.shp")
+    landtif = os.path.join(paths["landcover"], iid + "_landcover.tif")
+    pca_image = os.path.join(paths["pca"], iid + "_pca.chunks")    # Chunked store, see store.py
+    pca_rep = os.path.join(paths["pca"], "PCA_" + iid + "_report.json")
+    pca_tif = os.path.join(paths["pca"], iid + "_pca_enhanced.tif")
+    cloudshp = os.path.join(paths["masks"], iid + "_cloud_polygons.shp")
+    pca_task = iid + ":pca"
+    class_deps = [pca_task]                                 # Classification waits for the PCA, and for the
+    clouds = None                                           # cloud polygons if the image is partly clouded
+    if pix60:
+        tasks.append(parallel.Task(iid + ":mask", iid, "mask", mask_clouds,
+                                   (pix60, cloudshp, iid, paths["gdb"]), []))
+        class_deps = [pca_task, iid + ":mask"]
+        clouds = cloudshp if part_cloud else None
+
+    correction_args = (merged, hzrm_merge, atcor_merge, enhanced_tc, iid, paths["atmos"], fast_correction)
+    if correct_first:                                       # PCA and classification use the corrected image
+        tasks.append(parallel.Task(iid + ":correction", iid, "correction", correction, correction_args, []))
+        tasks.append(parallel.Task(pca_task, iid, "pca", make_pca, (atcor_merge, pca_image, iid, pca_rep),
+                                   [iid + ":correction"]))
+    else:
+        # correction() writes masks into the merged file that make_pca() exports from, so it waits for the PCA.
+        tasks.append(parallel.Task(pca_task, iid, "pca", make_pca, (merged, pca_image, iid, pca_rep), []))
+        tasks.append(parallel.Task(iid + ":correction", iid, "correction", correction, correction_args,
+                                   [pca_task]))
+    tasks.append(parallel.Task(iid + ":pca_composite", iid, "pca_composite", enhance_pca, (pca_image, pca_tif, iid),
+                               [pca_task]))
+    tasks.append(parallel.Task(iid + ":land_cover", iid, "land_cover", land_cover,
+                               (pca_image, landshp, landtif, iid, clouds, paths["signatures"]), class_deps))
+    tasks.append(parallel.Task(iid + ":coastline", iid, "coastline", coastline,
+                               (pca_image, coastpoly, coastshp, coastsmooth, iid, clouds, paths["selection"],
+                                paths["gdb"]), class_deps))
+    return tasks
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define vector_outputs() function:
+#   1. Return the shapefiles the coastline and land cover tasks write, for export.package().
+# Parameters:
+#   tasks       - Tasks from scene_tasks() and the composite tasks of a run.
+# ------------------------------------------------------------------------------------------------------------------- #
+def vector_outputs(tasks):
+    shapefiles = []
+    for task in tasks:
+        if task.stage == "coastline":
+            shapefiles.extend(task.args[1:4])                       # Polygons, coastline, smoothed coastline
+        elif task.stage == "land_cover":
+            shapefiles.append(task.args[1])
+    return shapefiles
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define check_inputs() function:
+#   1. Return the inputs of a run that are missing: the project geodatabase and coastline selection polygons, and
+#      the merged stack of every scene. Only file existence is checked, so no backend library is loaded.
+# Parameters:
+#   paths       - Project folders from project.paths().
+#   merged_list - Merged 10m PIX files of the scenes to process.
+# ------------------------------------------------------------------------------------------------------------------- #
+def check_inputs(paths, merged_list):
+    missing = [path for path in (paths["gdb"], paths["selection"]) if not os.path.exists(path)]
+    return missing + [path for path in merged_list if not path or not os.path.isfile(path)]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Stage outputs:
+#   - Argument positions of the files each stage writes (outputs) or adds to (inplace). Tasks run through
+#     checkpoint.call(), which writes them under partial names and renames them once the stage succeeds, and
+#     checkpoint.remaining() skips done stages whose outputs exist when a run is resumed.
+#   - Correction also writes masks into the merged input (piximage); that file is not copied for every scene, and
+#     the masks are rewritten when correction runs again. Its haze removal output is an intermediate file.
+# ------------------------------------------------------------------------------------------------------------------- #
+mask_clouds.outputs = (1,)                                          # Cloud polygons
+correction.outputs = (2, 3)                                         # Corrected PIX, enhanced TIF
+make_pca.outputs = (1, 3)                                           # PCA store, report
+enhance_pca.outputs = (1,)                                          # Stretched PCA composite (COG)
+coastline.outputs = (1, 2, 3)                                       # Polygons, coastline, smoothed coastline
+land_cover.outputs = (1, 2)                                         # Classified vector and raster
+make_composite.outputs = (4,)                                       # Composite PIX
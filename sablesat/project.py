@@ -0,0 +1,45 @@
+# =================================================================================================================== #
+# Script Name:	project.py
+# Author:	    Brian Laureijs
+# Purpose:      Folder layout of a Sable Island project, for the scripts that drive the sablesat stage functions.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Path joining
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define paths() function:
+#   1. Return {name: path} for the inputs, outputs and caches of a project folder. The stage functions in
+#      importer.py and processing.py never look these up themselves; callers pass the paths they need.
+# Parameters:
+#   root        - The project folder (the working directory for the scripts).
+# Example:
+#   paths = project.paths(os.getcwd())
+#   processing.make_pca(merged, os.path.join(paths["pca"], iid + "_pca.chunks"), iid, report)
+# ------------------------------------------------------------------------------------------------------------------- #
+def paths(root):
+    return {"root": root,
+            "input": os.path.join(root, "input"),                   # Unzipped Sentinel-2 products
+            "pix": os.path.join(root, "pix"),                       # Imported PIX stacks
+            "clip": os.path.join(root, "clip_extent", "clip_ext.pix"),
+            "clip_json": os.path.join(root, "clip_extent", "clip_ext.geojson"),
+            "atcor": os.path.join(root, "atcor"),                   # Corrected PIX output
+            "pca": os.path.join(root, "pca"),
+            "coastline": os.path.join(root, "coastline"),
+            "masks": os.path.join(root, "masks"),                   # Cloud mask polygons
+            "landcover": os.path.join(root, "landcover"),
+            "composite": os.path.join(root, "composite"),
+            "workers": os.path.join(root, "workers"),               # Private workspaces of worker processes
+            "atmos": os.path.join(root, "cache", "atmos"),          # Cached atmospheric parameters
+            "grids": os.path.join(root, "cache", "grids"),          # Cached band merge resampling tables
+            "signatures": os.path.join(root, "cache", "signatures", "landcover.json"),  # Land cover cluster centres
+            "traces": os.path.join(root, "traces"),                 # Stage timing records
+            "exports": os.path.join(root, "exports"),               # GeoPackages of run outputs
+            "catalog": os.path.join(root, "sable_catalog.sqlite"),
+            "run": os.path.join(root, "sable_run.json"),            # Answers of the last run, for --resume
+            "gdb": os.path.join(root, "sable.gdb"),
+            "selection": os.path.join(root, "selection_points", "selection_polygons.shp")}
@@ -0,0 +1,187 @@
+# =================================================================================================================== #
+# Script Name:	raster.py
+# Author:	    Brian Laureijs
+# Purpose:      Windowed raster access for the PIX stacks written by import.py and image_processing.py.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # File checks
+import numpy                                        # Array processing
+from osgeo import gdal                              # PIX (PCIDSK) and TIF read/write
+
+gdal.UseExceptions()                                # Raise errors instead of returning None
+
+SEG_PCT = 171                                       # PIX segment type of pseudocolour tables (see find_segment())
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define RasterStack class:
+#   1. Open a multi-band raster (PIX, TIF) read-only.
+#   2. Expose size, band count and georeferencing.
+#   3. Read band subsets for a pixel window without loading the full image.
+# Parameters:
+#   path        - The raster file to open.
+# ------------------------------------------------------------------------------------------------------------------- #
+class RasterStack(object):
+    def __init__(self, path):
+        self.path = path
+        self.dataset = gdal.Open(path, gdal.GA_ReadOnly)
+        self.xsize = self.dataset.RasterXSize
+        self.ysize = self.dataset.RasterYSize
+        self.count = self.dataset.RasterCount
+        self.geotransform = self.dataset.GetGeoTransform()
+        self.projection = self.dataset.GetProjection()
+
+    def read(self, bands, xoff, yoff, xsize, ysize):
+        window = numpy.empty((len(bands), ysize, xsize),            # One plane per requested band
+                             dtype=gdal_dtype(self.dataset.GetRasterBand(bands[0]).DataType))
+        for i in range(len(bands)):
+            band = self.dataset.GetRasterBand(bands[i])             # Band numbers are 1-based, as in PCI dbic
+            window[i] = band.ReadAsArray(xoff, yoff, xsize, ysize)
+        return window
+
+    def close(self):
+        self.dataset = None                                         # Release the GDAL file handle
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define gdal_dtype() function:
+#   1. Translate a GDAL band data type into the matching numpy dtype.
+# Parameters:
+#   datatype    - GDAL data type constant (e.g. gdal.GDT_UInt16).
+# ------------------------------------------------------------------------------------------------------------------- #
+def gdal_dtype(datatype):
+    types = {gdal.GDT_Byte: numpy.uint8,
+             gdal.GDT_UInt16: numpy.uint16,
+             gdal.GDT_Int16: numpy.int16,
+             gdal.GDT_UInt32: numpy.uint32,
+             gdal.GDT_Int32: numpy.int32,
+             gdal.GDT_Float32: numpy.float32,
+             gdal.GDT_Float64: numpy.float64}
+    return types[datatype]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define numpy_gdal_type() function:
+#   1. Translate a numpy dtype into the matching GDAL band data type.
+# Parameters:
+#   dtype       - numpy dtype (e.g. numpy.uint16).
+# ------------------------------------------------------------------------------------------------------------------- #
+def numpy_gdal_type(dtype):
+    types = {numpy.dtype(numpy.uint8): gdal.GDT_Byte,
+             numpy.dtype(numpy.uint16): gdal.GDT_UInt16,
+             numpy.dtype(numpy.int16): gdal.GDT_Int16,
+             numpy.dtype(numpy.uint32): gdal.GDT_UInt32,
+             numpy.dtype(numpy.int32): gdal.GDT_Int32,
+             numpy.dtype(numpy.float32): gdal.GDT_Float32,
+             numpy.dtype(numpy.float64): gdal.GDT_Float64}
+    return types[numpy.dtype(dtype)]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define open_stack() function:
+#   1. Open a raster file, memory-mapped stack or chunked store with the same read() interface.
+# Parameters:
+#   path        - A raster file, a mapped ".dat" file, or a store directory ending in ".chunks".
+# ------------------------------------------------------------------------------------------------------------------- #
+def open_stack(path):
+    if path.endswith(".chunks"):
+        from sablesat import store                                  # Imported here; store depends on this module
+        return store.ChunkStore(path)
+    if path.endswith(".dat"):
+        from sablesat import mapped
+        return mapped.MappedStack(path)
+    return RasterStack(path)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define best_source() function:
+#   1. Return the memory-mapped (.dat) copy of a PIX stack if one was written, else the PIX.
+# Parameters:
+#   path        - The PIX file.
+# ------------------------------------------------------------------------------------------------------------------- #
+def best_source(path):
+    base = os.path.splitext(path)[0]
+    if os.path.isfile(base + ".dat"):
+        return base + ".dat"                                        # Zero-copy reads from the mapped copy
+    return path
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define same_grid() function:
+#   1. Check that two stacks share size, geotransform and projection so pixels line up one-to-one.
+# Parameters:
+#   a, b        - RasterStack objects to compare.
+# ------------------------------------------------------------------------------------------------------------------- #
+def same_grid(a, b):
+    if (a.xsize, a.ysize) != (b.xsize, b.ysize):
+        return False
+    for i in range(6):
+        if abs(a.geotransform[i] - b.geotransform[i]) > 1e-6:     # Allow for float noise in PIX georeferencing
+            return False
+    return a.projection == b.projection
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define strips() function:
+#   1. Yield (yoff, ysize) row windows covering an image from top to bottom.
+# Parameters:
+#   ysize       - The number of image rows.
+#   rows        - The number of rows per strip.
+# ------------------------------------------------------------------------------------------------------------------- #
+def strips(ysize, rows):
+    rows = max(1, int(rows))
+    for yoff in range(0, ysize, rows):
+        yield yoff, min(rows, ysize - yoff)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define create_like() function:
+#   1. Create a new raster on the same grid (size, geotransform, projection) as a reference stack.
+# Parameters:
+#   path        - The output raster file.
+#   like        - RasterStack providing the grid.
+#   count       - The number of output bands.
+#   datatype    - GDAL data type for the output bands.
+#   driver      - GDAL driver name; PCIDSK writes PIX files readable by the pci functions.
+#   options     - GDAL creation options for the driver.
+# ------------------------------------------------------------------------------------------------------------------- #
+def create_like(path, like, count, datatype=gdal.GDT_UInt16, driver="PCIDSK", options=None):
+    out = gdal.GetDriverByName(driver).Create(path, like.xsize, like.ysize, count, datatype, options or [])
+    out.SetGeoTransform(like.geotransform)
+    out.SetProjection(like.projection)
+    return out
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define find_segment() function:
+#   1. Read the segment pointer table of a PIX file: the header gives its first block (bytes 440-455) and length in
+#      512 byte blocks (bytes 456-463). Each 32 byte pointer holds an active flag ("A", or "L" if locked), the
+#      segment type (3 digits) and the segment name (8 characters); segment numbers count pointers from 1.
+#   2. Return the number of the last active segment of the given type and name, e.g. the colour table that pctmake
+#      just added, so later steps don't depend on how many segments PCI has created before it.
+# Parameters:
+#   path        - The PIX file.
+#   seg_type    - PCIDSK segment type, e.g. SEG_PCT.
+#   name        - Segment name (dbsn).
+# ------------------------------------------------------------------------------------------------------------------- #
+def find_segment(path, seg_type, name):
+    pix = open(path, "rb")
+    header = pix.read(512)
+    if not header.startswith("PCIDSK"):
+        pix.close()
+        raise ValueError("%s is not a PIX file" % path)
+    pix.seek((int(header[440:456]) - 1) * 512)
+    pointers = pix.read(int(header[456:464]) * 512)
+    pix.close()
+    found = None
+    for i in range(len(pointers) // 32):
+        pointer = pointers[i * 32:(i + 1) * 32]
+        if pointer[0] in "AL" and pointer[1:4].strip() == str(seg_type) and pointer[4:12].strip() == name:
+            found = i + 1
+    if found is None:
+        raise ValueError("No segment %s of type %i in %s" % (name, seg_type, path))
+    return found
@@ -0,0 +1,188 @@
+# =================================================================================================================== #
+# Script Name:	resample.py
+# Author:	    Brian Laureijs
+# Purpose:      Band merging onto the 10m grid with cached resampling tables, applied as numpy gathers.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # File checks
+import math                                         # Tap counts
+import time                                         # Merge timer
+import hashlib                                      # Table cache keys
+import collections                                  # Grid records
+import numpy                                        # Array processing
+from sablesat import raster                         # Windowed PIX access
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+METHODS = ("nearest", "bilinear", "average")
+tables = {}                                         # Cache key -> resampling table, for this process
+
+# Every band of a Sentinel-2 tile sits on a north-up grid in the same UTM zone, so resampling separates into one
+# table per axis. A table holds, for every output column (or row), the source columns it reads ("taps") and their
+# weights: 1 tap for nearest, 2 for bilinear, and enough to cover the output pixel for average. Indices of -1 fall
+# outside the source and read as nodata. Tables depend only on the two grids, which are the same for every scene of
+# a tile clipped to the same AOI, so they are computed once and saved in the cache folder as <key>.npz.
+
+Grid = collections.namedtuple("Grid", "xsize ysize geotransform projection")
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define union_grid() function:
+#   1. Return the grid that covers all the given grids at the resolution of the first, aligned to its pixels.
+#      This is the output grid of datamerge with extent="UNION".
+# Parameters:
+#   grids       - Grid records (or RasterStacks); the first sets the resolution.
+# ------------------------------------------------------------------------------------------------------------------- #
+def union_grid(grids):
+    ref = grids[0]
+    ox, px, rx, oy, ry, py = ref.geotransform
+    left = min(g.geotransform[0] for g in grids)
+    right = max(g.geotransform[0] + g.xsize * g.geotransform[1] for g in grids)
+    top = max(g.geotransform[3] for g in grids)
+    bottom = min(g.geotransform[3] + g.ysize * g.geotransform[5] for g in grids)
+    col0 = int(math.floor((left - ox) / px + 1e-6))                 # Snap outwards to the reference pixels
+    col1 = int(math.ceil((right - ox) / px - 1e-6))
+    row0 = int(math.floor((top - oy) / py + 1e-6))
+    row1 = int(math.ceil((bottom - oy) / py - 1e-6))
+    return Grid(col1 - col0, row1 - row0, (ox + col0 * px, px, rx, oy + row0 * py, ry, py), ref.projection)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define axis_taps() function:
+#   1. Return (indices, weights), each shaped (taps, output size), for resampling one axis.
+# Parameters:
+#   src_origin, src_step, src_size - Source grid along the axis (origin and step from the geotransform).
+#   dst_origin, dst_step, dst_size - Output grid along the axis.
+#   method      - "nearest", "bilinear" or "average".
+# ------------------------------------------------------------------------------------------------------------------- #
+def axis_taps(src_origin, src_step, src_size, dst_origin, dst_step, dst_size, method):
+    edges = (dst_origin + numpy.arange(dst_size + 1) * dst_step - src_origin) / src_step    # In source pixels
+    centres = (edges[:-1] + edges[1:]) / 2
+    inside = (centres >= 0) & (centres < src_size)
+    if method == "nearest":
+        indices = numpy.floor(centres)[None]
+        weights = numpy.ones((1, dst_size))
+    elif method == "bilinear":
+        start = numpy.floor(centres - 0.5)
+        fraction = centres - 0.5 - start
+        indices = numpy.array([start, start + 1]).clip(0, src_size - 1)  # Edge pixels repeat outwards
+        weights = numpy.array([1 - fraction, fraction])
+    elif method == "average":
+        ratio = abs(dst_step / float(src_step))
+        taps = int(math.ceil(ratio)) + 1
+        start = numpy.floor(edges[:-1] + 1e-9)
+        indices = numpy.array([start + k for k in range(taps)])
+        overlap = numpy.minimum(edges[1:], indices + 1) - numpy.maximum(edges[:-1], indices)
+        weights = overlap.clip(0, None) / ratio                     # Share of the output pixel each source covers
+    else:
+        raise ValueError("Unknown resampling method %s; use one of %s." % (method, ", ".join(METHODS)))
+    valid = inside & (indices >= 0) & (indices < src_size)
+    return numpy.where(valid, indices, -1).astype(numpy.int32), numpy.where(valid, weights, 0).astype(numpy.float32)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define table() function:
+#   1. Return the resampling table from one grid to another, from memory, the cache folder, or computed and saved.
+# Parameters:
+#   src         - Source Grid (or RasterStack).
+#   dst         - Output Grid.
+#   method      - "nearest", "bilinear" or "average".
+#   cachedir    - Folder of saved tables. Not cleared between runs.
+# ------------------------------------------------------------------------------------------------------------------- #
+def table(src, dst, method, cachedir):
+    key = hashlib.sha1(repr((method, src.xsize, src.ysize, [round(v, 6) for v in src.geotransform],
+                             dst.xsize, dst.ysize, [round(v, 6) for v in dst.geotransform]))).hexdigest()[:16]
+    if key in tables:
+        return tables[key]
+    cache_file = os.path.join(cachedir, key + ".npz")
+    if os.path.isfile(cache_file):
+        saved = numpy.load(cache_file)
+        tables[key] = dict((name, saved[name]) for name in ("ycols", "yweights", "xcols", "xweights"))
+        saved.close()
+        return tables[key]
+    ycols, yweights = axis_taps(src.geotransform[3], src.geotransform[5], src.ysize,
+                                dst.geotransform[3], dst.geotransform[5], dst.ysize, method)
+    xcols, xweights = axis_taps(src.geotransform[0], src.geotransform[1], src.xsize,
+                                dst.geotransform[0], dst.geotransform[1], dst.xsize, method)
+    tables[key] = {"ycols": ycols, "yweights": yweights, "xcols": xcols, "xweights": xweights}
+    if not os.path.isdir(cachedir):
+        os.makedirs(cachedir)
+    scratch = "%s.%i.npz" % (cache_file[:-4], os.getpid())         # Workers may save the same table at once
+    numpy.savez(scratch, **tables[key])
+    try:
+        os.rename(scratch, cache_file)
+    except OSError:
+        os.remove(scratch)
+    return tables[key]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define apply() function:
+#   1. Resample one band with a table. Nearest neighbour is a pure gather. Bilinear and average weight the taps,
+#      leaving out nodata (zero) source pixels, and round back to the band's data type.
+# Parameters:
+#   band        - 2D source array.
+#   grid_table  - Table from table().
+# ------------------------------------------------------------------------------------------------------------------- #
+def apply(band, grid_table):
+    ycols, yweights = grid_table["ycols"], grid_table["yweights"]
+    xcols, xweights = grid_table["xcols"], grid_table["xweights"]
+    if len(ycols) == 1 and len(xcols) == 1:                         # Nearest: one gather per axis
+        out = band.take(ycols[0].clip(0, None), axis=0).take(xcols[0].clip(0, None), axis=1)
+        out[ycols[0] < 0, :] = 0
+        out[:, xcols[0] < 0] = 0
+        return out
+    total = numpy.zeros((ycols.shape[1], xcols.shape[1]), dtype=numpy.float32)
+    weight = numpy.zeros_like(total)
+    for a in range(len(ycols)):
+        rows = band.take(ycols[a].clip(0, None), axis=0)
+        for b in range(len(xcols)):
+            values = rows.take(xcols[b].clip(0, None), axis=1)
+            tap_weight = numpy.outer(yweights[a], xweights[b]) * (values != 0)
+            total += tap_weight * values
+            weight += tap_weight
+    out = numpy.zeros(total.shape, dtype=band.dtype)
+    covered = weight > 0
+    out[covered] = (total[covered] / weight[covered]).round()
+    return out
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define merge() function:
+#   1. Resample the bands of every input onto the union grid of the inputs, at the resolution of the first, with
+#      the method chosen for its group. This replaces datamerge(extent="UNION").
+#   2. Write the bands in input order to a PIX file and return it.
+# Parameters:
+#   groups      - (raster file, method) per band group, finest resolution first, e.g.
+#                 [(pix10, "nearest"), (pix20, "bilinear")].
+#   mergeout    - The output merged PIX file.
+#   cachedir    - Folder of saved resampling tables.
+# ------------------------------------------------------------------------------------------------------------------- #
+def merge(groups, mergeout, cachedir):
+    start_time = time.time()
+    stacks = [raster.RasterStack(path) for path, method in groups]
+    for stack in stacks[1:]:
+        if stack.projection != stacks[0].projection:
+            raise ValueError("%s is not in the projection of %s." % (stack.path, stacks[0].path))
+    target = union_grid(stacks)
+    dtype = numpy.dtype(raster.gdal_dtype(stacks[0].dataset.GetRasterBand(1).DataType))
+    out = raster.create_like(mergeout, target, sum(stack.count for stack in stacks), raster.numpy_gdal_type(dtype))
+    out_band = 1
+    for stack, (path, method) in zip(stacks, groups):
+        grid_table = table(stack, target, method, cachedir)
+        for band in range(1, stack.count + 1):
+            data = stack.read([band], 0, 0, stack.xsize, stack.ysize)[0]
+            out.GetRasterBand(out_band).WriteArray(apply(data, grid_table).astype(dtype))
+            out_band += 1
+        stack.close()
+    out.FlushCache()
+    out = None
+    completion_time = time.time() - start_time
+    print "Merged %i band groups onto a %i x %i grid in %.1f seconds." % (len(groups), target.xsize, target.ysize,
+                                                                          completion_time)
+    return mergeout
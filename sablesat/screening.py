@@ -0,0 +1,122 @@
+# =================================================================================================================== #
+# Script Name:	screening.py
+# Author:	    Brian Laureijs
+# Purpose:      Screen Sentinel-2 products by cloud cover and overlap with the clip extent before downloading.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+from osgeo import ogr                               # Footprint geometry
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+MAX_CLOUD = 30.0                                    # Default cloud cover percent above which downloads are deferred
+CLOUD_ATTRIBUTE = "Cloud cover percentage"          # Extended OData attribute holding the tile cloud cover
+
+DOWNLOAD = "download"                               # Screening decisions, in download order
+DEFER = "defer"                                     # Cloudy: downloaded last, only if asked for
+SKIP = "skip"                                       # Footprint misses the clip extent
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define load_aoi() function:
+#   1. Read the clip extent polygon(s) from a vector file in WGS 84 (e.g. clip_extent/clip_ext.geojson).
+#   2. Return them as one OGR geometry.
+# Parameters:
+#   path        - The clip extent vector file.
+# ------------------------------------------------------------------------------------------------------------------- #
+def load_aoi(path):
+    source = ogr.Open(path)
+    if source is None:
+        raise IOError("Unable to open clip extent %s" % path)
+    layer = source.GetLayer(0)
+    aoi = None
+    for feature in layer:
+        geometry = feature.GetGeometryRef().Clone()
+        aoi = geometry if aoi is None else aoi.Union(geometry)
+    source = None
+    if aoi is None:
+        raise ValueError("Clip extent %s has no features" % path)
+    return aoi
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define overlap() function:
+#   1. Return the fraction (0-1) of the clip extent covered by a product footprint.
+# Parameters:
+#   footprint   - Product footprint as WKT in WGS 84 longitude, latitude (as returned by sentinelsat).
+#   aoi         - Clip extent geometry from load_aoi().
+# ------------------------------------------------------------------------------------------------------------------- #
+def overlap(footprint, aoi):
+    geometry = ogr.CreateGeometryFromWkt(footprint)
+    if geometry is None or not geometry.Intersects(aoi):
+        return 0.0
+    return geometry.Intersection(aoi).GetArea() / aoi.GetArea()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define screen_product() function:
+#   1. Fetch the product metadata only (a few kB), including extended attributes for the cloud cover.
+#   2. Decide whether to download it: skip products that miss the clip extent, defer products above max_cloud.
+#   3. Return a record with the decision and the reason for it.
+# Parameters:
+#   api         - sentinelsat.SentinelAPI login.
+#   uuid        - Product UUID.
+#   aoi         - Clip extent geometry from load_aoi().
+#   max_cloud   - Cloud cover percent above which the download is deferred.
+# ------------------------------------------------------------------------------------------------------------------- #
+def screen_product(api, uuid, aoi, max_cloud):
+    info = api.get_product_odata(uuid, full=True)
+    cloud = info.get(CLOUD_ATTRIBUTE)
+    cover = overlap(info["footprint"], aoi)
+    record = {"uuid": uuid, "title": info["title"], "size": info["size"], "cloud": cloud, "overlap": cover}
+    if cover == 0:
+        record["decision"], record["reason"] = SKIP, "footprint does not reach the clip extent"
+    elif cloud is not None and cloud > max_cloud:
+        record["decision"], record["reason"] = DEFER, "%.1f%% cloud cover" % cloud
+    else:
+        record["decision"], record["reason"] = DOWNLOAD, "clear enough"
+    return record
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define screen() function:
+#   1. Screen each product; a product whose metadata can't be read is kept for download so nothing is lost.
+#   2. Return the records in download order: clearest first, then deferred products, then skipped products.
+# Parameters:
+#   api         - sentinelsat.SentinelAPI login.
+#   uuid_list   - Product UUIDs, e.g. from a cart file.
+#   aoi         - Clip extent geometry from load_aoi().
+#   max_cloud   - Cloud cover percent above which the download is deferred.
+# ------------------------------------------------------------------------------------------------------------------- #
+def screen(api, uuid_list, aoi, max_cloud=MAX_CLOUD):
+    records = []
+    for uuid in uuid_list:
+        try:
+            records.append(screen_product(api, uuid, aoi, max_cloud))
+        except Exception as error:
+            records.append({"uuid": uuid, "title": uuid, "size": None, "cloud": None, "overlap": None,
+                            "decision": DOWNLOAD, "reason": "metadata unavailable (%s)" % error})
+    order = {DOWNLOAD: 0, DEFER: 1, SKIP: 2}
+    records.sort(key=lambda record: (order[record["decision"]],
+                                     record["cloud"] if record["cloud"] is not None else 100.0))
+    return records
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define report() function:
+#   1. Print the screening decision for each product and the download volume saved.
+# ------------------------------------------------------------------------------------------------------------------- #
+def report(records):
+    saved = 0
+    for record in records:
+        cloud = "  ?  " if record["cloud"] is None else "%5.1f" % record["cloud"]
+        cover = "  ? " if record["overlap"] is None else "%3i%%" % (record["overlap"] * 100)
+        print "%-8s cloud %s%%  overlap %s  %s (%s)" % (record["decision"], cloud, cover, record["title"],
+                                                        record["reason"])
+        if record["decision"] != DOWNLOAD and record["size"]:
+            saved += record["size"]
+    print "Screening held back %.1f MB of downloads." % (saved / 1048576.0)
@@ -0,0 +1,180 @@
+# =================================================================================================================== #
+# Script Name:	segmented.py
+# Author:	    Brian Laureijs
+# Purpose:      Download products in parallel byte range segments over pooled keep-alive connections.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory and file manipulation
+import json                                         # Segment progress file
+import hashlib                                      # Checksums
+import threading                                    # Segment workers
+import requests                                     # HTTP sessions (installed with sentinelsat)
+import sentinelsat                                  # Copernicus API access
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+SEGMENTS = 2                                        # Parallel byte ranges per product
+MIN_SEGMENT = 16 * 2 ** 20                          # Don't split products into segments smaller than this
+BLOCK = 2 ** 20                                     # Bytes held in memory per segment while streaming to disk
+POOL = 8                                            # Keep-alive connections kept open to the hub
+TIMEOUT = (30, 120)                                 # Seconds to connect, and between received bytes
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define split() function:
+#   1. Divide a file size into up to `segments` inclusive byte ranges of at least min_segment bytes.
+# ------------------------------------------------------------------------------------------------------------------- #
+def split(size, segments, min_segment=MIN_SEGMENT):
+    count = max(1, min(segments, size // max(min_segment, 1)))
+    step = -(-size // count)                                        # Ceiling division
+    return [(first, min(first + step, size) - 1) for first in range(0, size, step)]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define md5sum() function:
+#   1. Return the MD5 checksum of a file, reading one block at a time.
+# ------------------------------------------------------------------------------------------------------------------- #
+def md5sum(path):
+    md5 = hashlib.md5()
+    source = open(path, "rb")
+    for block in iter(lambda: source.read(BLOCK), ""):
+        md5.update(block)
+    source.close()
+    return md5.hexdigest()
+
+
+# Raised when the server answers a range request with the whole file; the product is fetched in one piece instead.
+class RangesUnsupported(Exception):
+    pass
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define Fetcher class:
+#   - A drop-in for api.download(uuid, directory) that splits each product into byte range segments, downloads
+#     them side by side and streams each straight into its place in a preallocated file. One requests session
+#     with a keep-alive connection pool is shared by all segments and products. Finished segments are recorded,
+#     so a retry only fetches the segments that are missing.
+#   Example:
+#       bucket = downloader.TokenBucket()
+#       fetch = Fetcher(segments=2, bucket=bucket)
+#       downloader.Scheduler(api, workingdir, max_concurrent=1, fetch=fetch, bucket=bucket).run(uuid_list)
+#   Parameters:
+#       segments        - Parallel byte ranges per product. Each range is one connection to the hub, and the hub
+#                         limits connections per account, so segments x concurrent products should stay within it.
+#       min_segment     - Smallest segment size in bytes.
+#       pool            - Keep-alive connections kept open.
+#       bucket          - The scheduler's TokenBucket; every hub request takes a token from it. None to not limit.
+# ------------------------------------------------------------------------------------------------------------------- #
+class Fetcher(object):
+    def __init__(self, segments=SEGMENTS, min_segment=MIN_SEGMENT, pool=POOL, bucket=None):
+        self.segments = segments
+        self.min_segment = min_segment
+        self.pool = pool
+        self.bucket = bucket
+        self.session = None
+        self.lock = threading.Lock()
+
+    # Wait for a token before a hub request, if a bucket is shared.
+    def throttle(self):
+        if self.bucket is not None:
+            self.bucket.take()
+
+    # Share one pooled session, logged in with the credentials of the sentinelsat login.
+    def session_for(self, api):
+        with self.lock:
+            if self.session is None:
+                self.session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=self.pool)
+                self.session.mount("http://", adapter)
+                self.session.mount("https://", adapter)
+                self.session.auth = api.session.auth
+                self.session.headers.update(api.session.headers)
+            return self.session
+
+    # Stream one byte range into the file, one block at a time. Return the bytes written.
+    def fetch_range(self, session, url, path, first, last, whole):
+        headers = {} if whole else {"Range": "bytes=%i-%i" % (first, last)}
+        self.throttle()
+        response = session.get(url, headers=headers, stream=True, timeout=TIMEOUT)
+        try:
+            response.raise_for_status()
+            if not whole and response.status_code != 206:
+                raise RangesUnsupported()
+            written = 0
+            out = open(path, "r+b")
+            out.seek(first)
+            for block in response.iter_content(chunk_size=BLOCK):
+                out.write(block)
+                written += len(block)
+            out.close()
+        finally:
+            response.close()                                        # Return the connection to the pool
+        if written != last - first + 1:
+            raise requests.exceptions.ConnectionError("Segment %i-%i ended after %i bytes" % (first, last, written))
+        return written
+
+    # Download segments in parallel threads; record each finished segment in the progress file.
+    def fetch_segments(self, session, url, path, ranges, done, progress):
+        counts = {}
+        errors = []
+
+        def worker(index):
+            try:
+                counts[index] = self.fetch_range(session, url, path, ranges[index][0], ranges[index][1],
+                                                 len(ranges) == 1)
+                with self.lock:
+                    done.add(index)
+                    out = open(progress, "w")
+                    json.dump({"ranges": ranges, "done": sorted(done)}, out)
+                    out.close()
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(ranges)) if i not in done]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(counts.values()), errors
+
+    # Download one product like api.download(uuid, directory) and return the bytes transferred.
+    def __call__(self, api, uuid, directory):
+        self.throttle()
+        info = api.get_product_odata(uuid)
+        path = os.path.join(directory, info["title"] + ".zip")
+        if os.path.exists(path):                                    # Complete from an earlier run
+            return 0
+        temp_path = path + ".incomplete"
+        progress = path + ".parts"
+        size = info["size"]
+        ranges = split(size, self.segments, self.min_segment)
+        done = set()
+        if os.path.exists(temp_path) and os.path.getsize(temp_path) == size and os.path.exists(progress):
+            progress_file = open(progress, "r")
+            saved = json.load(progress_file)
+            progress_file.close()
+            if [tuple(r) for r in saved["ranges"]] == ranges:       # Resume with the same segments
+                done = set(saved["done"])
+        if not done:
+            out = open(temp_path, "wb")
+            out.truncate(size)                                      # Preallocate, so segments write in place
+            out.close()
+        session = self.session_for(api)
+        transferred, errors = self.fetch_segments(session, info["url"], temp_path, ranges, done, progress)
+        if [error for error in errors if isinstance(error, RangesUnsupported)]:
+            ranges, done = [(0, size - 1)], set()
+            transferred, errors = self.fetch_segments(session, info["url"], temp_path, ranges, done, progress)
+        if errors:
+            raise errors[0]                                         # The scheduler retries the missing segments
+        if md5sum(temp_path).lower() != info["md5"].lower():
+            os.remove(temp_path)
+            os.remove(progress)
+            raise sentinelsat.InvalidChecksumError("File corrupt: checksums do not match")
+        os.rename(temp_path, path)
+        os.remove(progress)
+        return transferred
@@ -0,0 +1,125 @@
+# =================================================================================================================== #
+# Script Name:	signatures.py
+# Author:	    Brian Laureijs
+# Purpose:      Store converged k-means cluster centres from a reference scene and seed later classifications from
+#               them, so every date converges quickly and keeps the same class IDs.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # File checks
+import json                                         # Signature files
+import time                                         # Creation date
+import numpy                                        # Array processing
+from sablesat import raster                         # Windowed PIX access
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+STRIP_ROWS = 512                                    # Rows read per pass
+
+# A signature file is JSON:
+#   {"reference": scene ID the centres came from, "created": date, "channels": input channel count,
+#    "numclus": cluster count, "centres": [[mean per input channel] per class, class 1 first]}
+# Classes the reference scene left empty are stored as null. They are seeded at 0 (nodata), so they stay empty in
+# later scenes too instead of taking pixels from the classes that were seen.
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define class_centres() function:
+#   1. Sum the input channels of every classified pixel per class in one pass over the image.
+#   2. Return the mean of each class 1..numclus, or None for classes with no pixels. Class 0 (unclassified, masked)
+#      and pixels that are zero in every input channel (nodata) are left out.
+# Parameters:
+#   pixfile     - PIX file with the input channels and the classification channel.
+#   channels    - Input channels of the classification (kclus dbic).
+#   class_channel - Classification channel (kclus dboc).
+#   numclus     - Number of clusters.
+# ------------------------------------------------------------------------------------------------------------------- #
+def class_centres(pixfile, channels, class_channel, numclus):
+    stack = raster.open_stack(pixfile)
+    sums = numpy.zeros((numclus + 1, len(channels)), dtype=numpy.float64)
+    counts = numpy.zeros(numclus + 1, dtype=numpy.int64)
+    for yoff, ysize in raster.strips(stack.ysize, STRIP_ROWS):
+        data = stack.read(channels, 0, yoff, stack.xsize, ysize).reshape(len(channels), -1)
+        classes = stack.read([class_channel], 0, yoff, stack.xsize, ysize).ravel().astype(numpy.int64)
+        valid = (classes > 0) & (classes <= numclus) & numpy.any(data != 0, axis=0)
+        classes = classes[valid]
+        counts += numpy.bincount(classes, minlength=numclus + 1)
+        for i in range(len(channels)):
+            sums[:, i] += numpy.bincount(classes, weights=data[i][valid], minlength=numclus + 1)
+    stack.close()
+    return [list(sums[c] / counts[c]) if counts[c] > 0 else None for c in range(1, numclus + 1)]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define load() function:
+#   1. Return the stored signature if the file exists and matches the channel and cluster counts, else None.
+# Parameters:
+#   sigfile     - The signature JSON file.
+#   channels    - Number of input channels of the classification.
+#   numclus     - Number of clusters.
+# ------------------------------------------------------------------------------------------------------------------- #
+def load(sigfile, channels, numclus):
+    if not os.path.isfile(sigfile):
+        return None
+    signature_file = open(sigfile, "r")
+    signature = json.load(signature_file)
+    signature_file.close()
+    if signature["channels"] != channels or signature["numclus"] != numclus:
+        print "Ignoring signature file %s: made for %i channels and %i clusters." % \
+              (sigfile, signature["channels"], signature["numclus"])
+        return None
+    return signature
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define save() function:
+#   1. Write the class centres of a reference scene to the signature file, unless another scene got there first.
+#   2. Return True if this scene became the reference.
+# Parameters:
+#   sigfile     - The signature JSON file.
+#   reference   - Scene ID of the reference scene.
+#   centres     - Class centres from class_centres().
+#   channels    - Number of input channels of the classification.
+# ------------------------------------------------------------------------------------------------------------------- #
+def save(sigfile, reference, centres, channels):
+    sigdir = os.path.dirname(sigfile)
+    if not os.path.isdir(sigdir):
+        os.makedirs(sigdir)
+    scratch = "%s.%i.tmp" % (sigfile, os.getpid())
+    signature_file = open(scratch, "w")
+    json.dump({"reference": reference,
+               "created": time.strftime("%Y%m%d"),
+               "channels": channels,
+               "numclus": len(centres),
+               "centres": centres}, signature_file, indent=1)
+    signature_file.close()
+    if os.path.isfile(sigfile):                             # A worker saved one while this scene was classified
+        os.remove(scratch)
+        return False
+    try:
+        os.rename(scratch, sigfile)                         # Fails on Windows if another worker won the race
+    except OSError:
+        os.remove(scratch)
+        return False
+    return True
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define write_seedfile() function:
+#   1. Write the stored centres as a kclus seed file: one line per class, one value per input channel.
+# Parameters:
+#   signature   - Signature from load().
+#   seedfile    - The output text file.
+# ------------------------------------------------------------------------------------------------------------------- #
+def write_seedfile(signature, seedfile):
+    seeds = open(seedfile, "w")
+    for centre in signature["centres"]:
+        if centre is None:
+            centre = [0.0] * signature["channels"]          # Empty in the reference scene; see note above
+        seeds.write(" ".join("%.4f" % value for value in centre) + "\n")
+    seeds.close()
+    return seedfile
@@ -0,0 +1,379 @@
+# =================================================================================================================== #
+# Script Name:	standin.py
+# Author:	    Brian Laureijs
+# Purpose:      Local stand-in for the Copernicus Open Access Hub, for running api_download.py without an account.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory and file manipulation
+import re                                           # URL matching
+import json                                         # Response bodies
+import time                                         # Product dates
+import uuid                                         # Product IDs
+import hashlib                                      # Archive checksums
+import argparse                                     # Command line options
+import threading                                    # Serve in the background
+import random                                       # Stand-in products
+import BaseHTTPServer                               # HTTP server
+import SocketServer                                 # One thread per connection
+import urlparse                                     # Query strings
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+# The hub answers sentinelsat through these endpoints (relative to the API URL, e.g. http://127.0.0.1:8080/):
+#   search?format=json&rows=..&start=..                - OpenSearch query (q= posted in the body; not filtered)
+#   odata/v1/Products('<uuid>')?$format=json           - Product metadata; with &$expand=Attributes also cloud cover
+#   odata/v1/Products('<uuid>')/Online/$value          - "true", or "false" for products in the long term archive
+#   odata/v1/Products('<uuid>')/$value                 - The product archive, with HTTP Range support
+PRODUCT_URL = re.compile(r"^/odata/v1/Products\('([^']+)'\)(/Online/\$value|/\$value)?$")
+BLOCK = 2 ** 16                                     # Bytes per write when serving archives
+SABLE_FOOTPRINT = [(-61.0, 43.3), (-59.6, 43.3), (-59.6, 44.3), (-61.0, 44.3), (-61.0, 43.3)]    # Covers clip_ext
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define odata_product() function:
+#   1. Build the OData JSON record the hub returns for a product, in the form sentinelsat parses.
+# Parameters:
+#   product     - Stand-in product record (see add_product()).
+#   base_url    - The stand-in API URL.
+#   full        - Include extended attributes (cloud cover, platform, ...).
+# ------------------------------------------------------------------------------------------------------------------- #
+def odata_product(product, base_url, full):
+    ring = " ".join(["%f,%f" % (lat, lon) for lon, lat in product["footprint"]])   # GML lists lat,lon
+    gml = ('<gml:Polygon srsName="http://www.opengis.net/gml/srs/epsg.xml#4326" '
+           'xmlns:gml="http://www.opengis.net/gml"><gml:outerBoundaryIs><gml:LinearRing>'
+           '<gml:coordinates>%s</gml:coordinates></gml:LinearRing></gml:outerBoundaryIs></gml:Polygon>' % ring)
+    stamp = "/Date(%i)/" % (product["time"] * 1000)
+    media = base_url + "odata/v1/Products('%s')/$value" % product["uuid"]
+    record = {"Id": product["uuid"],
+              "Name": product["title"],
+              "ContentLength": str(product["size"]),
+              "Checksum": {"Algorithm": "MD5", "Value": product["md5"]},
+              "ContentDate": {"Start": stamp, "End": stamp},
+              "CreationDate": stamp,
+              "IngestionDate": stamp,
+              "ContentGeometry": gml,
+              "Online": product["online"],
+              "__metadata": {"media_src": media},
+              "Attributes": {"__deferred": {}}}
+    if full:
+        date = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(product["time"]))
+        record["Attributes"] = {"results": [
+            {"Name": "Cloud cover percentage", "Value": "%.4f" % product["cloud"]},
+            {"Name": "Platform serial identifier", "Value": "Sentinel-" + product["title"][1:3]},
+            {"Name": "Product type", "Value": "S2MSI1C"},
+            {"Name": "Sensing start", "Value": date}]}
+    return {"d": record}
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define search_entry() function:
+#   1. Build the OpenSearch JSON entry for a product.
+# ------------------------------------------------------------------------------------------------------------------- #
+def search_entry(product, base_url):
+    wkt = "POLYGON((%s))" % ",".join(["%f %f" % (lon, lat) for lon, lat in product["footprint"]])
+    date = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(product["time"]))
+    return {"id": product["uuid"],
+            "title": product["title"],
+            "link": [{"href": base_url + "odata/v1/Products('%s')/$value" % product["uuid"]}],
+            "date": [{"name": "beginposition", "content": date}],
+            "double": {"name": "cloudcoverpercentage", "content": "%.4f" % product["cloud"]},
+            "str": [{"name": "footprint", "content": wkt},
+                    {"name": "gmlfootprint", "content": ""},
+                    {"name": "platformname", "content": "Sentinel-2"},
+                    {"name": "producttype", "content": "S2MSI1C"},
+                    {"name": "filename", "content": product["title"] + ".SAFE"}]}
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define Handler class:
+#   - Answers hub requests from the product records of the server it belongs to.
+# ------------------------------------------------------------------------------------------------------------------- #
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"                                   # Keep-alive, like the real hub
+
+    def log_message(self, format, *args):                          # Keep the console quiet
+        pass
+
+    def send_json(self, body, status=200):
+        data = json.dumps(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_text(self, text, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(text)))
+        self.end_headers()
+        self.wfile.write(text)
+
+    def do_POST(self):                                              # sentinelsat posts search queries
+        self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        self.do_GET()
+
+    def do_GET(self):
+        hub = self.server
+        hub.requests += 1
+        if hub.latency:
+            time.sleep(hub.latency)
+        parsed = urlparse.urlparse(self.path)
+        query = urlparse.parse_qs(parsed.query)
+        if parsed.path.rstrip("/") == "/search":
+            rows = int(query.get("rows", ["100"])[0])
+            start = int(query.get("start", ["0"])[0])
+            products = hub.product_list()
+            entries = [search_entry(product, hub.url) for product in products[start:start + rows]]
+            self.send_json({"feed": {"opensearch:totalResults": str(len(products)), "entry": entries}})
+            return
+        match = PRODUCT_URL.match(parsed.path)
+        if match is None or match.group(1) not in hub.products:
+            self.send_json({"error": {"message": {"value": "Invalid key (%s) to access Products" % parsed.path}}},
+                           404)
+            return
+        product = hub.products[match.group(1)]
+        if match.group(2) is None:
+            self.send_json(odata_product(product, hub.url, query.get("$expand") == ["Attributes"]))
+        elif match.group(2) == "/Online/$value":
+            self.send_text(str(hub.is_online(product)).lower())
+        elif not hub.is_online(product):
+            self.send_text("Product %s is not online. Retrieval from the long term archive was requested."
+                           % product["uuid"], 202)
+            hub.retrieve(product)
+        elif hub.error_rate and hub.random.random() < hub.error_rate:
+            self.send_text("Service temporarily unavailable", 503)
+        else:
+            account = self.headers.get("Authorization", "")
+            if not hub.open_download(account):
+                self.send_response(429)
+                self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            try:
+                self.send_archive(product)
+            finally:
+                hub.close_download(account)
+
+    # Serve a product archive, or the byte range asked for in a "Range: bytes=<first>-[<last>]" header.
+    def send_archive(self, product):
+        size = product["size"]
+        first, last = 0, size - 1
+        byte_range = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", ""))
+        if byte_range:
+            if byte_range.group(1):
+                first = int(byte_range.group(1))
+                if byte_range.group(2):
+                    last = min(int(byte_range.group(2)), size - 1)
+            else:                                                   # Suffix range: the last N bytes
+                first = max(size - int(byte_range.group(2)), 0)
+            if first > last:
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */%i" % size)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes %i-%i/%i" % (first, last, size))
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Disposition", 'attachment; filename="%s.zip"' % product["title"])
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(last - first + 1))
+        self.end_headers()
+        archive = open(product["path"], "rb")
+        archive.seek(first)
+        remaining = last - first + 1
+        start_time = time.time()
+        sent = 0
+        while remaining > 0:
+            block = archive.read(min(BLOCK, remaining))
+            if not block:
+                break
+            self.wfile.write(block)
+            remaining -= len(block)
+            sent += len(block)
+            if self.server.bandwidth:                               # Hold each connection to the bandwidth cap
+                ahead = sent / float(self.server.bandwidth) - (time.time() - start_time)
+                if ahead > 0:
+                    time.sleep(ahead)
+        archive.close()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define StandinHub class:
+#   - A threaded HTTP server holding stand-in product records, started in the background.
+#   Example:
+#       hub = StandinHub()
+#       hub.add_product("S2A_MSIL1C_20180826T151911_N0206_R068_T20TPQ_20180826T184851", cloud=3.5)
+#       hub.start()
+#       api = sentinelsat.SentinelAPI("user", "password", hub.url)
+#   Parameters:
+#       archive_dir     - Folder for generated product archives.
+#       max_downloads   - Concurrent archive downloads allowed per account; more are refused with 429.
+#       retrieval_delay - Seconds an offline product takes to come back online after it is requested.
+#       error_rate      - Fraction (0-1) of archive requests answered 503, to exercise retries.
+#       bandwidth       - Bytes per second per connection, or None; the real hub throttles each connection.
+#       latency         - Seconds added to every request, like the round trip to the hub.
+# ------------------------------------------------------------------------------------------------------------------- #
+class StandinHub(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, archive_dir=None, max_downloads=2, retrieval_delay=0.0,
+                 error_rate=0.0, bandwidth=None, latency=0.0):
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), Handler)
+        self.url = "http://%s:%i/" % self.server_address
+        self.archive_dir = archive_dir
+        self.max_downloads = max_downloads
+        self.retrieval_delay = retrieval_delay
+        self.error_rate = error_rate
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.random = random.Random(0)
+        self.products = {}
+        self.requests = 0                                           # Requests served, for tests and benchmarks
+        self.connections = 0                                        # Connections accepted
+        self.downloads = {}                                         # Archive downloads in progress per account
+        self.lock = threading.Lock()
+        self.thread = None
+
+    # Add a product record. Without an archive path, an archive of random bytes is written to archive_dir.
+    def add_product(self, title, cloud=0.0, footprint=None, date=None, size=2 ** 20, path=None, online=True):
+        product_id = str(uuid.uuid4())
+        if path is None:
+            if self.archive_dir is None:
+                raise ValueError("StandinHub needs an archive_dir to generate product archives")
+            if not os.path.isdir(self.archive_dir):
+                os.makedirs(self.archive_dir)
+            path = os.path.join(self.archive_dir, title + ".zip")
+            archive = open(path, "wb")
+            for i in range(0, size, BLOCK):
+                archive.write(os.urandom(min(BLOCK, size - i)))
+            archive.close()
+        md5 = hashlib.md5()
+        archive = open(path, "rb")
+        for block in iter(lambda: archive.read(BLOCK), ""):
+            md5.update(block)
+        archive.close()
+        if date is None:
+            date = re.search(r"_(\d{8})T", title).group(1)
+        self.products[product_id] = {"uuid": product_id,
+                                     "title": title,
+                                     "cloud": cloud,
+                                     "footprint": footprint or SABLE_FOOTPRINT,
+                                     "time": int(time.mktime(time.strptime(date, "%Y%m%d"))),
+                                     "size": os.path.getsize(path),
+                                     "md5": md5.hexdigest(),
+                                     "path": path,
+                                     "online": online,
+                                     "online_at": None}
+        return product_id
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        SocketServer.ThreadingMixIn.process_request(self, request, client_address)
+
+    def product_list(self):
+        return sorted(self.products.values(), key=lambda product: product["time"])
+
+    def is_online(self, product):
+        if not product["online"] and product["online_at"] is not None and time.time() >= product["online_at"]:
+            product["online"] = True
+        return product["online"]
+
+    # Start bringing an offline product back online, as the hub does after a retrieval request.
+    def retrieve(self, product):
+        if product["online_at"] is None:
+            product["online_at"] = time.time() + self.retrieval_delay
+
+    def open_download(self, account):
+        with self.lock:
+            if self.max_downloads and self.downloads.get(account, 0) >= self.max_downloads:
+                return False
+            self.downloads[account] = self.downloads.get(account, 0) + 1
+            return True
+
+    def close_download(self, account):
+        with self.lock:
+            self.downloads[account] -= 1
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define write_cart() function:
+#   1. Write a 'products.meta4' cart file listing the products of a stand-in hub, like a Copernicus cart download.
+# Parameters:
+#   hub         - The StandinHub.
+#   path        - The cart file to write.
+# ------------------------------------------------------------------------------------------------------------------- #
+def write_cart(hub, path):
+    cart = open(path, "w")
+    cart.write('<?xml version="1.0" encoding="UTF-8"?>\n<metalink xmlns="urn:ietf:params:xml:ns:metalink">\n')
+    for product in hub.product_list():
+        cart.write('<file name="%s.zip"><url>%sodata/v1/Products(\'%s\')/$value</url></file>\n'
+                   % (product["title"], hub.url, product["uuid"]))
+    cart.write("</metalink>\n")
+    cart.close()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define main() function:
+#   1. Serve a set of stand-in products: clear and cloudy, over Sable Island and off to the west of it.
+#   2. Write a cart file for them, so api_download.py can be run against the stand-in:
+#       python -m sablesat.standin --port 8080
+#       set SABLESAT_HUB=http://127.0.0.1:8080/
+#       python api_download.py
+# ------------------------------------------------------------------------------------------------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Serve stand-in Sentinel-2 products like the Copernicus hub.")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default 8080)")
+    parser.add_argument("--products", type=int, default=8, help="Number of stand-in products (default 8)")
+    parser.add_argument("--size", type=int, default=8, help="Archive size in MB (default 8)")
+    parser.add_argument("--archives", default=os.path.join("benchmarks", "hub"), help="Folder for archives")
+    parser.add_argument("--cart", default="products.meta4", help="Cart file to write")
+    parser.add_argument("--max-downloads", type=int, default=2, help="Concurrent downloads per account (default 2)")
+    parser.add_argument("--retrieval-delay", type=float, default=60, help="Seconds to restore offline products")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of downloads answered 503")
+    parser.add_argument("--bandwidth", type=float, default=0, help="MB/s per connection (default unlimited)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    args = parser.parse_args()
+
+    hub = StandinHub(port=args.port, archive_dir=args.archives, max_downloads=args.max_downloads,
+                     retrieval_delay=args.retrieval_delay, error_rate=args.error_rate,
+                     bandwidth=args.bandwidth * 2 ** 20 or None, latency=args.latency)
+    rng = random.Random(0)
+    for i in range(args.products):
+        date = time.strftime("%Y%m%d", time.gmtime(time.mktime((2018, 5, 2, 12, 0, 0, 0, 0, 0)) + i * 5 * 86400))
+        title = "S2A_MSIL1C_%sT151911_N0206_R068_T20TPQ_%sT184851" % (date, date)
+        footprint = SABLE_FOOTPRINT
+        if i % 4 == 3:                                              # Every fourth product misses the island
+            footprint = [(lon - 2.0, lat) for lon, lat in SABLE_FOOTPRINT]
+        hub.add_product(title, cloud=rng.choice([0.5, 4.0, 12.0, 48.0, 95.0]), footprint=footprint,
+                        size=args.size * 2 ** 20, online=(i % 5 != 4))
+    write_cart(hub, args.cart)
+    print "Stand-in hub serving %i products at %s" % (len(hub.products), hub.url)
+    print "Cart file written to %s. Press Ctrl+C to stop." % args.cart
+    try:
+        hub.serve_forever()
+    except KeyboardInterrupt:
+        hub.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# =================================================================================================================== #
+# Script Name:	stats.py
+# Author:	    Brian Laureijs
+# Purpose:      Band statistics of a raster in one streaming pass (histograms, percentiles, mean, covariance), cached
+#               beside the raster and used for stretches and PCA reports.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # File checks
+import json                                         # Statistics cache files
+import time                                         # Processing timer
+import numpy                                        # Array processing
+from osgeo import gdal                              # Stretched output
+from sablesat import raster                         # Windowed PIX access
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+STRIP_ROWS = 512                                    # Rows read per pass
+SUFFIX = ".stats.json"                              # Cache file beside the raster
+PERCENTILES = (0.5, 1, 2, 5, 25, 50, 75, 95, 98, 99, 99.5)  # Stored in the cache for quick lookup
+STRETCH_CLIP = (2, 98)                              # Percentiles mapped to the ends of a stretch
+
+# A cache file is JSON:
+#   {"source": raster file, "size": bytes, "mtime": modified time, "count": valid pixels,
+#    "bands": [{"band", "min", "max", "mean", "std", "percentiles": {"2": value, ...},
+#               "histogram": {"offset": value of first bin, "counts": [pixels per value]}}, ...],
+#    "covariance": [[band covariance matrix]]}
+# It is reused while the raster's size and modified time match (for a chunked store, those of its meta.json).
+# Pixels that are zero (nodata) in every band are left out. Bands must hold integers; 16-bit imagery gives at most
+# 65536 bins per band.
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define compute() function:
+#   1. Read the raster in strips and add each band's values to a histogram, and the band values of every valid pixel
+#      to running sums for the mean and covariance.
+#   2. Return the statistics as a dictionary (see above).
+# Parameters:
+#   path        - The raster file or chunked store. The mapped copy of a PIX is read instead if one exists.
+# ------------------------------------------------------------------------------------------------------------------- #
+def compute(path):
+    stack = raster.open_stack(raster.best_source(path))
+    bands = range(1, stack.count + 1)
+    histograms = [numpy.zeros(0, dtype=numpy.int64) for band in bands]
+    offsets = None
+    shift = None                                                    # First strip mean, for a stable covariance sum
+    total = numpy.zeros(len(bands), dtype=numpy.float64)
+    products = numpy.zeros((len(bands), len(bands)), dtype=numpy.float64)
+    count = 0
+    for yoff, ysize in raster.strips(stack.ysize, STRIP_ROWS):
+        data = stack.read(bands, 0, yoff, stack.xsize, ysize).reshape(len(bands), -1)
+        if offsets is None:
+            if data.dtype.kind not in "iu":
+                raise ValueError("Band statistics need integer bands, %s has %s." % (path, data.dtype))
+            offsets = numpy.iinfo(data.dtype).min                   # Shift signed values to bin 0
+        valid = numpy.any(data != 0, axis=0)
+        values = data[:, valid].astype(numpy.int64)
+        if values.shape[1] == 0:
+            continue
+        for i in range(len(bands)):
+            counts = numpy.bincount(values[i] - offsets)
+            if counts.size > histograms[i].size:
+                counts[:histograms[i].size] += histograms[i]
+                histograms[i] = counts
+            else:
+                histograms[i][:counts.size] += counts
+        if shift is None:
+            shift = values.mean(axis=1)
+        centred = values - shift[:, None]
+        total += centred.sum(axis=1)
+        products += numpy.dot(centred, centred.T)
+        count += values.shape[1]
+    stack.close()
+
+    size, mtime = stamp(path)
+    if count == 0:
+        mean = numpy.zeros(len(bands))
+        covariance = numpy.zeros((len(bands), len(bands)))
+    else:
+        mean_centred = total / count
+        mean = shift + mean_centred
+        covariance = products / count - numpy.outer(mean_centred, mean_centred)
+    band_stats = []
+    for i in range(len(bands)):
+        histogram = histograms[i]
+        nonzero = numpy.flatnonzero(histogram)
+        first = int(nonzero[0]) if nonzero.size else 0
+        last = int(nonzero[-1]) if nonzero.size else -1
+        band_stats.append({"band": bands[i],
+                           "min": first + offsets if nonzero.size else 0,
+                           "max": last + offsets if nonzero.size else 0,
+                           "mean": float(mean[i]),
+                           "std": float(numpy.sqrt(max(covariance[i][i], 0.0))),
+                           "percentiles": dict(("%g" % p, percentile_value(histogram, p) + offsets)
+                                               for p in PERCENTILES),
+                           "histogram": {"offset": first + offsets,
+                                         "counts": [int(c) for c in histogram[first:last + 1]]}})
+    return {"source": path,
+            "size": size,
+            "mtime": mtime,
+            "count": count,
+            "bands": band_stats,
+            "covariance": [[float(c) for c in row] for row in covariance]}
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define percentile_value() function:
+#   1. Return the histogram bin at which the cumulative count reaches the given percent of all counts.
+# Parameters:
+#   histogram   - Counts per bin.
+#   percent     - Percent between 0 and 100.
+# ------------------------------------------------------------------------------------------------------------------- #
+def percentile_value(histogram, percent):
+    cumulative = numpy.cumsum(histogram)
+    if cumulative.size == 0 or cumulative[-1] == 0:
+        return 0
+    return int(numpy.searchsorted(cumulative, percent / 100.0 * cumulative[-1]))
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define stamp() function:
+#   1. Return (size, modified time) identifying the contents of a raster file, or of a chunked store by its
+#      meta.json (rewritten whenever the store is).
+# ------------------------------------------------------------------------------------------------------------------- #
+def stamp(path):
+    if os.path.isdir(path):
+        path = os.path.join(path, "meta.json")
+    return os.path.getsize(path), os.path.getmtime(path)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define raster_stats() function:
+#   1. Return the cached statistics of a raster if its cache file matches the raster's size and modified time.
+#   2. Otherwise compute them with compute() and write the cache file.
+# Parameters:
+#   path        - The raster file; the cache is <path>.stats.json.
+# ------------------------------------------------------------------------------------------------------------------- #
+def raster_stats(path):
+    cache_file = path + SUFFIX
+    if os.path.isfile(cache_file):
+        stats_file = open(cache_file, "r")
+        stats = json.load(stats_file)
+        stats_file.close()
+        if (stats["size"], stats["mtime"]) == stamp(path):
+            return stats
+    start_time = time.time()
+    stats = compute(path)
+    write_json(stats, cache_file)
+    completion_time = time.time() - start_time
+    print "Band statistics for %s computed in %i seconds." % (os.path.basename(path), completion_time)
+    return stats
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define band_percentile() function:
+#   1. Return a percentile of one band, from the stored values or from its histogram.
+# Parameters:
+#   stats       - Statistics from raster_stats().
+#   band        - Band number (1-based, as in PCI dbic).
+#   percent     - Percent between 0 and 100.
+# ------------------------------------------------------------------------------------------------------------------- #
+def band_percentile(stats, band, percent):
+    band_stats = stats["bands"][band - 1]
+    if "%g" % percent in band_stats["percentiles"]:
+        return band_stats["percentiles"]["%g" % percent]
+    histogram = band_stats["histogram"]
+    return percentile_value(numpy.array(histogram["counts"]), percent) + histogram["offset"]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define stretch() function:
+#   1. Map each band from its low to high percentile onto the full range of the output data type, raised to the
+#      power expo (1 is linear, 0.5 square root), in a second pass over the raster. Zero stays zero (nodata).
+#   2. Write the stretched bands to a new raster, or back into the source raster if out is None.
+# Parameters:
+#   path        - The raster file, or a chunked store if out is given.
+#   bands       - Bands to stretch (1-based).
+#   expo        - Stretch exponent.
+#   out         - The output raster (GeoTIFF, 16-bit unsigned), or None to stretch the bands in place.
+#   clip        - (low, high) percentiles mapped to the ends of the output range.
+# ------------------------------------------------------------------------------------------------------------------- #
+def stretch(path, bands, expo=1.0, out=None, clip=STRETCH_CLIP):
+    stats = raster_stats(path)
+    limits = [(band_percentile(stats, band, clip[0]), band_percentile(stats, band, clip[1])) for band in bands]
+    source = None
+    if out is None:                                                 # Read and write through the same handle
+        dataset = gdal.Open(path, gdal.GA_Update)
+        targets = [dataset.GetRasterBand(band) for band in bands]
+    else:
+        source = raster.open_stack(path)
+        dataset = raster.create_like(out, source, len(bands), gdal.GDT_UInt16, driver="GTiff")
+        targets = [dataset.GetRasterBand(i + 1) for i in range(len(bands))]
+    for yoff, rows in raster.strips(dataset.RasterYSize, STRIP_ROWS):
+        for i in range(len(bands)):
+            if source is None:
+                data = targets[i].ReadAsArray(0, yoff, dataset.RasterXSize, rows)
+            else:
+                data = source.read([bands[i]], 0, yoff, source.xsize, rows)[0]
+            top = numpy.iinfo(raster.gdal_dtype(targets[i].DataType)).max
+            low, high = limits[i]
+            scaled = numpy.clip((data - float(low)) / max(high - low, 1), 0.0, 1.0) ** expo
+            result = (1 + scaled * (top - 1)).round()
+            result[data == 0] = 0                                   # Keep nodata
+            targets[i].WriteArray(result.astype(raster.gdal_dtype(targets[i].DataType)), 0, yoff)
+    dataset.FlushCache()
+    dataset = None
+    if source is not None:
+        source.close()
+    return out or path
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define pca_report() function:
+#   1. Take the eigenvalues and eigenvectors of the band covariance matrix, largest first.
+#   2. Return them with the share of variance each component explains, as a dictionary for JSON output.
+# Parameters:
+#   stats       - Statistics from raster_stats().
+#   bands       - Bands in the analysis (1-based).
+#   components  - Number of components to report.
+# ------------------------------------------------------------------------------------------------------------------- #
+def pca_report(stats, bands, components):
+    index = [band - 1 for band in bands]
+    covariance = numpy.array(stats["covariance"])[numpy.ix_(index, index)]
+    eigenvalues, eigenvectors = numpy.linalg.eigh(covariance)
+    order = numpy.argsort(eigenvalues)[::-1]
+    eigenvalues = eigenvalues[order]
+    eigenvectors = eigenvectors[:, order]
+    total = max(eigenvalues.sum(), 1e-12)
+    return {"source": stats["source"],
+            "bands": list(bands),
+            "pixels": stats["count"],
+            "mean": [stats["bands"][i]["mean"] for i in index],
+            "std": [stats["bands"][i]["std"] for i in index],
+            "components": [{"component": c + 1,
+                            "eigenvalue": float(eigenvalues[c]),
+                            "variance_percent": float(100.0 * eigenvalues[c] / total),
+                            "eigenvector": [float(v) for v in eigenvectors[:, c]]}
+                           for c in range(min(components, len(bands)))]}
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define write_json() function:
+#   1. Write statistics or a report to a JSON file.
+# ------------------------------------------------------------------------------------------------------------------- #
+def write_json(data, path):
+    json_file = open(path, "w")
+    json.dump(data, json_file, indent=1)
+    json_file.close()
+    return path
@@ -0,0 +1,186 @@
+# =================================================================================================================== #
+# Script Name:	store.py
+# Author:	    Brian Laureijs
+# Purpose:      Chunked, compressed band store for intermediate image stacks.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory and
+import shutil                                       # file manipulation
+import json                                         # Store metadata
+import zlib                                         # Chunk compression
+import numpy                                        # Array processing
+from sablesat import raster                         # Windowed PIX access
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+CHUNK = (256, 256)                                  # Rows, columns per chunk
+LEVEL = 1                                           # zlib level; imagery gains little above 1 once shuffled
+SUFFIX = ".chunks"                                  # Store directory suffix
+
+# A store is a directory:
+#   <name>.chunks/meta.json         - size, band count, dtype, chunk shape, geotransform and projection
+#   <name>.chunks/b01/<row>_<col>.z - one zlib-compressed chunk per band per chunk grid cell
+# Bytes of each chunk are shuffled (all low bytes, then all high bytes) before compression, which roughly doubles
+# the compression ratio of 16-bit imagery. Chunks that were never written read back as zeros (nodata).
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define ChunkStore class:
+#   1. Open an existing store and read its metadata.
+#   2. Read band subsets for a pixel window, decompressing only the chunks the window touches.
+#   3. Write chunk-aligned windows of a single band.
+# Parameters:
+#   path        - The store directory.
+# ------------------------------------------------------------------------------------------------------------------- #
+class ChunkStore(object):
+    def __init__(self, path):
+        self.path = path
+        meta_file = open(os.path.join(path, "meta.json"), "r")
+        meta = json.load(meta_file)
+        meta_file.close()
+        self.xsize = meta["xsize"]
+        self.ysize = meta["ysize"]
+        self.count = meta["count"]
+        self.dtype = numpy.dtype(str(meta["dtype"]))
+        self.chunk = tuple(meta["chunk"])
+        self.level = meta["level"]
+        self.geotransform = tuple(meta["geotransform"])
+        self.projection = str(meta["projection"])
+
+    def chunk_file(self, band, row, col):
+        return os.path.join(self.path, "b%02i" % band, "%i_%i.z" % (row, col))
+
+    def chunk_shape(self, row, col):
+        rows, cols = self.chunk
+        return min(rows, self.ysize - row * rows), min(cols, self.xsize - col * cols)
+
+    def read_chunk(self, band, row, col):
+        shape = self.chunk_shape(row, col)
+        chunk_file = self.chunk_file(band, row, col)
+        if not os.path.isfile(chunk_file):
+            return numpy.zeros(shape, dtype=self.dtype)             # Unwritten chunk is nodata
+        blob = open(chunk_file, "rb")
+        shuffled = numpy.frombuffer(zlib.decompress(blob.read()), dtype=numpy.uint8)
+        blob.close()
+        return shuffled.reshape(self.dtype.itemsize, -1).T.copy().view(self.dtype).reshape(shape)
+
+    def write_chunk(self, band, row, col, data):
+        data = numpy.ascontiguousarray(data, dtype=self.dtype)
+        shuffled = data.view(numpy.uint8).reshape(-1, self.dtype.itemsize).T.tobytes()
+        blob = open(self.chunk_file(band, row, col), "wb")
+        blob.write(zlib.compress(shuffled, self.level))
+        blob.close()
+
+    def read(self, bands, xoff, yoff, xsize, ysize):
+        rows, cols = self.chunk
+        window = numpy.empty((len(bands), ysize, xsize), dtype=self.dtype)
+        for row in range(yoff // rows, (yoff + ysize - 1) // rows + 1):
+            for col in range(xoff // cols, (xoff + xsize - 1) // cols + 1):
+                y0 = row * rows                                     # Chunk origin in image pixels
+                x0 = col * cols
+                ys = max(yoff, y0)                                  # Overlap of chunk and window
+                ye = min(yoff + ysize, y0 + rows)
+                xs = max(xoff, x0)
+                xe = min(xoff + xsize, x0 + cols)
+                for i in range(len(bands)):
+                    block = self.read_chunk(bands[i], row, col)
+                    window[i, ys - yoff:ye - yoff, xs - xoff:xe - xoff] = block[ys - y0:ye - y0, xs - x0:xe - x0]
+        return window
+
+    def write(self, band, data, xoff, yoff):
+        rows, cols = self.chunk
+        if xoff % cols or yoff % rows:
+            raise ValueError("Store writes must start on a chunk boundary (%i, %i)." % (rows, cols))
+        ysize, xsize = data.shape
+        for row in range(yoff // rows, (yoff + ysize - 1) // rows + 1):
+            for col in range(xoff // cols, (xoff + xsize - 1) // cols + 1):
+                shape = self.chunk_shape(row, col)
+                block = data[row * rows - yoff:row * rows - yoff + shape[0],
+                             col * cols - xoff:col * cols - xoff + shape[1]]
+                if block.shape != shape:
+                    raise ValueError("Store writes must cover whole chunks.")
+                self.write_chunk(band, row, col, block)
+
+    def close(self):
+        pass                                                        # Chunk files are opened per read
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define create() function:
+#   1. Create an empty store directory with one folder per band.
+#   2. Write the metadata file.
+# Parameters:
+#   path        - The store directory (replaced if it exists).
+#   like        - Stack providing xsize, ysize, geotransform and projection.
+#   count       - The number of bands.
+#   dtype       - numpy dtype of the bands.
+# ------------------------------------------------------------------------------------------------------------------- #
+def create(path, like, count, dtype, chunk=CHUNK, level=LEVEL):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.mkdir(path)
+    for band in range(1, count + 1):
+        os.mkdir(os.path.join(path, "b%02i" % band))
+    meta = {"xsize": like.xsize,
+            "ysize": like.ysize,
+            "count": count,
+            "dtype": numpy.dtype(dtype).str,
+            "chunk": list(chunk),
+            "level": level,
+            "geotransform": list(like.geotransform),
+            "projection": like.projection}
+    meta_file = open(os.path.join(path, "meta.json"), "w")
+    json.dump(meta, meta_file, indent=1)
+    meta_file.close()
+    return ChunkStore(path)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define ingest() function:
+#   1. Copy selected bands of a raster into a new store, one chunk row at a time.
+# Parameters:
+#   src         - The input raster file (PIX, TIF) or store.
+#   path        - The output store directory.
+#   bands       - 1-based input bands to keep (default all); they become bands 1..n of the store.
+# ------------------------------------------------------------------------------------------------------------------- #
+def ingest(src, path, bands=None, chunk=CHUNK, level=LEVEL):
+    stack = raster.open_stack(src)
+    if bands is None:
+        bands = range(1, stack.count + 1)
+    sample = stack.read([bands[0]], 0, 0, 1, 1)
+    out = create(path, stack, len(bands), sample.dtype, chunk, level)
+    for yoff, ysize in raster.strips(stack.ysize, chunk[0]):
+        data = stack.read(bands, 0, yoff, stack.xsize, ysize)
+        for i in range(len(bands)):
+            out.write(i + 1, data[i], 0, yoff)
+    stack.close()
+    return out
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define export() function:
+#   1. Materialize selected bands as a raster file, for PCI functions that need a real PIX on disk. Only the chunks
+#      of those bands are read.
+# Parameters:
+#   stack       - ChunkStore (or any stack from raster.open_stack()) to read from.
+#   path        - The output raster file.
+#   bands       - 1-based bands to export (default all); they become bands 1..n of the output.
+#   driver      - GDAL driver name (PCIDSK for PIX).
+# ------------------------------------------------------------------------------------------------------------------- #
+def export(stack, path, bands=None, driver="PCIDSK"):
+    if bands is None:
+        bands = range(1, stack.count + 1)
+    sample = stack.read([bands[0]], 0, 0, 1, 1)
+    out = raster.create_like(path, stack, len(bands), raster.numpy_gdal_type(sample.dtype), driver)
+    for yoff, ysize in raster.strips(stack.ysize, getattr(stack, "chunk", CHUNK)[0]):
+        data = stack.read(bands, 0, yoff, stack.xsize, ysize)
+        for i in range(len(bands)):
+            out.GetRasterBand(i + 1).WriteArray(data[i], 0, yoff)
+    out.FlushCache()
+    out = None
+    return path
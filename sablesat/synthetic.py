@@ -0,0 +1,150 @@
+# =================================================================================================================== #
+# Script Name:	synthetic.py
+# Author:	    Brian Laureijs
+# Purpose:      Generate synthetic Sable-like Sentinel-2 L1C products for benchmarking without real SAFE data.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory and file manipulation
+import numpy                                        # Array processing
+from osgeo import gdal, osr                         # GeoTIFF band output
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+SIZES = {"small": (1200, 540),                      # 10m columns, rows (divisible by 6 so 20m and 60m grids align)
+         "medium": (3000, 1356),
+         "aoi": (6000, 2700)}                       # Full clip_ext extent, about 60 x 27 km
+BANDS = {10: ("B02", "B03", "B04", "B08"),          # Band names by resolution, in the order PCI reads them
+         20: ("B05", "B06", "B07", "B8A", "B11", "B12"),
+         60: ("B01", "B09", "B10")}
+ORIGIN = (720000.0, 4890000.0)                      # Upper left corner in WGS 84 / UTM zone 20N
+EPSG = 32620
+TILE = "T20TPQ"
+OPER_BEFORE = "20161206"                            # Products before this date used the long OPER naming
+
+# Top of atmosphere reflectance x 10000 for water, sand, vegetation and cloud in each band.
+SIGNATURES = {"B01": (1400, 1700, 1300, 5200), "B02": (1100, 1600, 900, 5000), "B03": (900, 1700, 1000, 5000),
+              "B04": (600, 1800, 700, 5100), "B05": (500, 1900, 1300, 5100), "B06": (400, 2000, 2500, 5200),
+              "B07": (350, 2050, 2900, 5200), "B08": (300, 2100, 3100, 5300), "B8A": (280, 2150, 3200, 5300),
+              "B09": (100, 600, 900, 2200), "B10": (10, 20, 20, 1800), "B11": (150, 2600, 1900, 4000),
+              "B12": (100, 2300, 1000, 3300)}
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define product_name() function:
+#   1. Build a SAFE folder name for an acquisition date, in the naming scheme used at that date.
+#   2. Return the folder name and the metadata XML file name that readtopix() looks for.
+# Parameters:
+#   mission     - "S2A" or "S2B".
+#   date        - Acquisition date (YYYYMMDD).
+# ------------------------------------------------------------------------------------------------------------------- #
+def product_name(mission, date):
+    if date < OPER_BEFORE:                                          # Date in field 5, any non-INSPIRE xml
+        stamp = date + "T201617"
+        name = "%s_OPER_PRD_MSIL1C_PDMC_%s_R068_V%sT151912_%sT151912.SAFE" % (mission, stamp, date, date)
+        xml_name = "%s_OPER_MTD_SAFL1C_PDMC_%s_R068_V%sT151912_%sT151912.xml" % (mission, stamp, date, date)
+    else:                                                           # Date in field 2, MTD_MSIL1C.xml
+        name = "%s_MSIL1C_%sT151911_N0206_R068_%s_%sT184851.SAFE" % (mission, date, TILE, date)
+        xml_name = "MTD_MSIL1C.xml"
+    return name, xml_name
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define class_map() function:
+#   1. Draw a curved, narrow island across the grid with a vegetated interior.
+#   2. Add gaussian cloud blobs covering roughly the requested fraction of the grid.
+#   3. Return class numbers 0 water, 1 sand, 2 vegetation and a cloud opacity (0-1) for the grid.
+# Parameters:
+#   cols, rows  - Grid size.
+#   cloud       - Target cloud fraction (0-1).
+#   rng         - numpy RandomState, so every resolution of a scene gets the same clouds.
+# ------------------------------------------------------------------------------------------------------------------- #
+def class_map(cols, rows, cloud, rng):
+    y, x = numpy.mgrid[0:rows, 0:cols].astype(numpy.float32)
+    u = (x / cols - 0.5) / 0.35                                     # Island spans 70% of the width
+    centre = 0.5 + 0.08 * u ** 2                                    # Crescent curve
+    half_width = 0.025 * numpy.sqrt(numpy.clip(1 - u ** 2, 0, 1))  # Tapers to points at both ends
+    offset = numpy.abs(y / rows - centre)
+    classes = numpy.zeros((rows, cols), dtype=numpy.uint8)
+    classes[offset < half_width] = 1
+    classes[offset < half_width * 0.6] = 2
+    opacity = numpy.zeros((rows, cols), dtype=numpy.float32)
+    if cloud > 0:
+        for i in range(int(cloud * 40) + 1):                        # More, not larger, blobs for more cloud
+            cx, cy = rng.uniform(0, cols), rng.uniform(0, rows)
+            radius = rng.uniform(0.05, 0.12) * cols
+            opacity += numpy.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * radius ** 2))
+        threshold = numpy.percentile(opacity, 100 * (1 - cloud))
+        opacity = numpy.clip((opacity - threshold) / (threshold + 1e-6) * 4, 0, 1)
+    return classes, opacity
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define make_scene() function:
+#   1. Create a SAFE-like product folder with a stub metadata XML.
+#   2. Write one GeoTIFF per band at 10, 20 and 60m with island, water, cloud and sensor noise.
+#   3. Return the product folder.
+# Parameters:
+#   root        - Folder to write the product into (e.g. a benchmark input folder).
+#   date        - Acquisition date (YYYYMMDD); dates before 20161206 use OPER naming.
+#   size        - Key of SIZES.
+#   cloud       - Cloud fraction (0-1).
+#   seed        - Random seed, so runs are reproducible.
+#   mission     - "S2A" or "S2B".
+# ------------------------------------------------------------------------------------------------------------------- #
+def make_scene(root, date, size="small", cloud=0.2, seed=0, mission="S2A"):
+    cols, rows = SIZES[size]
+    name, xml_name = product_name(mission, date)
+    safe = os.path.join(root, name)
+    img_data = os.path.join(safe, "GRANULE", "L1C_%s_A016000_%sT151911" % (TILE, date), "IMG_DATA")
+    if not os.path.isdir(img_data):
+        os.makedirs(img_data)
+    xml = open(os.path.join(safe, xml_name), "w")
+    xml.write('<?xml version="1.0" encoding="UTF-8"?>\n<!-- Synthetic product for benchmarking -->\n'
+              '<Level-1C_User_Product><PRODUCT_START_TIME>%s-%s-%sT15:19:11Z</PRODUCT_START_TIME>'
+              '<Cloud_Coverage_Assessment>%.1f</Cloud_Coverage_Assessment></Level-1C_User_Product>\n'
+              % (date[:4], date[4:6], date[6:], cloud * 100))
+    xml.close()
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    driver = gdal.GetDriverByName("GTiff")
+    for res in (10, 20, 60):
+        scale = res // 10
+        rng = numpy.random.RandomState(seed)                        # Same island and clouds at each resolution
+        classes, opacity = class_map(cols // scale, rows // scale, cloud, rng)
+        noise = numpy.random.RandomState(seed + res)
+        for band in BANDS[res]:
+            water, sand, vegetation, cloud_dn = SIGNATURES[band]
+            dn = numpy.choose(classes, (water, sand, vegetation)).astype(numpy.float32)
+            dn = dn * (1 - opacity) + cloud_dn * opacity
+            dn += noise.normal(0, 25, dn.shape)
+            tif = os.path.join(img_data, "%s_%sT151911_%s.tif" % (TILE, date, band))
+            out = driver.Create(tif, dn.shape[1], dn.shape[0], 1, gdal.GDT_UInt16)
+            out.SetGeoTransform((ORIGIN[0], res, 0, ORIGIN[1], 0, -res))
+            out.SetProjection(srs.ExportToWkt())
+            out.GetRasterBand(1).WriteArray(numpy.clip(dn, 1, 65535).astype(numpy.uint16))
+            out = None
+    return safe
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define band_files() function:
+#   1. Return the band GeoTIFFs of a synthetic product for one resolution, in BANDS order.
+# Parameters:
+#   safe        - The product folder from make_scene().
+#   res         - 10, 20 or 60.
+# ------------------------------------------------------------------------------------------------------------------- #
+def band_files(safe, res):
+    granule = os.path.join(safe, "GRANULE")
+    img_data = os.path.join(granule, os.listdir(granule)[0], "IMG_DATA")
+    names = os.listdir(img_data)
+    files = []
+    for band in BANDS[res]:
+        for name in names:
+            if name.endswith("_" + band + ".tif"):
+                files.append(os.path.join(img_data, name))
+    return files
@@ -0,0 +1,360 @@
+# =================================================================================================================== #
+# Script Name:	taskqueue.py
+# Author:	    Brian Laureijs
+# Purpose:      Shared task queue that spreads scene stages over worker processes on several machines.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Process IDs
+import sys                                          # Name of the running script
+import json                                         # Task arguments and dependencies
+import time                                         # Leases
+import socket                                       # Worker names
+import sqlite3                                      # Queue database
+import threading                                    # Lease heartbeat
+import importlib                                    # Resolve task functions in workers
+import traceback                                    # Report task errors
+from sablesat import parallel                       # Task records, priorities and worker workspaces
+from sablesat import trace                          # Stage timing and resource records
+from sablesat import checkpoint                     # Atomic stage outputs
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    key         TEXT PRIMARY KEY,   -- Task key, e.g. S2A_20180826:pca
+    scene       TEXT,
+    stage       TEXT,
+    func        TEXT,               -- <module>:<function>, imported by the worker
+    args        TEXT,               -- JSON list of arguments (paths, flags)
+    deps        TEXT,               -- JSON list of task keys that must be done first
+    priority    INTEGER,            -- Critical path cost; higher starts first
+    status      TEXT,               -- pending, leased, done, failed or skipped
+    owner       TEXT,               -- Worker holding the lease
+    lease_until REAL,               -- Lease expiry (seconds since epoch)
+    attempts    INTEGER DEFAULT 0,  -- Leases handed out
+    error       TEXT,
+    updated     TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+"""
+LEASE = 600.0                                       # Seconds a worker holds a task without a heartbeat
+HEARTBEAT = 60.0                                    # Seconds between lease renewals while a task runs
+POLL = 15.0                                         # Seconds an idle worker waits before asking again
+MAX_ATTEMPTS = 3                                    # Leases of a task that may expire before it is failed
+
+PENDING = "pending"                                 # Task status
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define connect() function:
+#   1. Open (or create) the queue database and make sure the table exists.
+#   2. Transactions are opened explicitly with BEGIN IMMEDIATE (see transaction()), so two workers can't lease the
+#      same task.
+# Parameters:
+#   path        - The queue database file, on storage every worker can reach.
+# ------------------------------------------------------------------------------------------------------------------- #
+def connect(path):
+    db = sqlite3.connect(path, timeout=60)                          # Wait out locks held by other workers
+    db.row_factory = sqlite3.Row
+    db.text_factory = str
+    db.isolation_level = None                                       # No implicit transactions
+    db.executescript(SCHEMA)
+    return db
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define transaction class:
+#   - Holds the database write lock from the first statement, so a read followed by an update is atomic across
+#     processes and machines.
+#   Example:
+#       with transaction(db):
+#           db.execute(...)
+# ------------------------------------------------------------------------------------------------------------------- #
+class transaction(object):
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, kind, value, tb):
+        self.db.execute("COMMIT" if kind is None else "ROLLBACK")
+
+
+def now_text():
+    return time.strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define func_name() function:
+#   1. Return "<module>:<function>" for a module-level task function. Functions of the running script are named
+#      after its file, since workers import it as a module.
+# ------------------------------------------------------------------------------------------------------------------- #
+def func_name(func):
+    module = func.__module__
+    if module == "__main__":
+        module = os.path.splitext(os.path.basename(sys.modules["__main__"].__file__))[0]
+    return "%s:%s" % (module, func.__name__)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define resolve() function:
+#   1. Import the function named by func_name() in a worker.
+# ------------------------------------------------------------------------------------------------------------------- #
+def resolve(name):
+    module, function = name.split(":")
+    return getattr(importlib.import_module(module), function)
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define plain() function:
+#   1. Convert the unicode strings json.loads() returns to plain strings, as catalog.py does for PCI and arcpy paths.
+# ------------------------------------------------------------------------------------------------------------------- #
+def plain(value):
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    if isinstance(value, dict):
+        return dict([(plain(key), plain(item)) for key, item in value.items()])
+    return value
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define submit() function:
+#   1. Add tasks to the queue with their critical path priority. Tasks already in the queue are left as they are,
+#      so submitting the backfill again only adds new scenes.
+#   2. Return the number of tasks added.
+# Parameters:
+#   db          - Queue connection.
+#   tasks       - List of parallel.Task records. Arguments must be JSON values (paths, numbers, flags, lists).
+# ------------------------------------------------------------------------------------------------------------------- #
+def submit(db, tasks):
+    rank = parallel.priorities(tasks)
+    added = 0
+    with transaction(db):
+        for task in tasks:
+            cursor = db.execute("INSERT OR IGNORE INTO tasks (key, scene, stage, func, args, deps, priority, status, "
+                                "updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                (task.key, task.scene, task.stage, func_name(task.func), json.dumps(list(task.args)),
+                                 json.dumps(list(task.deps)), rank[task.key], PENDING, now_text()))
+            added += cursor.rowcount
+    return added
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define skip_dependents() function:
+#   1. Mark every unfinished task that depends on a failed task, directly or through others, as skipped.
+#      Call inside a transaction.
+# ------------------------------------------------------------------------------------------------------------------- #
+def skip_dependents(db, key):
+    rows = db.execute("SELECT key, deps FROM tasks WHERE status IN (?, ?)", (PENDING, LEASED)).fetchall()
+    blocked = [key]
+    while blocked:
+        failed = blocked.pop()
+        for row in rows:
+            if failed in json.loads(row["deps"]):
+                cursor = db.execute("UPDATE tasks SET status = ?, owner = NULL, error = ?, updated = ? "
+                                    "WHERE key = ? AND status != ?",
+                                    (SKIPPED, "Depends on failed task %s" % failed, now_text(), row["key"], SKIPPED))
+                if cursor.rowcount:
+                    blocked.append(row["key"])
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define requeue_expired() function:
+#   1. Return tasks whose worker stopped renewing its lease (crashed, lost the network) to the queue, or fail them
+#      after max_attempts leases. Call inside a transaction.
+# ------------------------------------------------------------------------------------------------------------------- #
+def requeue_expired(db, max_attempts=MAX_ATTEMPTS):
+    rows = db.execute("SELECT key, owner, attempts FROM tasks WHERE status = ? AND lease_until < ?",
+                      (LEASED, time.time())).fetchall()
+    for row in rows:
+        if row["attempts"] >= max_attempts:
+            db.execute("UPDATE tasks SET status = ?, owner = NULL, error = ?, updated = ? WHERE key = ?",
+                       (FAILED, "Lease expired %i times, last held by %s" % (row["attempts"], row["owner"]),
+                        now_text(), row["key"]))
+            skip_dependents(db, row["key"])
+        else:
+            db.execute("UPDATE tasks SET status = ?, owner = NULL, updated = ? WHERE key = ?",
+                       (PENDING, now_text(), row["key"]))
+            print "Lease on %s held by %s expired; task returned to the queue." % (row["key"], row["owner"])
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define lease() function:
+#   1. Requeue expired leases.
+#   2. Take the pending task with the highest priority whose dependencies are all done, and lease it to owner.
+#   3. Return the task row, or None if no task is ready.
+# Parameters:
+#   db          - Queue connection.
+#   owner       - Worker name.
+#   seconds     - Lease length.
+# ------------------------------------------------------------------------------------------------------------------- #
+def lease(db, owner, seconds=LEASE):
+    with transaction(db):
+        requeue_expired(db)
+        done = set([row["key"] for row in db.execute("SELECT key FROM tasks WHERE status = ?", (DONE,))])
+        rows = db.execute("SELECT * FROM tasks WHERE status = ? ORDER BY priority DESC, key",
+                          (PENDING,)).fetchall()
+        for row in rows:
+            if set(json.loads(row["deps"])) <= done:
+                db.execute("UPDATE tasks SET status = ?, owner = ?, lease_until = ?, attempts = attempts + 1, "
+                           "updated = ? WHERE key = ?", (LEASED, owner, time.time() + seconds, now_text(), row["key"]))
+                return row
+    return None
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define renew() function:
+#   1. Extend a lease. Return False if the worker no longer holds it (it expired and was requeued).
+# ------------------------------------------------------------------------------------------------------------------- #
+def renew(db, key, owner, seconds=LEASE):
+    with transaction(db):
+        cursor = db.execute("UPDATE tasks SET lease_until = ? WHERE key = ? AND owner = ? AND status = ?",
+                            (time.time() + seconds, key, owner, LEASED))
+    return cursor.rowcount == 1
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define finish() function:
+#   1. Record a leased task as done, or failed and skip its dependents.
+#   2. Return False if the lease was lost meanwhile; the result is then discarded, since the task may already be
+#      running on another worker.
+# Parameters:
+#   db          - Queue connection.
+#   key, owner  - Task key and the worker holding its lease.
+#   error       - Error text, or None if the task succeeded.
+# ------------------------------------------------------------------------------------------------------------------- #
+def finish(db, key, owner, error=None):
+    with transaction(db):
+        cursor = db.execute("UPDATE tasks SET status = ?, owner = NULL, error = ?, updated = ? "
+                            "WHERE key = ? AND owner = ? AND status = ?",
+                            (DONE if error is None else FAILED, error, now_text(), key, owner, LEASED))
+        if cursor.rowcount == 1 and error is not None:
+            skip_dependents(db, key)
+    return cursor.rowcount == 1
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define retry() function:
+#   1. Return failed and skipped tasks to the queue, e.g. after fixing the cause. Return the number requeued.
+# ------------------------------------------------------------------------------------------------------------------- #
+def retry(db):
+    with transaction(db):
+        cursor = db.execute("UPDATE tasks SET status = ?, owner = NULL, error = NULL, attempts = 0, updated = ? "
+                            "WHERE status IN (?, ?)", (PENDING, now_text(), FAILED, SKIPPED))
+    return cursor.rowcount
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define counts() function:
+#   1. Return {status: number of tasks}.
+# ------------------------------------------------------------------------------------------------------------------- #
+def counts(db):
+    rows = db.execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status").fetchall()
+    return dict([(row["status"], row["n"]) for row in rows])
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define Heartbeat class:
+#   - Background thread that renews a task lease every `interval` seconds while the task runs. It has its own
+#     connection, as sqlite3 connections can't be shared between threads. `lost` is set if the lease expired anyway.
+# ------------------------------------------------------------------------------------------------------------------- #
+class Heartbeat(threading.Thread):
+    def __init__(self, path, key, owner, interval=HEARTBEAT, seconds=LEASE):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.path = path
+        self.key = key
+        self.owner = owner
+        self.interval = interval
+        self.seconds = seconds
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        db = connect(self.path)
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    if not renew(db, self.key, self.owner, self.seconds):
+                        self.lost = True
+                        print "Lost the lease on %s; its result will be discarded." % self.key
+                        return
+                except sqlite3.OperationalError, e:                 # Share busy; the lease has slack for this
+                    print "Could not renew the lease on %s: %s" % (self.key, e)
+        finally:
+            db.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define work() function:
+#   1. Lease ready tasks one at a time, run each with a heartbeat renewing its lease, and record the outcome.
+#   2. Wait for tasks to become ready while others are still running elsewhere; return when the queue is finished.
+#   3. Return (tasks done, tasks failed) by this worker.
+# Parameters:
+#   path        - The queue database file.
+#   root        - Folder for this worker's private workspace (see parallel.workspace_gdb()).
+#   owner       - Worker name; defaults to <host>:<process ID>.
+#   on_finish   - Optional function(task row, status, detail), e.g. to record stage status in the scene catalog.
+#   lease_time  - Lease length in seconds.
+#   heartbeat   - Seconds between lease renewals.
+#   poll        - Seconds to wait when no task is ready.
+#   exit_idle   - Return as soon as no task is ready, instead of waiting for running tasks to release more.
+# ------------------------------------------------------------------------------------------------------------------- #
+def work(path, root, owner=None, on_finish=None, lease_time=LEASE, heartbeat=HEARTBEAT, poll=POLL,
+         exit_idle=False):
+    if owner is None:
+        owner = "%s:%i" % (socket.gethostname(), os.getpid())
+    parallel.init_worker(root, trace.trace_file)
+    db = connect(path)
+    done = failed = 0
+    print "Worker %s started on queue %s" % (owner, path)
+    while True:
+        row = lease(db, owner, lease_time)
+        if row is None:
+            remaining = counts(db)
+            if exit_idle or not (remaining.get(PENDING, 0) + remaining.get(LEASED, 0)):
+                break
+            time.sleep(poll)
+            continue
+        print "Running %s (attempt %i)..." % (row["key"], row["attempts"] + 1)
+        beat = Heartbeat(path, row["key"], owner, heartbeat, lease_time)
+        beat.start()
+        start_time = time.time()
+        try:
+            func = resolve(row["func"])
+            with trace.span(row["stage"], row["scene"]):
+                checkpoint.call(func, plain(json.loads(row["args"])))
+            error = None
+        except Exception:
+            error = traceback.format_exc()
+        beat.stop()
+        if beat.lost or not finish(db, row["key"], owner, error):
+            continue
+        status = DONE if error is None else FAILED
+        if error is None:
+            done += 1
+            print "Finished %s in %i seconds." % (row["key"], time.time() - start_time)
+        else:
+            failed += 1
+            print "Task %s failed:\n%s" % (row["key"], error)
+        if on_finish is not None:
+            on_finish(row, status, error)
+    print "Worker %s finished: %i task(s) done, %i failed." % (owner, done, failed)
+    return done, failed
@@ -0,0 +1,243 @@
+# =================================================================================================================== #
+# Script Name:	trace.py
+# Author:	    Brian Laureijs
+# Purpose:      Record per-stage, per-scene timing and resource use as JSON lines and Chrome trace files.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Process times and IDs
+import json                                         # Trace records
+import time                                         # Wall clock
+import thread                                       # Thread IDs for concurrent downloads
+import threading                                    # Memory sampling during a span
+from contextlib import contextmanager               # span() context manager
+try:
+    import psutil                                   # Memory and I/O bytes on Windows and Linux (requirements.txt)
+except ImportError:
+    psutil = None
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+trace_file = None                                   # JSON lines output of this process; None disables writing
+SAMPLE_INTERVAL = 0.2                               # Seconds between memory samples during a span
+
+# Each finished span is appended to the trace file as one JSON object per line:
+#   name, scene     - Stage name and scene identifier (scene may be null).
+#   pid, tid        - Process and thread that ran the span; parallel workers append to the same file.
+#   start           - Wall clock start (seconds since epoch).
+#   wall, cpu       - Elapsed wall clock and process CPU (user + system) seconds.
+#   peak_rss        - Highest resident memory of the process in bytes, sampled every SAMPLE_INTERVAL seconds while
+#                     the span ran, so it belongs to this span rather than to the whole process lifetime.
+#   rss_delta       - Resident memory at the end of the span minus at the start, in bytes.
+#   read_bytes      - Bytes read and written by the process during the span.
+#   write_bytes
+#   status          - "ok", or "error" if the span exited with an exception.
+# Memory and I/O come from psutil, or from /proc on Linux without it. They are null on Windows without psutil. They
+# are per process, so spans that overlap in threads of one process (concurrent downloads) share their numbers;
+# stages on the parallel pool each run in their own worker process.
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define start() function:
+#   1. Set the JSON lines file that spans in this process are appended to.
+# Parameters:
+#   path        - The trace file; its folder is created if missing.
+# ------------------------------------------------------------------------------------------------------------------- #
+def start(path):
+    global trace_file
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    trace_file = path
+    return path
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define rss() function:
+#   1. Return the current resident memory of the process in bytes, or None if it can't be read.
+# ------------------------------------------------------------------------------------------------------------------- #
+def rss():
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    try:
+        statm = open("/proc/self/statm", "r")                       # Linux: size, resident, ... in pages
+        pages = int(statm.read().split()[1])
+        statm.close()
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError):
+        return None
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define usage() function:
+#   1. Read process CPU time and cumulative I/O bytes. I/O bytes are None where they can't be read.
+# ------------------------------------------------------------------------------------------------------------------- #
+def usage():
+    times = os.times()
+    read_bytes = None
+    write_bytes = None
+    if psutil is not None:
+        try:
+            io = psutil.Process(os.getpid()).io_counters()
+            read_bytes = io.read_bytes
+            write_bytes = io.write_bytes
+        except (AttributeError, psutil.Error):                      # Not supported on every platform
+            pass
+    else:
+        try:
+            io_file = open("/proc/self/io", "r")                    # Linux without psutil
+            io = dict(line.split(": ") for line in io_file.read().splitlines())
+            io_file.close()
+            read_bytes, write_bytes = int(io["read_bytes"]), int(io["write_bytes"])
+        except (IOError, OSError, KeyError, ValueError):            # Missing, or not readable in some containers
+            pass
+    return times[0] + times[1], read_bytes, write_bytes
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define MemorySampler class:
+#   - Samples the resident memory of the process in a background thread from creation until stop(), and keeps the
+#     highest value, so each span reports its own peak.
+#   Parameters:
+#       interval    - Seconds between samples.
+# ------------------------------------------------------------------------------------------------------------------- #
+class MemorySampler(object):
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start = rss()
+        self.peak = self.start
+        self.stopped = threading.Event()
+        self.thread = None
+        if self.start is not None:
+            self.thread = threading.Thread(target=self.run)
+            self.thread.daemon = True                               # Never keeps the process alive
+            self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, rss())
+
+    # Stop sampling and return (peak, end - start) in bytes, or (None, None) if memory can't be read.
+    def stop(self):
+        self.stopped.set()
+        if self.thread is None:
+            return None, None
+        self.thread.join()
+        end = rss()
+        self.peak = max(self.peak, end)
+        return self.peak, end - self.start
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define span() context manager:
+#   1. Measure wall time, CPU time, sampled peak memory and I/O around a block of code.
+#   2. Append the measurements to the trace file when the block exits, whether or not it raised.
+# Parameters:
+#   name        - Stage name (e.g. "readtopix", "make_pca").
+#   scene       - Scene identifier, or None for batch-level spans.
+# ------------------------------------------------------------------------------------------------------------------- #
+@contextmanager
+def span(name, scene=None):
+    start_wall = time.time()
+    start_cpu, start_read, start_write = usage()
+    sampler = MemorySampler()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        peak_rss, rss_delta = sampler.stop()
+        end_cpu, end_read, end_write = usage()
+        record = {"name": name,
+                  "scene": scene,
+                  "pid": os.getpid(),
+                  "tid": thread.get_ident(),
+                  "start": start_wall,
+                  "wall": time.time() - start_wall,
+                  "cpu": end_cpu - start_cpu,
+                  "peak_rss": peak_rss,
+                  "rss_delta": rss_delta,
+                  "read_bytes": None if start_read is None else end_read - start_read,
+                  "write_bytes": None if start_write is None else end_write - start_write,
+                  "status": status}
+        if trace_file is not None:
+            out = open(trace_file, "a")                             # One short append per span, so parallel
+            out.write(json.dumps(record) + "\n")                    # workers can share the file
+            out.close()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define read() function:
+#   1. Read all span records from a JSON lines trace file.
+# Parameters:
+#   path        - The trace file.
+# ------------------------------------------------------------------------------------------------------------------- #
+def read(path):
+    records = []
+    trace = open(path, "r")
+    for line in trace:
+        if line.strip():
+            records.append(json.loads(line))
+    trace.close()
+    return records
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define to_chrome() function:
+#   1. Convert a JSON lines trace to Chrome trace event format (open in chrome://tracing or Perfetto).
+# Parameters:
+#   path        - The JSON lines trace file.
+#   chromeout   - The output Chrome trace JSON file.
+# ------------------------------------------------------------------------------------------------------------------- #
+def to_chrome(path, chromeout):
+    records = read(path)
+    events = []
+    for record in records:
+        label = record["name"] if record["scene"] is None else "%s %s" % (record["name"], record["scene"])
+        args = dict([(key, record.get(key)) for key in ("scene", "cpu", "peak_rss", "rss_delta", "read_bytes",
+                                                          "write_bytes", "status")])
+        events.append({"name": label,
+                       "cat": record["name"],
+                       "ph": "X",                                   # Complete event: start and duration
+                       "ts": int(record["start"] * 1e6),            # Microseconds
+                       "dur": int(record["wall"] * 1e6),
+                       "pid": record["pid"],
+                       "tid": record["tid"],
+                       "args": args})
+    out = open(chromeout, "w")
+    json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, out)
+    out.close()
+    return chromeout
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define summary() function:
+#   1. Print total and mean wall and CPU time, largest peak memory and total I/O per stage. I/O is shown as "n/a"
+#      where it could not be measured (Windows without psutil).
+# Parameters:
+#   path        - The JSON lines trace file.
+# ------------------------------------------------------------------------------------------------------------------- #
+def summary(path):
+    stages = {}
+    for record in read(path):
+        stage = stages.setdefault(record["name"], {"count": 0, "wall": 0.0, "cpu": 0.0, "peak_rss": 0,
+                                                   "io": None})
+        stage["count"] += 1
+        stage["wall"] += record["wall"]
+        stage["cpu"] += record["cpu"]
+        stage["peak_rss"] = max(stage["peak_rss"], record["peak_rss"] or 0)
+        if record["read_bytes"] is not None:
+            stage["io"] = (stage["io"] or 0) + record["read_bytes"] + record["write_bytes"]
+    print "%-20s %6s %10s %10s %10s %10s %10s" % ("Stage", "Count", "Wall (s)", "Mean (s)", "CPU (s)", "Peak MB",
+                                                  "I/O MB")
+    for name in sorted(stages, key=lambda n: stages[n]["wall"], reverse=True):
+        stage = stages[name]
+        io = "n/a" if stage["io"] is None else "%.0f" % (stage["io"] / 1048576.0)
+        print "%-20s %6i %10.1f %10.1f %10.1f %10.0f %10s" % (name, stage["count"], stage["wall"],
+                                                              stage["wall"] / stage["count"], stage["cpu"],
+                                                              stage["peak_rss"] / 1048576.0, io)
+    return stages
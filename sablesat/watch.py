@@ -0,0 +1,232 @@
+# =================================================================================================================== #
+# Script Name:	watch.py
+# Author:	    Brian Laureijs
+# Purpose:      Watch for new Sentinel-2 products and hand each one to a bounded pool of processing workers.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                  # Requirements:
+# =================================================================================================================== #
+import os                                           # Directory and file manipulation
+import shutil                                       # Remove failed extractions
+import time                                         # Polling and latency
+import zipfile                                      # Unzip downloads
+import threading                                    # Poller thread
+import traceback                                    # Report worker errors
+import multiprocessing                              # Processing workers
+import Queue                                        # Bounded work queue
+from sablesat import parallel                       # Worker workspaces
+from sablesat import trace                          # Stage timing and resource records
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Declare global variables
+# ------------------------------------------------------------------------------------------------------------------- #
+INTERVAL = 30.0                                     # Seconds between polls
+SETTLE = 2                                          # Polls a product must stay unchanged (still being written)
+QUEUE_SIZE = 4                                      # Products waiting for a worker before the poller stops taking
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define path_state() function:
+#   1. Return (total bytes, newest modification time) of a file or folder, to tell when it has stopped changing.
+# ------------------------------------------------------------------------------------------------------------------- #
+def path_state(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path), os.path.getmtime(path)
+    size, mtime = 0, os.path.getmtime(path)
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+                mtime = max(mtime, os.path.getmtime(os.path.join(root, name)))
+            except OSError:                                         # Removed while walking
+                pass
+    return size, mtime
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define Watcher class:
+#   - Finds products that are new and finished: SAFE folders in the input directory, and downloaded zips in the
+#     download directory, which are extracted to the input directory first. A product counts as finished once its
+#     size and modification time are unchanged for `settle` polls, so half-unzipped folders are left alone.
+#     A zip that can't be extracted (truncated or corrupt download) is renamed to <name>.zip.bad and skipped; the
+#     poller carries on with the other products.
+#   Parameters:
+#       inputdir    - Folder of unzipped SAFE products.
+#       zipdir      - Folder api_download.py downloads into, or None to only watch inputdir.
+#       done        - function(path) returning True for products already processed (e.g. from the scene catalog).
+#       settle      - Unchanged polls before a product is taken.
+# ------------------------------------------------------------------------------------------------------------------- #
+class Watcher(object):
+    def __init__(self, inputdir, zipdir=None, done=None, settle=SETTLE):
+        self.inputdir = inputdir
+        self.zipdir = zipdir
+        self.done = done
+        self.settle = settle
+        self.states = {}                            # Path -> (state, polls unchanged)
+        self.taken = set()
+
+    def stable(self, path):
+        state = path_state(path)
+        previous, count = self.states.get(path, (None, 0))
+        count = count + 1 if state == previous else 0
+        self.states[path] = (state, count)
+        return count >= self.settle
+
+    # Extract a zip into a scratch folder, then move its contents into the input folder, so a failed extraction
+    # never leaves a half-written SAFE folder behind. Return True if the product was extracted.
+    def extract(self, path):
+        name = os.path.basename(path)
+        scratch = os.path.join(self.inputdir, name[:-4] + ".extracting")
+        try:
+            if os.path.isdir(scratch):
+                shutil.rmtree(scratch)
+            with zipfile.ZipFile(path, "r") as zipobject:
+                zipobject.extractall(scratch)
+            for entry in os.listdir(scratch):
+                target = os.path.join(self.inputdir, entry)
+                if os.path.isdir(target):                           # Replaced, as extractall() would overwrite it
+                    shutil.rmtree(target)
+                os.rename(os.path.join(scratch, entry), target)
+            os.rmdir(scratch)
+        except Exception, e:                                        # BadZipfile, IOError, zlib.error, ...
+            shutil.rmtree(scratch, ignore_errors=True)
+            print "Could not extract %s: %s" % (name, e)
+            try:
+                os.rename(path, path + ".bad")
+                print "Renamed it to %s; download the product again." % (name + ".bad")
+            except OSError:
+                print "Left %s in place; it is skipped until the watcher restarts." % name
+            return False
+        os.remove(path)
+        print "Extracted %s to %s" % (name, self.inputdir)
+        return True
+
+    # Return the SAFE folders that are ready to process, extracting finished zips on the way.
+    def poll(self):
+        ready = []
+        if self.zipdir is not None:
+            for name in sorted(os.listdir(self.zipdir)):
+                path = os.path.join(self.zipdir, name)
+                try:
+                    if name.endswith(".zip") and path not in self.taken and self.stable(path):
+                        self.taken.add(path)
+                        self.extract(path)
+                except OSError, e:                                  # Moved or deleted while polling
+                    print "Skipping %s: %s" % (name, e)
+        for name in sorted(os.listdir(self.inputdir)):
+            path = os.path.join(self.inputdir, name)
+            if not name.endswith(".SAFE") or path in self.taken:
+                continue
+            try:
+                if self.done is not None and self.done(path):
+                    self.taken.add(path)
+                elif self.stable(path):
+                    self.taken.add(path)
+                    ready.append(path)
+            except OSError, e:
+                print "Skipping %s: %s" % (name, e)
+        return ready
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define poller() function:                                                            -- Runs in a background thread
+#   1. Poll the watcher and put new products on the bounded queue. put() blocks while the queue is full, so a
+#      burst of downloads waits on disk instead of piling up in memory and worker processes.
+#   2. A poll that fails is reported and tried again at the next interval, so the thread never dies silently.
+#   3. With once=True, poll a single time. `polled` is set however the thread ends, so run() never waits on it.
+# ------------------------------------------------------------------------------------------------------------------- #
+def poller(watcher, queue, interval, stop, polled, once):
+    try:
+        while not stop.is_set():
+            try:
+                ready = watcher.poll()
+            except Exception:
+                print "Polling failed:\n%s" % traceback.format_exc()
+                ready = []
+            for path in ready:
+                while not stop.is_set():
+                    try:
+                        queue.put((path, time.time()), timeout=1.0)
+                        print "Queued %s (%i waiting)" % (os.path.basename(path), queue.qsize())
+                        break
+                    except Queue.Full:
+                        pass
+            if once:
+                return
+            stop.wait(interval)
+    finally:
+        polled.set()
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define call() function:                                                               -- Runs in a worker process
+#   1. Run the product handler, returning the error instead of raising so the watcher always hears back.
+# ------------------------------------------------------------------------------------------------------------------- #
+def call(handle, path, args):
+    try:
+        return handle(path, *args)
+    except Exception:
+        return os.path.basename(path), [traceback.format_exc()]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define run() function:
+#   1. Start the poller thread and a pool of worker processes.
+#   2. Hand queued products to free workers; report each result and the time from arrival to completion.
+#   3. With once=True, stop when everything that was ready at the first poll has been processed.
+# Parameters:
+#   watcher     - Watcher instance.
+#   handle      - Module-level function(path, *args) that processes one product in a worker process and returns
+#                 (scene ID, list of failed stages).
+#   args        - Extra arguments for handle.
+#   workers     - Products processed at once.
+#   queue_size  - Products allowed to wait for a worker.
+#   interval    - Seconds between polls.
+#   root        - Folder for worker workspaces.
+#   once        - Process what is there now and return, instead of watching until Ctrl+C.
+# ------------------------------------------------------------------------------------------------------------------- #
+def run(watcher, handle, args, workers=1, queue_size=QUEUE_SIZE, interval=INTERVAL, root="workers", once=False):
+    queue = Queue.Queue(maxsize=queue_size)
+    finished = Queue.Queue()
+    stop = threading.Event()
+    polled = threading.Event()
+    if once:
+        watcher.settle = 0                                          # Nothing is being written; take all now
+    thread = threading.Thread(target=poller, args=(watcher, queue, interval, stop, polled, once))
+    thread.daemon = True
+    thread.start()
+    pool = multiprocessing.Pool(workers, parallel.init_worker, (root, trace.trace_file))
+    print "Watching for new products with %i worker(s). Press Ctrl+C to stop." % workers
+    running = 0
+    try:
+        while True:
+            while running < workers:
+                try:
+                    path, arrived = queue.get(timeout=0.5)
+                except Queue.Empty:
+                    break
+                pool.apply_async(call, (handle, path, tuple(args)),
+                                 callback=lambda result, arrived=arrived: finished.put((result, arrived)))
+                running += 1
+            if once and polled.is_set() and running == 0 and queue.empty():
+                break
+            try:
+                (scene_id, failed), arrived = finished.get(timeout=1.0)
+            except Queue.Empty:
+                continue
+            running -= 1
+            minutes = (time.time() - arrived) / 60
+            if failed:
+                print "Scene %s finished %i minutes after arriving; failed stages: %s" % \
+                      (scene_id, minutes, ", ".join(failed))
+            else:
+                print "Scene %s processed %i minutes after arriving." % (scene_id, minutes)
+    except KeyboardInterrupt:
+        print "Stopping; products in progress are abandoned and will be picked up again on the next start."
+        pool.terminate()
+    else:
+        pool.close()
+    stop.set()
+    pool.join()
@@ -0,0 +1,72 @@
+# =================================================================================================================== #
+# Script Name:	test_land_cover_reference.py
+# Author:	    Brian Laureijs
+# Purpose:      Check that a failed land cover reference scene doesn't stop land cover for the other scenes.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Run with Python 2.7 from the project folder:
+#   python -m unittest discover tests
+# =================================================================================================================== #
+import os                                           # Scratch folders
+import sys                                          # Python version check
+import shutil                                       # Scratch folder cleanup
+import tempfile                                     # Scratch folders
+import unittest                                     # Test runner
+
+PY2 = sys.version_info[0] == 2                      # sablesat is Python 2.7 code, like arcpy and PCI
+
+
+# Stand-in stages: the reference scene's PCA fails, every other stage succeeds without writing anything.
+def failing_stage(*args):
+    raise RuntimeError("PCA failed")
+
+
+def passing_stage(*args):
+    pass
+
+
+@unittest.skipUnless(PY2, "sablesat runs on Python 2.7")
+class ReferenceFailureTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    # Build the stage tasks of two scenes with no stored signature, the first one failing its PCA.
+    def scene_tasks(self):
+        from sablesat import processing, project
+        paths = project.paths(self.folder)
+        tasks = []
+        for iid in ("S2A_20180826", "S2A_20180901"):
+            for task in processing.scene_tasks(iid, iid + "_10m_merged.pix", None, False, False, True, paths):
+                func = failing_stage if task.key == "S2A_20180826:pca" else passing_stage
+                tasks.append(task._replace(func=func))
+        return tasks
+
+    def test_other_scenes_do_not_wait_for_reference(self):
+        deps = dict([(task.key, task.deps) for task in self.scene_tasks()])
+        self.assertNotIn("S2A_20180826:land_cover", deps["S2A_20180901:land_cover"])
+
+    def test_reference_failure_skips_only_its_scene(self):
+        from sablesat import parallel
+        finished = {}
+        failed, skipped = parallel.run(self.scene_tasks(), 1, os.path.join(self.folder, "workers"),
+                                       on_finish=lambda task, status, detail: finished.update({task.key: status}))
+        self.assertEqual(failed, ["S2A_20180826:pca"])
+        self.assertEqual(finished["S2A_20180826:land_cover"], "skipped")
+        self.assertEqual(finished["S2A_20180901:land_cover"], "done")
+
+    def test_first_successful_scene_becomes_reference(self):
+        from sablesat import signatures
+        sigfile = os.path.join(self.folder, "cache", "signatures", "landcover.json")
+        self.assertIsNone(signatures.load(sigfile, 2, 2))               # Reference scene failed; cluster unseeded
+        self.assertTrue(signatures.save(sigfile, "S2A_20180901", [[1.0, 2.0], None], 2))
+        self.assertEqual(signatures.load(sigfile, 2, 2)["reference"], "S2A_20180901")
+        self.assertFalse(signatures.save(sigfile, "S2A_20180826", [[3.0, 4.0], None], 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+# =================================================================================================================== #
+# Script Name:	watch.py
+# Author:	    Brian Laureijs
+# Purpose:      Process new Sentinel-2 products as they arrive, from import through coastline and land cover.
+# Date:         20261019
+# Version:      0.1.0
+# Notice:       Created for academic assessment. Do not re-use or redistribute without permission from author.
+# =================================================================================================================== #
+# Import Libraries                                                      # Requirements:
+# =================================================================================================================== #
+import os                                                               # Directory and file manipulation
+import time                                                             # Trace file names
+import argparse                                                         # Command line options
+from sablesat import importer                                           # Import stages
+from sablesat import processing                                         # PCA, masks, classification, coastline
+from sablesat import project                                            # Project folder layout
+from sablesat import catalog                                            # Scene catalog
+from sablesat import parallel                                           # Stage dependencies
+from sablesat import trace                                              # Stage timing and resource records
+from sablesat import watch                                              # Polling and bounded work queue
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define path variables
+# ------------------------------------------------------------------------------------------------------------------- #
+workingdir = os.getcwd()
+paths = project.paths(workingdir)
+tracedir = paths["traces"]
+watchdir = os.path.join(paths["workers"], "watch")                      # Private workspaces of watch workers
+outputdirs = [paths[name] for name in ("pix", "atcor", "pca", "coastline", "masks", "landcover", "composite",
+                                       "input")]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define process_product() function:                                                    -- Runs in a worker process
+#   1. Register the product in the scene catalog and import it to PIX.
+#   2. Run its stages in dependency order: PCA, cloud mask, land cover, coastline and correction.
+#   3. Record every stage status in the catalog and return (scene ID, failed stages).
+# Parameters:
+#   safe_path       - The unzipped SAFE folder.
+#   clear_cloud     - Products with more cloud cover (percent) than this are classified as partially clouded.
+#   correct_first   - Run atmospheric correction before classification.
+#   fast_correction - Use dark object subtraction instead of haze removal and ATCOR.
+# ------------------------------------------------------------------------------------------------------------------- #
+def process_product(safe_path, clear_cloud, correct_first, fast_correction):
+    db = catalog.connect(paths["catalog"])
+    scene_id = catalog.register(db, safe_path)
+    with trace.span("import", scene_id):
+        importer.import_scene(db, scene_id, paths["pix"], paths["grids"], paths["clip"])
+    scene = catalog.get(db, scene_id)
+    part_cloud = scene["cloud"] is None or scene["cloud"] > clear_cloud
+    tasks = processing.scene_tasks(scene_id, scene["merged"], scene["atmos60"], part_cloud, correct_first,
+                                   fast_correction, paths)
+    failed, skipped = parallel.run(tasks, 1, os.path.join(watchdir, scene_id),
+                                   on_finish=lambda task, status, detail:
+                                   catalog.set_stage(db, task.scene, task.stage, status, detail))
+    return scene_id, [key.split(":")[1] for key in failed + skipped]
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define imported() function:
+#   1. Return True if the catalog already holds a completed import of a product, so restarts skip it.
+# ------------------------------------------------------------------------------------------------------------------- #
+def imported(safe_path):
+    scene_id = catalog.scene_id(safe_path)
+    if scene_id is None:
+        return True                                                     # Not a Sentinel-2 product; ignore
+    db = catalog.connect(paths["catalog"])
+    return catalog.stage_status(db, scene_id).get("import") == "done"
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Define main() function:
+#   1. Create output folders that don't exist yet. Unlike import.py and image_processing.py, nothing is cleared.
+#   2. Watch input/ and the download folder, and process each new product as soon as it has finished arriving.
+# ------------------------------------------------------------------------------------------------------------------- #
+def main():
+    parser = argparse.ArgumentParser(description="Process new Sentinel-2 products as they arrive.")
+    parser.add_argument("--workers", type=int, default=1, help="Products processed at once (default 1)")
+    parser.add_argument("--queue", type=int, default=watch.QUEUE_SIZE,
+                        help="Products allowed to wait for a worker (default %i)" % watch.QUEUE_SIZE)
+    parser.add_argument("--interval", type=float, default=watch.INTERVAL,
+                        help="Seconds between checks for new products (default %i)" % watch.INTERVAL)
+    parser.add_argument("--clear-cloud", type=float, default=1.0,
+                        help="Cloud cover percent above which a product is treated as partially clouded")
+    parser.add_argument("--correct-first", action="store_true", help="Correct before classification")
+    parser.add_argument("--fast-correction", action="store_true", help="Use dark object subtraction")
+    parser.add_argument("--once", action="store_true", help="Process the products already waiting, then exit")
+    args = parser.parse_args()
+
+    for folder in outputdirs:
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+    trace_jsonl = trace.start(os.path.join(tracedir, "watch_%s.jsonl" % time.strftime("%Y%m%d_%H%M%S")))
+    watcher = watch.Watcher(paths["input"], zipdir=workingdir, done=imported)
+    watch.run(watcher, process_product, (args.clear_cloud, args.correct_first, args.fast_correction),
+              workers=args.workers, queue_size=args.queue, interval=args.interval, root=watchdir, once=args.once)
+    trace.summary(trace_jsonl)
+    print "Stage timings written to %s" % trace_jsonl
+
+
+# ------------------------------------------------------------------------------------------------------------------- #
+# Mainline
+# ------------------------------------------------------------------------------------------------------------------- #
+if __name__ == "__main__":                                              # Pool workers import this module
+    main()